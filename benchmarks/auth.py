@@ -0,0 +1,63 @@
+"""
+Authenticated requests per second with basic versus token authentication.
+
+Every scenario fetches ``/api/users/my-profile/`` through the Django test
+client. Basic authentication runs the password hasher on each request;
+token authentication hashes the key with SHA-256 and, once cached, skips
+the database as well.
+
+    python -m benchmarks.auth [--requests 200]
+"""
+import argparse
+import base64
+import statistics
+import time
+
+from benchmarks import test_database
+
+
+def measure(client, headers, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get('/api/users/my-profile/', headers=headers)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return requests / sum(latencies), statistics.median(latencies) * 1000
+
+
+def run(requests):
+    from django.test import Client
+    from django.test.utils import override_settings
+
+    from users.authentication import token_cache
+    from users.models import AuthToken, User
+
+    user = User.objects.create_user('benchmark@example.com', 'benchmark-password')
+    token, key = AuthToken.objects.issue(user)
+    basic = base64.b64encode(b'benchmark@example.com:benchmark-password').decode()
+    client = Client(headers={'accept': 'application/json'})
+
+    scenarios = [
+        ('basic', {'authorization': f'Basic {basic}'}, {}),
+        ('token, uncached', {'authorization': f'Token {key}'}, {'AUTH_TOKEN_CACHE_SIZE': 0}),
+        ('token, cached', {'authorization': f'Token {key}'}, {}),
+    ]
+    print(f'{"authentication":<18}{"req/s":>10}{"p50 ms":>10}')
+    for name, headers, overrides in scenarios:
+        token_cache.clear()
+        with override_settings(**overrides):
+            rps, median = measure(client, headers, requests)
+        print(f'{name:<18}{rps:>10,.0f}{median:>10.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    with test_database():
+        run(args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Throughput of the read endpoints under WSGI versus ASGI.
+
+Drives ``config.wsgi.application`` from a pool of client threads, as a
+threaded WSGI server would, and ``config.asgi.application`` from
+concurrent tasks on one event loop. Both run in-process, so the numbers
+compare the request paths rather than any particular server.
+
+    python -m benchmarks.concurrency [--clients 50 100 250 500] [--requests 2000] [--no-cache]
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import test_database
+
+
+def get_paths():
+    from materials.models import Course, Lesson
+    from users.models import User
+
+    course = Course.objects.order_by('pk').first()
+    lesson = Lesson.objects.order_by('pk').first()
+    user = User.objects.order_by('pk').first()
+    return [
+        '/api/courses/',
+        f'/api/courses/{course.pk}/',
+        '/api/lessons/',
+        f'/api/lessons/{lesson.pk}/',
+        f'/api/users/{user.pk}/',
+    ]
+
+
+def run_wsgi(paths, clients, total):
+    from config.wsgi import application
+
+    def call(index):
+        path = paths[index % len(paths)]
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver',
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+        start = time.perf_counter()
+        body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+        elapsed = time.perf_counter() - start
+        assert statuses[0].startswith('200'), (path, statuses[0], body[:200])
+        return elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(call, range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def run_asgi(paths, clients, total):
+    from config.asgi import application
+
+    async def call(index):
+        path = paths[index % len(paths)]
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'accept', b'application/json')],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Never disconnect; Django cancels this once the response is sent.
+            await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        elapsed = time.perf_counter() - start
+        assert statuses[0] == 200, (path, statuses[0])
+        return elapsed
+
+    async def client(indexes):
+        return [await call(index) for index in indexes]
+
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            client(range(offset, total, clients)) for offset in range(clients)
+        ))
+        return time.perf_counter() - start, [latency for result in results for latency in result]
+
+    return asyncio.run(main())
+
+
+def report(name, clients, total, elapsed, latencies):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f'{name:<6}{clients:>9}{total / elapsed:>12,.0f}'
+        f'{quantiles[49] * 1000:>10.1f}{quantiles[98] * 1000:>10.1f}'
+    )
+
+
+def run(clients_list, total, size, cache):
+    from django.test.utils import override_settings
+
+    from benchmarks.serialization import seed
+
+    seed(size)
+    paths = get_paths()
+    overrides = {}
+    if not cache:
+        overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+    with override_settings(**overrides):
+        print(f'{"server":<6}{"clients":>9}{"req/s":>12}{"p50 ms":>10}{"p99 ms":>10}')
+        for clients in clients_list:
+            for name, runner in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                elapsed, latencies = runner(paths, clients, total)
+                report(name, clients, total, elapsed, latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 100, 250, 500])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=1000, help='rows seeded per model')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='disable the materials response cache')
+    args = parser.parse_args()
+    with test_database():
+        run(args.clients, args.requests, args.size, args.cache)
+
+
+if __name__ == '__main__':
+    main()
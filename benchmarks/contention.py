@@ -0,0 +1,170 @@
+"""
+Mixed read/write throughput of the development and production database
+profiles (config.database).
+
+Each profile runs in its own process against a fresh SQLite file. Reader
+threads fetch course and lesson lists while writer threads create
+lessons and update user profiles, all through ``config.wsgi.application``
+with the response cache disabled. Under the rollback journal every
+write blocks the readers; under WAL the readers keep going.
+
+    python -m benchmarks.contention [--readers 8] [--writers 2] [--seconds 10]
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ('development', 'production')
+
+
+def environ(method, path, body=None):
+    content = json.dumps(body).encode() if body is not None else b''
+    return {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_ACCEPT': 'application/json',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def seed():
+    from django.core.management import call_command
+
+    from materials import counters
+    from materials.models import Course, Lesson
+    from users.models import User
+
+    call_command('migrate', verbosity=0)
+    courses = Course.objects.bulk_create(Course(title=f'Course {index}') for index in range(50))
+    Lesson.objects.bulk_create(
+        Lesson(course=course, title=f'Lesson {index}', video_url=f'https://example.com/{index}')
+        for course in courses for index in range(10)
+    )
+    counters.repair()
+    users = User.objects.bulk_create(User(email=f'user{index}@example.com') for index in range(20))
+    return [course.pk for course in courses], [user.pk for user in users]
+
+
+def worker(readers, writers, seconds):
+    """Run the mixed load in this process and print the results as JSON."""
+    from benchmarks import setup_django
+
+    setup_django()
+    from django.test.utils import override_settings
+
+    from config.wsgi import application
+
+    course_ids, user_ids = seed()
+    deadline = time.perf_counter() + seconds
+    results = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+
+    def call(kind, method, path, body=None):
+        statuses = []
+        start = time.perf_counter()
+        b''.join(application(environ(method, path, body), lambda status, headers: statuses.append(status)))
+        elapsed = time.perf_counter() - start
+        with lock:
+            if statuses[0][:1] == '2':
+                results[kind].append(elapsed)
+            else:
+                errors[kind] += 1
+
+    def read(index):
+        paths = ['/api/courses/', '/api/lessons/', f'/api/courses/{course_ids[index % len(course_ids)]}/']
+        count = 0
+        while time.perf_counter() < deadline:
+            call('read', 'GET', paths[count % len(paths)])
+            count += 1
+
+    def write(index):
+        count = 0
+        while time.perf_counter() < deadline:
+            if count % 2:
+                call('write', 'PATCH', f'/api/users/{user_ids[count % len(user_ids)]}/update-profile/',
+                     {'city': f'City {count}'})
+            else:
+                call('write', 'POST', '/api/lessons/', {
+                    'title': f'Lesson {index}.{count}',
+                    'video_url': 'https://example.com/new',
+                    'course': course_ids[count % len(course_ids)],
+                })
+            count += 1
+
+    caches = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    with override_settings(CACHES=caches, ALLOWED_HOSTS=['testserver']):
+        threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+        threads += [threading.Thread(target=write, args=(index,)) for index in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    print(json.dumps({'results': results, 'errors': errors}))
+
+
+def run_profile(profile, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            'DJANGO_DATABASE_PROFILE': profile,
+            'DJANGO_SQLITE_PATH': os.path.join(directory, 'db.sqlite3'),
+        }
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.contention', '--worker',
+             '--readers', str(readers), '--writers', str(writers), '--seconds', str(seconds)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def report(profile, kind, latencies, errors, seconds):
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = quantiles[49] * 1000, quantiles[98] * 1000
+    else:
+        p50 = p99 = float('nan')
+    print(f'{profile:<13}{kind:<7}{len(latencies) / seconds:>10,.0f}{p50:>10.1f}{p99:>10.1f}{errors:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.readers, args.writers, args.seconds)
+        return
+
+    print(f'{"profile":<13}{"kind":<7}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>9}')
+    for profile in PROFILES:
+        data = run_profile(profile, args.readers, args.writers, args.seconds)
+        for kind in ('read', 'write'):
+            report(profile, kind, data['results'][kind], data['errors'][kind], args.seconds)
+
+
+if __name__ == '__main__':
+    main()
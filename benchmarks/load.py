@@ -0,0 +1,297 @@
+"""
+Load benchmark over every API route, with a JSON baseline.
+
+Seeds a throwaway database with ``manage.py seed``, drives each scenario
+below through the Django test client and records throughput and latency
+percentiles. The first run (or ``--save``) writes the baseline; later
+runs compare against it and exit with status 1 when a scenario's p95
+latency or throughput regresses by more than ``--threshold``.
+
+    python -m benchmarks.load [--requests 200] [--baseline benchmarks/baseline.json] [--save]
+
+A route in the URLconfs without a scenario fails the run before any
+request is sent, so the suite keeps covering the whole API.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from benchmarks import test_database
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+Scenario = namedtuple(
+    'Scenario', ['label', 'route', 'method', 'url', 'data', 'client', 'content_type', 'headers']
+)
+
+
+def scenario(label, route, url, method='get', data=None, client='anonymous',
+             content_type='application/json', headers=None):
+    """
+    ``url`` and a callable ``data`` take the ids of the seeded rows and are
+    called for every request, like ``headers``, which runs outside the
+    measured time (e.g. to issue a token the request then revokes).
+    """
+    return Scenario(label, route, method, url, data, client, content_type, headers)
+
+
+_imported = itertools.count()
+
+
+def import_body(ids, rows=10):
+    """NDJSON rows of users not imported yet; without passwords, so hashing stays out."""
+    start = next(_imported) * rows
+    return '\n'.join(
+        json.dumps({'email': f'imported{index}@example.com', 'first_name': 'Imported'})
+        for index in range(start, start + rows)
+    )
+
+
+def issue_token(ids):
+    from users.models import AuthToken, User
+
+    _, key = AuthToken.objects.issue(User.objects.get(pk=ids['user']))
+    return {'authorization': f'Token {key}'}
+
+
+SCENARIOS = [
+    scenario('api root', 'api-root', lambda ids: '/api/'),
+    scenario('course list', 'course-list', lambda ids: '/api/courses/'),
+    scenario('course list, lessons expanded', 'course-list', lambda ids: '/api/courses/?expand=lessons'),
+    scenario('course list, sparse', 'course-list', lambda ids: '/api/courses/?fields=id,title'),
+    scenario('course create', 'course-list', lambda ids: '/api/courses/', 'post',
+             {'title': 'Benchmark course', 'description': 'Created by the load benchmark'}),
+    scenario('course detail', 'course-detail', lambda ids: f'/api/courses/{ids["course"]}/'),
+    scenario('course update', 'course-detail', lambda ids: f'/api/courses/{ids["course"]}/', 'patch',
+             {'title': 'Benchmark course'}),
+    scenario('course lessons', 'course-lesson-list',
+             lambda ids: f'/api/courses/{ids["course"]}/lessons/'),
+    scenario('lesson list', 'lesson-list-create', lambda ids: '/api/lessons/'),
+    scenario('lesson list, by course', 'lesson-list-create',
+             lambda ids: f'/api/lessons/?course={ids["course"]}'),
+    scenario('lesson create', 'lesson-list-create', lambda ids: '/api/lessons/', 'post',
+             lambda ids: {'title': 'Benchmark lesson', 'course': ids['course'],
+                          'video_url': 'https://example.com/videos/benchmark'}),
+    scenario('lesson detail', 'lesson-detail', lambda ids: f'/api/lessons/{ids["lesson"]}/'),
+    scenario('lesson update', 'lesson-detail', lambda ids: f'/api/lessons/{ids["lesson"]}/', 'patch',
+             {'title': 'Benchmark lesson'}),
+    scenario('lesson bulk update', 'lesson-bulk', lambda ids: '/api/lessons/bulk/', 'patch',
+             lambda ids: [{'id': pk, 'title': 'Benchmark lesson'} for pk in ids['lessons']]),
+    scenario('search', 'search', lambda ids: '/api/search/?q=django'),
+    scenario('sync, new token', 'sync', lambda ids: '/api/sync/'),
+    scenario('sync, changes', 'sync', lambda ids: f'/api/sync/?token={ids["sync_token"]}'),
+    scenario('batch', 'batch', lambda ids: '/api/batch/', 'post',
+             lambda ids: {'requests': [
+                 {'path': '/api/courses/?fields=id,title'},
+                 {'path': f'/api/courses/{ids["course"]}/'},
+                 {'path': f'/api/lessons/{ids["lesson"]}/'},
+                 {'method': 'PATCH', 'path': f'/api/lessons/{ids["lesson"]}/',
+                  'body': {'title': 'Benchmark lesson'}},
+             ]}),
+    scenario('media', 'media', lambda ids: ids['media']),
+    scenario('media, range', 'media', lambda ids: ids['media'], headers=lambda ids: {'range': 'bytes=0-1023'}),
+    scenario('catalog export', 'catalog-export', lambda ids: '/api/export/?resource=courses',
+             client='admin'),
+    scenario('cache stats', 'cache-stats', lambda ids: '/api/cache-stats/', client='admin'),
+    scenario('metrics', 'metrics', lambda ids: '/metrics/', client='admin'),
+    scenario('user list', 'user-list', lambda ids: '/api/users/'),
+    scenario('user detail', 'user-detail', lambda ids: f'/api/users/{ids["user"]}/'),
+    scenario('my profile', 'user-my-profile', lambda ids: '/api/users/my-profile/', client='user'),
+    scenario('profile update', 'user-update-profile',
+             lambda ids: f'/api/users/{ids["user"]}/update-profile/', 'patch', {'city': 'Kazan'}),
+    scenario('login', 'user-login', lambda ids: '/api/users/login/', 'post',
+             lambda ids: {'email': ids['email'], 'password': 'password'}),
+    scenario('logout', 'user-logout', lambda ids: '/api/users/logout/', 'post', headers=issue_token),
+    scenario('user import', 'user-import', lambda ids: '/api/users/import/', 'post', import_body,
+             client='admin', content_type='application/x-ndjson'),
+    scenario('admin courses', 'admin:materials_course_changelist',
+             lambda ids: '/admin/materials/course/', client='admin'),
+    scenario('admin lessons', 'admin:materials_lesson_changelist',
+             lambda ids: '/admin/materials/lesson/', client='admin'),
+    scenario('admin users', 'admin:users_user_changelist',
+             lambda ids: '/admin/users/user/', client='admin'),
+]
+
+
+def named_routes():
+    """Names of the project's routes, without the admin site's."""
+    from django.urls import URLResolver, get_resolver
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.namespace != 'admin':
+                    yield from walk(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+    return set(walk(get_resolver().url_patterns))
+
+
+def percentile(quantiles, q):
+    return round(quantiles[q - 1] * 1000, 3)
+
+
+def request_kwargs(scenario, ids):
+    data = scenario.data(ids) if callable(scenario.data) else scenario.data
+    kwargs = {'headers': scenario.headers(ids)} if scenario.headers is not None else {}
+    if data is not None:
+        if scenario.content_type == 'application/json':
+            data = json.dumps(data)
+        kwargs.update(content_type=scenario.content_type, data=data)
+    return kwargs
+
+
+def run_scenario(client, scenario, ids, requests, warmup):
+    send = getattr(client, scenario.method)
+
+    latencies = []
+    for index in range(warmup + requests):
+        url = scenario.url(ids)
+        kwargs = request_kwargs(scenario, ids)
+        start = time.perf_counter()
+        response = send(url, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario.label}: {scenario.method.upper()} {url} '
+                               f'returned {response.status_code}')
+        if index >= warmup:
+            latencies.append(elapsed)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'route': scenario.route,
+        'method': scenario.method.upper(),
+        'requests': requests,
+        'rps': round(requests / sum(latencies), 1),
+        'p50_ms': percentile(quantiles, 50),
+        'p95_ms': percentile(quantiles, 95),
+        'p99_ms': percentile(quantiles, 99),
+    }
+
+
+def run(args):
+    from django.conf import settings
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from django.core.management import call_command
+    from django.test import Client
+
+    from materials import changes
+    from materials.models import Course, Lesson
+    from users.models import User
+
+    missing = named_routes() - {item.route for item in SCENARIOS}
+    if missing:
+        sys.exit(f'Routes without a scenario: {", ".join(sorted(missing))}')
+
+    call_command(
+        'seed', users=args.users, courses=args.courses, lessons=args.lessons,
+        stdout=sys.stderr
+    )
+    admin = User.objects.create_superuser('benchmark-admin@example.com', 'password')
+    user = User.objects.filter(is_staff=False).order_by('pk').first()
+    course = Course.objects.order_by('pk').first()
+    ids = {
+        'course': course.pk,
+        'lesson': Lesson.objects.filter(course=course).order_by('pk').first().pk,
+        'lessons': list(Lesson.objects.order_by('pk').values_list('pk', flat=True)[:20]),
+        'user': user.pk,
+        'email': user.email,
+        # The changes of one course and its lessons behind the token.
+        'sync_token': changes.encode_token(max(changes.latest_seq() - args.lessons - 1, 0)),
+        'media': settings.MEDIA_URL + default_storage.save(
+            'courses/previews/benchmark.bin', ContentFile(os.urandom(64 * 1024))
+        ),
+    }
+
+    clients = {name: Client(headers={'accept': 'application/json'}) for name in ('anonymous', 'user', 'admin')}
+    clients['user'].force_login(user)
+    clients['admin'].force_login(admin)
+
+    results = {}
+    for item in SCENARIOS:
+        results[item.label] = run_scenario(clients[item.client], item, ids, args.requests, args.warmup)
+        result = results[item.label]
+        print(
+            f'{item.label:<32}{result["rps"]:>10,.0f}'
+            f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}',
+            file=sys.stderr
+        )
+    return results
+
+
+def compare(baseline, results, threshold, min_delta_ms):
+    """Return a description of every scenario that regressed past ``threshold``."""
+    regressions = []
+    for label, result in results.items():
+        before = baseline.get(label)
+        if before is None:
+            continue
+        p95_limit = max(before['p95_ms'] * (1 + threshold), before['p95_ms'] + min_delta_ms)
+        if result['p95_ms'] > p95_limit:
+            regressions.append(f'{label}: p95 {before["p95_ms"]:.2f}ms -> {result["p95_ms"]:.2f}ms')
+        if result['rps'] < before['rps'] / (1 + threshold) and result['p50_ms'] - before['p50_ms'] > min_delta_ms:
+            regressions.append(f'{label}: {before["rps"]:,.0f} -> {result["rps"]:,.0f} req/s')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured requests per scenario')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--lessons', type=int, default=10, help='lessons per course')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='overwrite the baseline with this run')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative regression (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='ignore latency changes smaller than this')
+    args = parser.parse_args()
+
+    print(f'{"scenario":<32}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}', file=sys.stderr)
+    with test_database(), tempfile.TemporaryDirectory() as media_root:
+        from django.test import override_settings
+
+        with override_settings(MEDIA_ROOT=media_root):
+            results = run(args)
+
+    if args.save or not os.path.exists(args.baseline):
+        import django
+        with open(args.baseline, 'w') as stream:
+            json.dump({
+                'environment': {
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'machine': platform.machine(),
+                    'seed': {'users': args.users, 'courses': args.courses, 'lessons': args.lessons},
+                    'requests': args.requests,
+                },
+                'results': results,
+            }, stream, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}', file=sys.stderr)
+        return
+
+    with open(args.baseline) as stream:
+        baseline = json.load(stream)['results']
+    regressions = compare(baseline, results, args.threshold, args.min_delta_ms)
+    if regressions:
+        print('Regressions against the baseline:', file=sys.stderr)
+        for regression in regressions:
+            print(f'  {regression}', file=sys.stderr)
+        sys.exit(1)
+    print('No regressions against the baseline.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+JSON rendering, parsing and compression throughput by payload size.
+
+Payloads are lists of lesson-like dicts, as ``LessonSerializer`` returns
+them, from 1 KB to 50 MB of JSON. Rendering and parsing compare DRF's
+``JSONRenderer``/``JSONParser`` with ``config.renderers`` using orjson
+(when installed) and its stdlib fallback; compression reports the time
+and ratio of each coding ``config.compression`` can negotiate.
+
+    python -m benchmarks.renderers [--sizes 1 10 100 1000 10000 50000]
+"""
+import argparse
+import io
+from unittest import mock
+
+from benchmarks import setup_django, timed
+
+
+def lesson(index):
+    return {
+        'id': index,
+        'title': f'Lesson {index}: получение данных',
+        'description': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+        'preview': f'http://testserver/media/lessons/previews/{index}.png',
+        'preview_variants': None,
+        'video_url': f'https://example.com/videos/{index}',
+        'course': index // 50 + 1,
+        'owner': None,
+        'created_at': '2024-05-01T12:30:15.123456Z',
+        'updated_at': '2024-05-02T08:00:00Z',
+    }
+
+
+def payload(kilobytes):
+    from rest_framework.renderers import JSONRenderer
+
+    row_size = len(JSONRenderer().render(lesson(0))) + 1
+    rows = max(1, kilobytes * 1024 // row_size)
+    return {'next': None, 'previous': None, 'results': [lesson(index) for index in range(rows)]}
+
+
+def megabytes_per_second(size, seconds):
+    return size / 1024 / 1024 / seconds
+
+
+def run(sizes):
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from config import compression, renderers
+
+    repeat = 3
+    print(f'{"size":>9}  {"codec":<16}{"render MB/s":>12}{"parse MB/s":>12}{"speedup":>9}')
+    for kilobytes in sizes:
+        data = payload(kilobytes)
+        content = JSONRenderer().render(data)
+        size = len(content)
+        label = f'{size / 1024:,.0f} KB'
+        codecs = [('drf', JSONRenderer(), JSONParser(), None)]
+        if renderers.orjson is not None:
+            codecs.append(('fast, orjson', renderers.FastJSONRenderer(), renderers.FastJSONParser(), renderers.orjson))
+        codecs.append(('fast, stdlib', renderers.FastJSONRenderer(), renderers.FastJSONParser(), None))
+        baseline = None
+        for name, renderer, parser, orjson in codecs:
+            with mock.patch.object(renderers, 'orjson', orjson):
+                render_time, rendered = timed(lambda: renderer.render(data), repeat)
+                parse_time, parsed = timed(lambda: parser.parse(io.BytesIO(content)), repeat)
+            assert rendered == content and parsed == data, name
+            baseline = baseline or render_time
+            print(
+                f'{label:>9}  {name:<16}{megabytes_per_second(size, render_time):>12,.0f}'
+                f'{megabytes_per_second(size, parse_time):>12,.0f}{baseline / render_time:>8.1f}x'
+            )
+
+        for coding, compress in compression.available_encodings().items():
+            compress_time, compressed = timed(lambda: compress(content), repeat)
+            print(
+                f'{label:>9}  {coding:<16}{megabytes_per_second(size, compress_time):>12,.0f}'
+                f'{"":>12}  ratio {size / len(compressed):.1f}'
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 1000, 10000, 50000],
+                        help='Payload sizes in KB.')
+    args = parser.parse_args()
+    setup_django()
+    run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Rows/sec of the regular serializers versus the values() fast path.
+
+    python -m benchmarks.serialization [--sizes 1000 10000 100000]
+"""
+import argparse
+
+from benchmarks import test_database, timed
+
+
+def seed(size):
+    from materials import counters
+    from materials.models import Course, Lesson
+    from users.models import User
+
+    # Lessons go with their courses, which skips their counter updates.
+    Course.objects.all().delete()
+    User.objects.all().delete()
+
+    courses = Course.objects.bulk_create(
+        Course(title=f'Course {index}', description='Description', preview=f'courses/previews/{index}.png')
+        for index in range(size)
+    )
+    Lesson.objects.bulk_create(
+        (
+            Lesson(
+                course=courses[index % len(courses)],
+                title=f'Lesson {index}',
+                description='Lorem ipsum ' * 20,
+                preview=f'lessons/previews/{index}.png',
+                video_url=f'https://example.com/videos/{index}'
+            )
+            for index in range(size)
+        ),
+        batch_size=5000
+    )
+    counters.repair()
+    User.objects.bulk_create(
+        (User(email=f'user{index}@example.com', city='Kazan') for index in range(size)),
+        batch_size=5000
+    )
+
+
+def run(sizes):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from config.fastpath import ValuesSerializer
+    from materials.models import Course, Lesson
+    from materials.serializers import CourseListSerializer, LessonSerializer
+    from users.models import User
+    from users.serializers import UserSerializer
+
+    request = Request(APIRequestFactory().get('/'))
+
+    cases = [
+        ('lessons', LessonSerializer, lambda: Lesson.objects.all()),
+        ('courses', CourseListSerializer, lambda: Course.objects.all()),
+        ('users', UserSerializer, lambda: User.objects.all()),
+    ]
+
+    print(f'{"resource":<10}{"rows":>10}{"serializer rows/s":>20}{"fast path rows/s":>20}{"speedup":>10}')
+    for size in sizes:
+        seed(size)
+        for name, serializer_class, get_queryset in cases:
+            context = {'request': request}
+
+            def regular():
+                return serializer_class(get_queryset(), many=True, context=context).data
+
+            def fast():
+                queryset = get_queryset()
+                values_serializer = ValuesSerializer.compile(
+                    serializer_class(context=context), annotations=queryset.query.annotations
+                )
+                return values_serializer.serialize(queryset.values(*values_serializer.columns))
+
+            slow_time, slow_rows = timed(regular)
+            fast_time, fast_rows = timed(fast)
+            assert [dict(row) for row in slow_rows] == fast_rows
+            print(
+                f'{name:<10}{size:>10}{size / slow_time:>20,.0f}{size / fast_time:>20,.0f}'
+                f'{slow_time / fast_time:>9.1f}x'
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    with test_database():
+        run(args.sizes)
+
+
+if __name__ == '__main__':
+    main()
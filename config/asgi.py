@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed through ``ASGI_ROOT_URLCONF``, which serves the read
+endpoints with async-native views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +11,22 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+
+class AsyncReadASGIHandler(ASGIHandler):
+    """ASGI handler that resolves requests against ``ASGI_ROOT_URLCONF``."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = getattr(settings, 'ASGI_ROOT_URLCONF', settings.ROOT_URLCONF)
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncReadASGIHandler()
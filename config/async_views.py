@@ -0,0 +1,163 @@
+"""
+Async-native read handlers for DRF views, served under ASGI.
+
+``AsyncReadMixin.as_async_view(action)`` returns an ``async def`` view
+that runs a DRF view's read action without leaving the event loop: the
+request goes through the usual negotiation, authentication, permission
+and throttling steps, and the view's ``a<action>`` handler reads through
+the async ORM. Responses are rendered by the same renderers, so they
+match the synchronous views.
+
+Anything the async path cannot reproduce exactly is handed to the
+regular view in a worker thread: writes, non-JSON renderers (e.g. the
+browsable API), authentication classes other than session, basic and
+those with an ``aauthenticate`` coroutine, basic credentials, and any
+handler that returns None.
+``config.urls_asgi`` wires these views in front of the regular routes.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import resolve
+from rest_framework.authentication import (
+    BasicAuthentication, SessionAuthentication, get_authorization_header
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.viewsets import ViewSetMixin
+
+ASYNC_READ_METHODS = ('GET', 'HEAD')
+ASYNC_AUTHENTICATION_CLASSES = (SessionAuthentication, BasicAuthentication)
+
+
+async def run_sync_view(request):
+    """Serve ``request`` with the view the regular URLconf resolves it to."""
+    match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+    request.resolver_match = match
+    return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+
+def detach(response):
+    """
+    Render ``response`` and copy it into a plain HttpResponse, so Django
+    does not render it again in a worker thread.
+    """
+    if not hasattr(response, 'render'):
+        return response
+    response.render()
+    detached = HttpResponse(
+        response.content, status=response.status_code, headers=dict(response.items())
+    )
+    detached.cookies = response.cookies
+    return detached
+
+
+class AsyncReadMixin:
+    """
+    Serve a read action natively under ASGI.
+
+    Views mixing this in implement ``a<action>`` coroutines (``alist``,
+    ``aretrieve``, ...) that mirror the synchronous handlers and return
+    None when the request needs the regular path.
+    """
+
+    @classmethod
+    def as_async_view(cls, action, **initkwargs):
+        async def view(request, *args, **kwargs):
+            if request.method in ASYNC_READ_METHODS and getattr(settings, 'ASYNC_READ_VIEWS', True):
+                self = cls(**initkwargs)
+                response = await self.adispatch(action, request, *args, **kwargs)
+                if response is not None:
+                    return response
+            return await run_sync_view(request)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        # Mirrors APIView.as_view; session CSRF checks happen in the view.
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, action, request, *args, **kwargs):
+        handler = getattr(self, f'a{action}', None)
+        if handler is None:
+            return None
+        if isinstance(self, ViewSetMixin):
+            self.action_map = {'get': action, 'head': action}
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            if not await self.ainitial(request, *args, **kwargs):
+                return None
+            response = await handler(request, *args, **kwargs)
+            if response is None:
+                return None
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return detach(self.response)
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Async ``initial``; returns False when the request must take the
+        regular path.
+        """
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return False
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        if not await self.aperform_authentication(request):
+            return False
+        self.check_permissions(request)
+        self.check_throttles(request)
+        return True
+
+    async def aperform_authentication(self, request):
+        """
+        Authenticate without blocking the event loop.
+
+        Session authentication, basic authentication without credentials
+        and authenticators providing ``aauthenticate`` can be reproduced
+        here. Reads are CSRF-safe, so session authentication reduces to an
+        active user check.
+        """
+        authenticators = request.authenticators
+        if not all(
+            isinstance(authenticator, ASYNC_AUTHENTICATION_CLASSES)
+            or hasattr(authenticator, 'aauthenticate')
+            for authenticator in authenticators
+        ):
+            return False
+
+        for authenticator in authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                try:
+                    user_auth = await authenticator.aauthenticate(request)
+                except Exception:
+                    request._not_authenticated()
+                    raise
+                if user_auth is not None:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user_auth
+                    return True
+            elif isinstance(authenticator, SessionAuthentication):
+                user = await request._request.auser()
+                if user and user.is_active:
+                    request._authenticator = authenticator
+                    request.user, request.auth = user, None
+                    return True
+            elif get_authorization_header(request)[:6].lower() == b'basic ':
+                # Checking the password is CPU-bound; leave it to a thread.
+                return False
+        request._not_authenticated()
+        return True
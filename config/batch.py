@@ -0,0 +1,193 @@
+"""
+Batch endpoint: many API calls in one round trip.
+
+``BatchView`` takes ``{"requests": [{"method", "path", "headers", "body"}]}``
+and answers ``{"responses": [{"status", "headers", "body"}]}`` in the same
+order. Sub-requests run one after another in this process: each path is
+resolved against ``ROOT_URLCONF`` and handed to its DRF view, which does
+its own permission checks, throttling, conditional requests and so on.
+They share the batch request's authentication, so the token or session
+is checked once, and its cookies; conditional and body headers of the
+batch request itself are not passed on.
+
+Identical reads (same method, path, query string and headers) are served
+once and their response repeated, until a write in the batch could have
+changed the answer. ``BATCH_MAX_REQUESTS`` caps the number of
+sub-requests and ``BATCH_MAX_COST`` their total cost, counted with
+``BATCH_REQUEST_COSTS`` per method; repeated reads cost nothing.
+"""
+import io
+import json
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_REQUEST_COSTS = {'GET': 1, 'HEAD': 1, 'OPTIONS': 1}
+DEFAULT_WRITE_COST = 5
+# Headers of the batch request that only apply to the batch request.
+UNSHARED_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING', 'HTTP_ACCEPT_ENCODING')
+
+
+def get_max_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', 30)
+
+
+def get_max_cost():
+    return getattr(settings, 'BATCH_MAX_COST', 60)
+
+
+def request_cost(method):
+    costs = getattr(settings, 'BATCH_REQUEST_COSTS', DEFAULT_REQUEST_COSTS)
+    return costs.get(method, DEFAULT_WRITE_COST)
+
+
+def read_key(item):
+    """Identity of a read for de-duplication, None for writes."""
+    if item['method'] not in SAFE_METHODS:
+        return None
+    return item['method'], item['path'], tuple(sorted(item['headers'].items()))
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.CharField()
+    headers = serializers.DictField(child=serializers.CharField(), default=dict)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith('/'):
+            raise serializers.ValidationError('Must be an absolute path.')
+        return value
+
+    def validate_headers(self, value):
+        return {name.lower(): header for name, header in value.items()}
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        if len(value) > get_max_requests():
+            raise serializers.ValidationError(
+                f'Ensure this field has no more than {get_max_requests()} elements.'
+            )
+        cost = 0
+        seen = set()
+        for item in value:
+            key = read_key(item)
+            if key is None:
+                seen.clear()
+            elif key in seen:
+                continue
+            else:
+                seen.add(key)
+            cost += request_cost(item['method'])
+        if cost > get_max_cost():
+            raise serializers.ValidationError(
+                f'Batch costs {cost}, more than the allowed {get_max_cost()}.'
+            )
+        return value
+
+
+def build_request(request, item):
+    """A request for ``item`` that shares the batch request's client state."""
+    url = urlsplit(item['path'])
+    content = b''
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in UNSHARED_META and not key.startswith('HTTP_IF_')
+    }
+    if 'body' in item:
+        content = json.dumps(item['body']).encode()
+        environ['CONTENT_TYPE'] = 'application/json'
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'SCRIPT_NAME': request.META.get('SCRIPT_NAME', ''),
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_LENGTH': str(len(content)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in item['headers'].items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    if hasattr(request._request, 'session'):
+        sub_request.session = request._request.session
+    if request.user.is_authenticated:
+        # Picked up by rest_framework.request.Request instead of running
+        # the authentication classes again.
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def error(status_code, detail):
+    return {'status': status_code, 'headers': {}, 'body': {'detail': detail}}
+
+
+class BatchView(APIView):
+    """Run several API requests and return all of their responses."""
+    permission_classes = [permissions.AllowAny]  # Для тестирования
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = []
+        seen = {}
+        for item in serializer.validated_data['requests']:
+            key = read_key(item)
+            if key is None:
+                seen.clear()
+            elif key in seen:
+                responses.append(seen[key])
+                continue
+            response = self.dispatch_item(request, item)
+            if key is not None:
+                seen[key] = response
+            responses.append(response)
+        return Response({'responses': responses})
+
+    def dispatch_item(self, request, item):
+        sub_request = build_request(request, item)
+        try:
+            match = resolve(sub_request.path_info, urlconf=settings.ROOT_URLCONF)
+        except Resolver404:
+            return error(status.HTTP_404_NOT_FOUND, 'Not found.')
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is None or not issubclass(view_class, APIView):
+            return error(status.HTTP_400_BAD_REQUEST, 'Only API endpoints can be batched.')
+        if issubclass(view_class, BatchView):
+            return error(status.HTTP_400_BAD_REQUEST, 'Batches cannot be nested.')
+
+        sub_request.resolver_match = match
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+            return error(status.HTTP_400_BAD_REQUEST, 'Streaming responses cannot be batched.')
+        headers = {
+            name: value for name, value in response.items()
+            if name.lower() not in ('content-type', 'content-length')
+        }
+        body = None if item['method'] == 'HEAD' else self.get_body(response)
+        return {'status': response.status_code, 'headers': headers, 'body': body}
+
+    def get_body(self, response):
+        if hasattr(response, 'data'):
+            return response.data
+        if not response.content:
+            return None
+        try:
+            return json.loads(response.content)
+        except ValueError:
+            return response.content.decode(response.charset)
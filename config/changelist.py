@@ -0,0 +1,158 @@
+"""
+Admin changelists for large tables.
+
+``LargeTableAdminMixin`` keeps a changelist page at a handful of indexed
+queries however many rows the table holds:
+
+* ``EstimatedCountPaginator`` takes the row count of an unfiltered list
+  from the database statistics instead of ``COUNT(*)``, and counts at
+  most ``count_limit`` rows of a filtered one;
+* the date hierarchy finds its years, months and days with one index
+  seek per period instead of truncating the date of every row.
+"""
+import datetime
+from functools import cache
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using='default'):
+    """
+    Approximate number of rows in ``model``'s table, or None when the
+    database offers no cheap estimate.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed.
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor != 'sqlite':
+            return None
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone():
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            if row:
+                return int(row[0].split()[0])
+    if not model._meta.pk.get_internal_type().endswith('AutoField'):
+        return None
+    # Without ANALYZE statistics the largest key bounds the row count; it
+    # is exact until rows are deleted.
+    return model._default_manager.using(using).aggregate(rows=Max('pk'))['rows'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts more than ``count_limit`` rows.
+
+    An unfiltered list larger than that reports the estimated table size;
+    a filtered one reports at most ``count_limit`` rows, so pages beyond
+    it are only reachable by narrowing the filter.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.count_limit:
+                return estimate
+        # Without ORDER BY the count stops after count_limit rows.
+        return queryset.order_by()[:self.count_limit].count()
+
+
+def next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1, month=1, day=1)
+    if kind == 'month':
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1, day=1)
+        return start.replace(month=start.month + 1, day=1)
+    return start + datetime.timedelta(days=1)
+
+
+class IndexedDatesMixin:
+    """
+    ``datetimes()`` that walks an index on the field: each year, month or
+    day costs one seek for the first row at or after its start, instead
+    of one scan truncating every row.
+
+    ``aggregate()`` answers plain ``Min``/``Max`` of fields with one seek
+    each too; databases scan the table when both are asked in one query.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if args or not kwargs or not all(
+            type(value) in (Min, Max) and isinstance(value.source_expressions[0], F)
+            and value.filter is None and not value.distinct
+            for value in kwargs.values()
+        ):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, value in kwargs.items():
+            name = value.source_expressions[0].name
+            ordering = name if type(value) is Min else f'-{name}'
+            result[alias] = (
+                self.filter(**{f'{name}__isnull': False})
+                .order_by(ordering).values_list(name, flat=True).first()
+            )
+        return result
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day') or order != 'ASC':
+            return super().datetimes(field_name, kind, order, tzinfo)
+        if timezone.is_naive(timezone.now()):
+            tzinfo = None
+        elif tzinfo is None:
+            tzinfo = timezone.get_current_timezone()
+
+        values = self.order_by(field_name).values_list(field_name, flat=True)
+        periods = []
+        value = values.first()
+        while value is not None:
+            if tzinfo is not None:
+                value = timezone.localtime(value, tzinfo)
+            start = value.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+            if kind in ('year', 'month'):
+                start = start.replace(day=1)
+            if kind == 'year':
+                start = start.replace(month=1)
+            end = next_period(start, kind)
+            if tzinfo is not None:
+                start = timezone.make_aware(start, tzinfo)
+                end = timezone.make_aware(end, tzinfo)
+            periods.append(start)
+            value = values.filter(**{f'{field_name}__gte': end}).first()
+        return periods
+
+
+@cache
+def indexed_dates_queryset(queryset_class):
+    return type(f'IndexedDates{queryset_class.__name__}', (IndexedDatesMixin, queryset_class), {})
+
+
+class LargeTableChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        queryset = queryset._chain()
+        queryset.__class__ = indexed_dates_queryset(type(queryset))
+        return queryset
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin options for tables too large to count or scan per page view."""
+    paginator = EstimatedCountPaginator
+    # The "N total" link would run an exact COUNT(*).
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
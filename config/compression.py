@@ -0,0 +1,160 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+``CompressionMiddleware`` compresses JSON and text bodies of at least
+``RESPONSE_COMPRESSION_MIN_SIZE`` bytes with brotli when the ``brotli``
+package is installed and the client prefers or accepts it, and with gzip
+otherwise. Smaller bodies are sent as they are: below about a kilobyte
+the saved bytes do not pay for the compression time.
+
+Streaming responses (exports, import progress) pass through untouched so
+their chunks still reach the client as they are produced.
+
+A compressed body gets its own strong ETag, the view's with ``-gzip`` or
+``-br`` appended inside the quotes. The suffix is stripped from
+``If-Match`` and ``If-None-Match`` before the view sees them, so the
+view's validators (and If-Match, which needs a strong ETag) keep working
+for clients that accept compression; a 304 gets the suffix back.
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compress_gzip(content):
+    return gzip.compress(content, compresslevel=getattr(settings, 'RESPONSE_GZIP_LEVEL', 6), mtime=0)
+
+
+def compress_brotli(content):
+    return brotli.compress(content, quality=getattr(settings, 'RESPONSE_BROTLI_QUALITY', 4))
+
+
+def available_encodings():
+    """Supported content codings, most preferred first."""
+    encodings = {'gzip': compress_gzip}
+    if brotli is not None:
+        encodings = {'br': compress_brotli, **encodings}
+    return encodings
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an ``Accept-Encoding`` header to its quality."""
+    qualities = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate(header):
+    """Return the coding to use for a request's ``Accept-Encoding``, or None."""
+    qualities = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in available_encodings():
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+CODING_SUFFIX_RE = re.compile(r'-(br|gzip)"')
+CONDITIONAL_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH')
+
+
+def add_coding_suffix(etag, coding):
+    """Strong ETag of ``etag``'s resource sent with content coding ``coding``."""
+    if etag.startswith('W/'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def strip_coding_suffixes(request):
+    """
+    Remove the coding suffixes from the request's ETag preconditions;
+    return the coding they named, if any.
+    """
+    coding = None
+    for header in CONDITIONAL_HEADERS:
+        value = request.META.get(header)
+        if value:
+            match = CODING_SUFFIX_RE.search(value)
+            if match:
+                coding = match.group(1)
+                request.META[header] = CODING_SUFFIX_RE.sub('"', value)
+    return coding
+
+
+def is_compressible(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type.startswith('text/') or media_type.endswith(('json', 'jsonl', 'javascript'))
+
+
+class CompressionMiddleware:
+    """Compress large JSON and text responses with brotli or gzip."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_coding = strip_coding_suffixes(request)
+        return self.process_response(request, self.get_response(request), request_coding)
+
+    async def __acall__(self, request):
+        request_coding = strip_coding_suffixes(request)
+        return self.process_response(request, await self.get_response(request), request_coding)
+
+    def process_response(self, request, response, request_coding=None):
+        if response.status_code == 304:
+            etag = response.get('ETag')
+            if etag and request_coding:
+                response['ETag'] = add_coding_suffix(etag, request_coding)
+            return response
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not is_compressible(response.get('Content-Type', ''))
+            or len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+        content = available_encodings()[coding](response.content)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag:
+            response['ETag'] = add_coding_suffix(etag, coding)
+        return response
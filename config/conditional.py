@@ -0,0 +1,130 @@
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalRequestMixin:
+    """
+    ETag / Last-Modified support for DRF views.
+
+    Views describe the state of the requested resource in
+    ``get_validator_query`` as a queryset and the aggregates to run over
+    it, usually timestamps and row counts. Nothing is serialized to
+    compute it. Reads with a matching ``If-None-Match``/``If-Modified-Since``
+    get a 304 and writes with a stale ``If-Match``/``If-Unmodified-Since``
+    get a 412.
+
+    Lists get no ``Last-Modified``: deleting a row does not move the
+    newest timestamp left, so it would keep answering 304. They rely on
+    the ETag, whose state has to change on deletions too.
+    """
+
+    conditional_read_methods = ('GET', 'HEAD')
+    listing = False
+
+    def get_validator_query(self):
+        """Return ``(queryset, aggregates)`` describing the resource state."""
+        raise NotImplementedError
+
+    def get_validators(self):
+        queryset, aggregates = self.get_validator_query()
+        return queryset.aggregate(**aggregates)
+
+    async def aget_validators(self):
+        queryset, aggregates = self.get_validator_query()
+        return await queryset.aaggregate(**aggregates)
+
+    def get_etag(self, request, state):
+        renderer = getattr(request, 'accepted_renderer', None)
+        payload = repr(sorted(state.items())) + (renderer.format if renderer else '')
+        return quote_etag(hashlib.md5(payload.encode(), usedforsecurity=False).hexdigest())
+
+    def get_last_modified(self, state):
+        if self.listing:
+            return None
+        timestamps = [value for value in state.values() if isinstance(value, datetime)]
+        if not timestamps:
+            return None
+        return int(max(timestamps).timestamp())
+
+    def list(self, request, *args, **kwargs):
+        self.listing = True
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().update, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().destroy, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        self.listing = True
+        return await self.aconditional_response(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_response(request, super().aretrieve, *args, **kwargs)
+
+    def needs_validators(self, request):
+        return request.method in self.conditional_read_methods or any(
+            header in request.META
+            for header in ('HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+        )
+
+    def evaluate_preconditions(self, request, state):
+        """
+        Return ``(response, etag, last_modified)``; ``response`` is the 304
+        or 412 to send instead of running the handler, or None.
+        """
+        if not any(state.values()):
+            # Nothing to validate against; let the handler answer (e.g. 404).
+            return None, None, None
+        etag = self.get_etag(request, state)
+        last_modified = self.get_last_modified(state)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None and response.status_code == 304:
+            response['ETag'] = etag
+        return response, etag, last_modified
+
+    def set_validator_headers(self, request, response, etag, last_modified):
+        if etag is None or request.method not in self.conditional_read_methods:
+            return
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        if not self.needs_validators(request):
+            return handler(request, *args, **kwargs)
+
+        response, etag, last_modified = self.evaluate_preconditions(
+            request, self.get_validators()
+        )
+        if response is not None:
+            return response
+
+        response = handler(request, *args, **kwargs)
+        self.set_validator_headers(request, response, etag, last_modified)
+        return response
+
+    async def aconditional_response(self, request, handler, *args, **kwargs):
+        if not self.needs_validators(request):
+            return await handler(request, *args, **kwargs)
+
+        response, etag, last_modified = self.evaluate_preconditions(
+            request, await self.aget_validators()
+        )
+        if response is not None:
+            return response
+
+        response = await handler(request, *args, **kwargs)
+        if response is not None:
+            self.set_validator_headers(request, response, etag, last_modified)
+        return response
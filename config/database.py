@@ -0,0 +1,144 @@
+"""
+SQLite database profiles and read/write routing.
+
+``sqlite_databases`` builds ``DATABASES`` for one SQLite file. The
+development profile is a single plain connection. The production profile
+(``DJANGO_DATABASE_PROFILE=production``) adds:
+
+* WAL journaling, so readers no longer wait for a writer to commit, with
+  ``synchronous=NORMAL``, a 64 MB page cache, 256 MB of memory-mapped I/O
+  and a busy timeout, applied to every new connection via the ``PRAGMAS``
+  entry of the alias;
+* persistent connections (``CONN_MAX_AGE``) checked before reuse;
+* a ``replica`` alias on the same file, opened with ``query_only``.
+
+``ReadRoutingMiddleware`` marks GET, HEAD and OPTIONS requests, and
+``ReadWriteRouter`` sends their reads to ``replica`` while every write goes
+to ``default``. WAL readers see each commit at once, so there is no
+replication lag to account for.
+
+Persistent connections only apply to WSGI workers; under ASGI each
+request runs in its own thread and Django closes its connections.
+"""
+import contextvars
+
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # Negative sizes are in KiB.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+_reading = contextvars.ContextVar('database_reading', default=False)
+
+
+def sqlite_databases(path, production=False, conn_max_age=600):
+    """``DATABASES`` for the SQLite file at ``path``."""
+    default = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    if not production:
+        return {PRIMARY: default}
+
+    options = {}
+    if django.VERSION >= (5, 1):
+        # Take the write lock at BEGIN, where SQLite waits out the busy
+        # timeout; a deferred transaction upgrading to a writer mid-way
+        # fails with "database is locked" at once.
+        options['transaction_mode'] = 'IMMEDIATE'
+    default.update({
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
+        'PRAGMAS': PRODUCTION_PRAGMAS,
+    })
+    replica = {
+        **default,
+        'OPTIONS': {},
+        # journal_mode belongs to the file and is set by the primary.
+        'PRAGMAS': {
+            **{name: value for name, value in PRODUCTION_PRAGMAS.items() if name != 'journal_mode'},
+            'query_only': 'ON',
+        },
+        'TEST': {'MIRROR': PRIMARY},
+    }
+    return {PRIMARY: default, REPLICA: replica}
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Run the ``PRAGMAS`` of a new SQLite connection's alias."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(apply_pragmas, dispatch_uid='config.database')
+
+
+class ReadWriteRouter:
+    """Reads of safe-method requests go to ``replica`` when it is configured."""
+
+    def db_for_read(self, model, **hints):
+        if _reading.get() and REPLICA in connections.settings:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances loaded from the replica.
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+class ReadRoutingMiddleware:
+    """Mark GET, HEAD and OPTIONS requests as reads for ``ReadWriteRouter``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _reading.set(request.method in SAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            _reading.reset(token)
+
+    async def __acall__(self, request):
+        token = _reading.set(request.method in SAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            _reading.reset(token)
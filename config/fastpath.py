@@ -0,0 +1,242 @@
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import timed_serialize
+
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _file_converter(field, model_field, request):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return None
+    storage = model_field.storage
+
+    if request is None:
+        def convert(name):
+            return storage.url(name) if name else None
+    else:
+        def convert(name):
+            return request.build_absolute_uri(storage.url(name)) if name else None
+    return convert
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over ``values()`` rows.
+
+    Compiled from a ModelSerializer instance (after any sparse fieldset
+    has been applied). Each readable field becomes a ``(name, column,
+    converter)`` triple that reproduces its ``to_representation`` without
+    building model instances, bound fields or ``FieldFile`` objects.
+    ``compile`` returns None for serializers it cannot reproduce exactly,
+    such as nested or dotted-source fields. Fields named in ``prepared``
+    are copied from the row as-is; the caller puts their already
+    serialized value there, e.g. a nested list loaded separately.
+    """
+
+    def __init__(self, plan, prepared=()):
+        self.plan = plan
+        self.columns = sorted({column for name, column, _ in plan if name not in prepared})
+
+    @classmethod
+    def compile(cls, serializer, annotations=(), prepared=()):
+        model = serializer.Meta.model
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        request = serializer.context.get('request')
+        plan = []
+
+        for field in serializer._readable_fields:
+            name, source = field.field_name, field.source
+            if name in prepared:
+                plan.append((name, name, None))
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in annotations:
+                    return None
+                plan.append((name, name, None))
+                continue
+            if source in annotations:
+                plan.append((name, source, None))
+                continue
+            model_field = concrete.get(source)
+            if model_field is None:
+                return None
+
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                converter = None
+            elif isinstance(field, serializers.DateTimeField):
+                converter = _datetime_converter(field)
+            elif isinstance(field, serializers.FileField):
+                converter = _file_converter(field, model_field, request)
+                if converter is None:
+                    return None
+            elif isinstance(field, IDENTITY_FIELDS):
+                converter = None
+            elif isinstance(field, (serializers.Serializer, serializers.ListSerializer,
+                                    serializers.RelatedField)):
+                return None
+            else:
+                converter = field.to_representation
+            plan.append((name, source, converter))
+        return cls(plan, prepared)
+
+    def to_representation(self, row):
+        data = {}
+        for name, column, convert in self.plan:
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def serialize(self, rows):
+        return timed_serialize(self._serialize, rows)
+
+    def _serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class FastReadMixin:
+    """
+    Serve list and retrieve from ``values()`` rows through ValuesSerializer.
+
+    Falls back to the regular serializer when the fast path is disabled
+    with ``FAST_READ_SERIALIZATION = False`` or the serializer cannot be
+    compiled. Output is identical to the regular path. ``alist`` and
+    ``aretrieve`` are the async ORM versions used by ``AsyncReadMixin``;
+    they return None where only the regular path applies.
+
+    Retrieve takes the regular path when a permission class checks
+    objects: ``has_object_permission`` needs the model instance, which
+    the fast path never builds.
+    """
+
+    def get_values_serializer(self, queryset):
+        if not getattr(settings, 'FAST_READ_SERIALIZATION', True):
+            return None
+        if queryset._prefetch_related_lookups:
+            return None
+        return ValuesSerializer.compile(self.get_serializer(), annotations=queryset.query.annotations)
+
+    def get_list_rows(self, queryset, values_serializer):
+        paginator = self.paginator
+        if hasattr(paginator, 'get_ordering'):
+            ordering = paginator.get_ordering(self.request, queryset, self)
+        else:
+            ordering = getattr(paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        columns = {*values_serializer.columns, *(name.lstrip('-') for name in ordering)}
+        return queryset.values(*sorted(columns))
+
+    def checks_object_permissions(self):
+        """Whether a permission class overrides ``has_object_permission``."""
+        return any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
+
+    def get_lookup(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_values_serializer(queryset)
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.get_list_rows(queryset, values_serializer)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.serialize(page))
+        return Response(values_serializer.serialize(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_values_serializer(queryset)
+        if values_serializer is None or self.checks_object_permissions():
+            return super().retrieve(request, *args, **kwargs)
+
+        row = get_object_or_404(queryset.values(*values_serializer.columns), **self.get_lookup())
+        return Response(timed_serialize(values_serializer.to_representation, row))
+
+    def get_async_values_serializer(self, queryset):
+        """
+        Values serializer for the async handlers. Views that load some
+        fields separately compile them as ``prepared`` and fill them in
+        ``aprepare_rows``.
+        """
+        return self.get_values_serializer(queryset)
+
+    async def aprepare_rows(self, rows):
+        pass
+
+    async def alist(self, request, *args, **kwargs):
+        paginator = self.paginator
+        if paginator is not None and not hasattr(paginator, 'apaginate_queryset'):
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_async_values_serializer(queryset)
+        if values_serializer is None:
+            return None
+
+        rows = self.get_list_rows(queryset.prefetch_related(None), values_serializer)
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(rows, request, view=self)
+            if page is not None:
+                await self.aprepare_rows(page)
+                return self.get_paginated_response(values_serializer.serialize(page))
+        rows = [row async for row in rows]
+        await self.aprepare_rows(rows)
+        return Response(values_serializer.serialize(rows))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_async_values_serializer(queryset)
+        if values_serializer is None or self.checks_object_permissions():
+            return None
+
+        try:
+            row = await queryset.prefetch_related(None).values(
+                *values_serializer.columns
+            ).aget(**self.get_lookup())
+        except queryset.model.DoesNotExist:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        await self.aprepare_rows([row])
+        return Response(timed_serialize(values_serializer.to_representation, row))
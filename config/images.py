@@ -0,0 +1,194 @@
+"""
+Resized image variants for uploaded previews and avatars.
+
+When a model registered with ``register`` saves a newly uploaded image,
+resized WebP/JPEG variants are generated after the transaction commits,
+in a thread pool off the request path. They are stored next to the
+original as ``<name>.<size>.<ext>``. ``ImageVariantsField`` exposes
+their URLs from serializers.
+"""
+import io
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (64, 256, 1024)
+DEFAULT_FORMATS = ('webp', 'jpeg')
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+VARIANT_RE = re.compile(r'\.\d+\.(?:webp|jpg)$')
+
+# (model, field names) pairs registered with ``register``
+registry = []
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sizes():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_SIZES', DEFAULT_SIZES))
+
+
+def get_formats():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_FORMATS', DEFAULT_FORMATS))
+
+
+def variant_name(name, size, image_format):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{size}.{EXTENSIONS[image_format]}'
+
+
+def variant_names(name):
+    return [
+        variant_name(name, size, image_format)
+        for size in get_sizes()
+        for image_format in get_formats()
+    ]
+
+
+def is_variant(name):
+    return bool(VARIANT_RE.search(name))
+
+
+def referenced(names, batch_size=500):
+    """The subset of ``names`` stored in a field registered with ``register``."""
+    names = list(names)
+    found = set()
+    for start in range(0, len(names), batch_size):
+        batch = names[start:start + batch_size]
+        for model, field_names in registry:
+            for field_name in field_names:
+                found.update(
+                    model._default_manager.filter(**{f'{field_name}__in': batch})
+                    .values_list(field_name, flat=True)
+                )
+    return found
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'jpeg':
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage=None):
+    """Write every size/format variant of ``name`` and return their names."""
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    created = []
+    for size in get_sizes():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for image_format in get_formats():
+            target = variant_name(name, size, image_format)
+            if storage.exists(target):
+                storage.delete(target)
+            created.append(storage.save(target, ContentFile(_encode(resized, image_format))))
+    return created
+
+
+def _generate_logged(name):
+    try:
+        return generate_variants(name)
+    except Exception:
+        logger.exception('Could not generate image variants for %s', name)
+        return []
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def schedule(name):
+    """Generate variants of ``name`` once the current transaction commits."""
+    def submit():
+        if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            get_executor().submit(_generate_logged, name)
+        else:
+            _generate_logged(name)
+    transaction.on_commit(submit)
+
+
+def register(model, *field_names):
+    """Generate variants whenever ``model`` saves a new upload in ``field_names``."""
+
+    def remember_uploads(sender, instance, **kwargs):
+        instance._pending_image_fields = [
+            field_name for field_name in field_names
+            if getattr(instance, field_name) and not getattr(instance, field_name)._committed
+        ]
+
+    def schedule_uploads(sender, instance, **kwargs):
+        for field_name in getattr(instance, '_pending_image_fields', ()):
+            schedule(getattr(instance, field_name).name)
+        instance._pending_image_fields = []
+
+    if (model, field_names) not in registry:
+        registry.append((model, field_names))
+    uid = f'image-variants:{model._meta.label}'
+    pre_save.connect(remember_uploads, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(schedule_uploads, sender=model, weak=False, dispatch_uid=uid)
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized variants of an image, keyed by size then format.
+
+    Accepts a FieldFile or a stored file name, so the values() fast path
+    renders it exactly like the regular serializer. Variants are created
+    asynchronously and may briefly be missing after an upload.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for size in get_sizes():
+            urls[str(size)] = {}
+            for image_format in get_formats():
+                url = default_storage.url(variant_name(name, size, image_format))
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[str(size)][image_format] = url
+        return urls
@@ -0,0 +1,245 @@
+"""
+Serving uploaded media from the application.
+
+``HashedFileSystemStorage`` stores every upload under a name carrying a
+hash of its content (``photo-3f2a9c1b7e4d.jpg``), so a name never refers
+to other bytes and ``serve_media`` can send those files with a one-year
+``immutable`` Cache-Control. Image variants keep the name derived from
+their original (``config.images``) and, like files uploaded before the
+storage was introduced, are revalidated on every use instead.
+
+``schedule_cleanup`` deletes files freed by a write, with their image
+variants, in a background thread once the transaction commits. The queue
+lives in memory; whatever it loses is found by ``prune_media``.
+
+``serve_media`` answers conditional requests (``If-None-Match``,
+``If-Modified-Since``, ...) from the file's size and modification time,
+and single byte ranges with 206 or 416. File bodies go out through
+``FileResponse``, which WSGI servers hand to ``sendfile()`` through
+``wsgi.file_wrapper``. With ``MEDIA_SENDFILE_HEADER`` set to
+``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache, lighttpd) the
+body is left to the front proxy instead.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import close_old_connections, transaction
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from . import images
+
+logger = logging.getLogger(__name__)
+
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(r'-[0-9a-f]{12}(?:_[0-9A-Za-z]{7})?\.[^./]+$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+
+def hashed_name(name, content):
+    """``name`` with a hash of ``content`` appended to its root."""
+    digest = hashlib.md5(usedforsecurity=False)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    root, ext = os.path.splitext(name)
+    return f'{root}-{digest.hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def is_immutable(name):
+    return bool(HASHED_NAME_RE.search(name)) and not images.is_variant(name)
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage naming uploads after their content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if not images.is_variant(name):
+            name = hashed_name(name, content)
+        return super().save(name, content, max_length)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def delete_files(names, storage=None):
+    """
+    Delete ``names`` and their image variants, skipping any name a
+    registered image field still refers to. Return the deleted names.
+    """
+    storage = storage or default_storage
+    names = set(names)
+    deleted = []
+    for name in sorted(names - images.referenced(names)):
+        for target in (name, *images.variant_names(name)):
+            if storage.exists(target):
+                storage.delete(target)
+                deleted.append(target)
+    return deleted
+
+
+def _delete_logged(names):
+    try:
+        return delete_files(names)
+    except Exception:
+        logger.exception('Could not delete media files %s', names)
+        return []
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-cleanup')
+        return _executor
+
+
+def schedule_cleanup(names):
+    """Delete ``names`` (see ``delete_files``) once the current transaction commits."""
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    def submit():
+        if getattr(settings, 'MEDIA_CLEANUP_ASYNC', True):
+            get_executor().submit(_delete_logged, names)
+        else:
+            delete_files(names)
+    transaction.on_commit(submit)
+
+
+class FileRange:
+    """Read ``length`` bytes of ``file`` from its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # Servers using sendfile() start at the file's position and send
+        # Content-Length bytes.
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` of a single byte range, both inclusive, or None when
+    the header is not one or asks for nothing in the file.
+    """
+    match = RANGE_RE.match(header)
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last N bytes.
+        return (max(size - int(last), 0), size - 1) if int(last) and size else None
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """Whether ``If-Range`` (if any) still matches the file."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve ``path`` from ``MEDIA_ROOT``."""
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('File not found.')
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404('File not found.')
+
+    size = stat_result.st_size
+    last_modified = int(stat_result.st_mtime)
+    etag = quote_etag(f'{stat_result.st_mtime_ns:x}-{size:x}')
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    if encoding or not content_type:
+        # Compressed files go out as they are, without Content-Encoding.
+        content_type = 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if is_immutable(path) else REVALIDATE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response.headers.setdefault(name, value)
+        return response
+
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if sendfile_header:
+        # The proxy answers ranges itself.
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if sendfile_header.lower() == 'x-accel-redirect':
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response[sendfile_header] = prefix + path
+        else:
+            response[sendfile_header] = fullpath
+        return response
+
+    byte_range = None
+    requested = request.META.get('HTTP_RANGE', '').replace(' ', '')
+    if RANGE_RE.match(requested) and range_applies(request, etag, last_modified):
+        byte_range = parse_range(requested, size)
+        if byte_range is None:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        return FileResponse(file, content_type=content_type, headers=headers)
+    start, end = byte_range
+    file.seek(start)
+    response = FileResponse(
+        FileRange(file, end - start + 1), status=206, content_type=content_type, headers=headers
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
@@ -0,0 +1,288 @@
+"""
+Per-request performance instrumentation.
+
+``ServerTimingMiddleware`` measures every request: wall time, number and
+time of SQL queries, time spent in serializers and response size. The
+numbers go out in a ``Server-Timing`` header and into per-route
+histograms, which ``MetricsView`` exposes in the Prometheus text format
+with p50/p95/p99 estimates.
+
+SQL queries are counted by an execute wrapper installed on every
+database connection; it does nothing outside a measured request. The
+current request's counters live in a context variable, so queries run by
+the async ORM in Django's sync thread are attributed correctly.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import permissions
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+QUANTILES = (0.5, 0.95, 0.99)
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for the request being served."""
+    __slots__ = ('queries', 'db_time', 'serialize_time', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper counting and timing queries of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_timer(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Add the time spent in ``to_representation`` to the request's
+    serializer time. Nested serializers are covered by the outermost one.
+    """
+
+    def to_representation(self, instance):
+        return timed_serialize(super().to_representation, instance)
+
+
+def timed_serialize(function, *args):
+    """Call ``function`` counting its time as serializer time."""
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        return function(*args)
+    metrics.serializing = True
+    start = time.perf_counter()
+    try:
+        return function(*args)
+    finally:
+        metrics.serialize_time += time.perf_counter() - start
+        metrics.serializing = False
+
+
+class Histogram:
+    """
+    Fixed exponential buckets; quantiles are interpolated within a bucket,
+    so estimates are within one bucket width (about 19%) of the truth.
+    """
+
+    def __init__(self, start, buckets, factor=2 ** 0.25):
+        self.bounds = [start * factor ** index for index in range(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.duration = Histogram(0.0001, 100)
+        self.db_time = Histogram(0.0001, 100)
+        self.queries = Histogram(1, 60)
+        self.serialize_time = Histogram(0.0001, 100)
+        self.size = Histogram(64, 100)
+        self.statuses = {}
+
+
+# Exposed metric name -> (RouteMetrics attribute, help text)
+SUMMARIES = {
+    'http_request_duration_seconds': ('duration', 'Request wall time.'),
+    'http_request_db_seconds': ('db_time', 'Time spent in SQL queries per request.'),
+    'http_request_db_queries': ('queries', 'SQL queries per request.'),
+    'http_request_serialize_seconds': ('serialize_time', 'Time spent in serializers per request.'),
+    'http_response_size_bytes': ('size', 'Response body size.'),
+}
+
+
+class Registry:
+    """Per-route metrics of this process."""
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def observe(self, route, method, status, duration, metrics, size):
+        with self.lock:
+            route_metrics = self.routes.get((route, method))
+            if route_metrics is None:
+                route_metrics = self.routes[(route, method)] = RouteMetrics()
+            route_metrics.duration.observe(duration)
+            route_metrics.db_time.observe(metrics.db_time)
+            route_metrics.queries.observe(metrics.queries)
+            route_metrics.serialize_time.observe(metrics.serialize_time)
+            if size is not None:
+                route_metrics.size.observe(size)
+            route_metrics.statuses[status] = route_metrics.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            routes = sorted(self.routes.items())
+            for name, (attribute, help_text) in SUMMARIES.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} summary')
+                for (route, method), route_metrics in routes:
+                    histogram = getattr(route_metrics, attribute)
+                    labels = f'route="{route}",method="{method}"'
+                    for q in QUANTILES:
+                        lines.append(f'{name}{{{labels},quantile="{q}"}} {histogram.quantile(q):.6g}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6g}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            lines.append('# HELP http_responses_total Responses by route, method and status.')
+            lines.append('# TYPE http_responses_total counter')
+            for (route, method), route_metrics in routes:
+                for status, count in sorted(route_metrics.statuses.items()):
+                    lines.append(
+                        f'http_responses_total{{route="{route}",method="{method}",'
+                        f'status="{status}"}} {count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return (match.view_name or match.route or 'unnamed').replace('"', '')
+
+
+class ServerTimingMiddleware:
+    """
+    Measure each request and emit the results as ``Server-Timing``.
+
+    Install it first in ``MIDDLEWARE`` so the wall time covers the other
+    middleware. ``SERVER_TIMING_HEADER = False`` keeps the histograms but
+    drops the header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_timer, dispatch_uid='config.metrics')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, duration):
+        size = None if response.streaming else len(response.content)
+        method = request.method if request.method in METHODS else 'OTHER'
+        registry.observe(route_name(request), method, response.status_code, duration, metrics, size)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            timings = [
+                f'total;dur={duration * 1000:.2f}',
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+                f'serialize;dur={metrics.serialize_time * 1000:.2f}',
+            ]
+            if size is not None:
+                timings.append(f'size;desc="{size} bytes"')
+            response['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode(self.charset)
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Always use the first renderer; scrapers send varied Accept headers."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class MetricsView(APIView):
+    """
+    Per-route request metrics of this process in Prometheus text format.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request):
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
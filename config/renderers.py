@@ -0,0 +1,129 @@
+"""
+Fast JSON rendering and parsing for DRF.
+
+``FastJSONRenderer`` and ``FastJSONParser`` encode with ``orjson`` when it
+is installed, several times faster than the stdlib on large list
+responses, and otherwise with a reused stdlib encoder whose fallback
+conversions are looked up by type. Both produce the same bytes as DRF's
+``JSONRenderer`` for serializer output: datetimes end in ``Z`` for UTC,
+lazy translation strings become text, and files not yet turned into URLs
+by a serializer are written as their URL.
+
+Indented output (the browsable API), ASCII-only output and non-strict
+JSON go through DRF's own implementation. Unlike DRF, orjson writes NaN
+and infinite floats as ``null`` instead of failing.
+"""
+import datetime
+import json
+import uuid
+
+from django.db.models.fields.files import FieldFile
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def file_url(value):
+    return value.url if value else None
+
+
+def datetime_string(value):
+    representation = value.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+class FastJSONEncoder(encoders.JSONEncoder):
+    """DRF's encoder with its common conversions dispatched by exact type."""
+    conversions = {
+        datetime.datetime: datetime_string,
+        datetime.date: datetime.date.isoformat,
+        uuid.UUID: str,
+        bytes: bytes.decode,
+    }
+
+    def default(self, obj):
+        conversion = self.conversions.get(type(obj))
+        if conversion is not None:
+            return conversion(obj)
+        if isinstance(obj, Promise):
+            return force_str(obj)
+        if isinstance(obj, FieldFile):
+            return file_url(obj)
+        return super().default(obj)
+
+
+_drf_encoder = FastJSONEncoder()
+_stdlib_encoder = FastJSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def orjson_default(obj):
+    # orjson handles datetimes, dates, UUIDs and str/dict/list subclasses itself.
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, FieldFile):
+        return file_url(obj)
+    return _drf_encoder.default(obj)
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes for ``data``."""
+    if orjson is None:
+        content = _stdlib_encoder.encode(data).encode()
+    else:
+        try:
+            content = orjson.dumps(data, default=orjson_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers wider than 64 bits, among others; the stdlib encoder
+            # copes with them or raises the error DRF would.
+            content = _stdlib_encoder.encode(data).encode()
+    # Like DRF, escape the separators JavaScript does not allow in strings.
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder_class = FastJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        try:
+            if orjson is not None:
+                return orjson.loads(content)
+            return json.loads(content, parse_constant=reject_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def reject_constant(value):
+    raise ValueError(f'Out of range float values are not JSON compliant: {value!r}')
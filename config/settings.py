@@ -7,6 +7,8 @@ Generated by 'django-admin startproject' using Django 4.2.
 from pathlib import Path
 import os
 
+from config.database import sqlite_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.ServerTimingMiddleware',
+    'config.compression.CompressionMiddleware',
+    'config.database.ReadRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +58,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'config.urls'
 
+# URLconf used under ASGI; read endpoints get async-native views there
+ASGI_ROOT_URLCONF = 'config.urls_asgi'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -75,13 +83,39 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# DJANGO_DATABASE_PROFILE=production enables WAL, tuned pragmas, persistent
+# connections and a read-only connection for GET requests (config.database)
+DATABASES = sqlite_databases(
+    os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+    production=os.environ.get('DJANGO_DATABASE_PROFILE') == 'production'
+)
+
+DATABASE_ROUTERS = ['config.database.ReadWriteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'projectdrf',
+    },
+    'profiles': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'projectdrf-profiles',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+# Cache alias and timeout (seconds) for course and lesson read responses
+MATERIALS_CACHE_ALIAS = 'default'
+MATERIALS_CACHE_TIMEOUT = 300
+
+# Cache alias and timeout (seconds) for serialized user profiles (users.cache)
+USER_PROFILE_CACHE_ALIAS = 'profiles'
+USER_PROFILE_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -123,6 +157,34 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored under content-hashed names (config.media)
+STORAGES = {
+    'default': {
+        'BACKEND': 'config.media.HashedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Serve MEDIA_URL from the application (config.media.serve_media). Set
+# MEDIA_SENDFILE_HEADER to 'X-Accel-Redirect' (nginx, files internal under
+# MEDIA_ACCEL_REDIRECT_PREFIX) or 'X-Sendfile' to let the front proxy send
+# the file bodies
+SERVE_MEDIA = True
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Resized variants of uploaded images (config.images)
+IMAGE_VARIANT_SIZES = (64, 256, 1024)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+IMAGE_VARIANT_WORKERS = 2
+IMAGE_VARIANTS_ASYNC = True
+
+# Delete files freed by course deletion in a background thread
+# (config.media.schedule_cleanup); prune_media finds whatever it misses
+MEDIA_CLEANUP_ASYNC = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -135,9 +197,62 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'users.authentication.TokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
+}
+
+# Compress JSON and text responses from this size (bytes) with brotli,
+# when installed, or gzip (config.compression)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+RESPONSE_GZIP_LEVEL = 6
+RESPONSE_BROTLI_QUALITY = 4
+
+# Limits of the batch endpoint (config.batch): sub-requests per batch and
+# their total cost, counted per method; repeated reads are free
+BATCH_MAX_REQUESTS = 30
+BATCH_MAX_COST = 60
+BATCH_REQUEST_COSTS = {
+    'GET': 1,
+    'HEAD': 1,
+    'OPTIONS': 1,
+    'POST': 5,
+    'PUT': 5,
+    'PATCH': 5,
+    'DELETE': 5,
 }
 
+# Tokens verified per process (users.authentication) and how long (seconds)
+# a verified token is trusted before it is looked up again
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 30
+
+# Days the change feed (materials.changes) keeps entries; older sync
+# tokens must download the catalog again
+SYNC_RETENTION_DAYS = 30
+
+# Password hashing processes for user imports (users.imports); None uses
+# one per CPU
+USER_IMPORT_WORKERS = None
+
+# Serve read-only list/retrieve actions from values() rows (config.fastpath)
+FAST_READ_SERIALIZATION = True
+
+# Send per-request timings in a Server-Timing header (config.metrics)
+SERVER_TIMING_HEADER = True
+
+# Answer GET/HEAD reads under ASGI without leaving the event loop (config.async_views)
+ASYNC_READ_VIEWS = True
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+from django.utils.functional import cached_property
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_names(value):
+    """Split a comma separated query parameter into a list of names."""
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class FieldSelection(namedtuple('FieldSelection', ['fields', 'nested', 'expand'])):
+    """Fields requested by the client; ``fields`` is None when unrestricted."""
+
+    def wants(self, name):
+        return self.fields is None or name in self.fields
+
+    def model_fields(self, model, always=('id',), sources=None):
+        """
+        Concrete model fields to load with ``only()`` for ``fields``.
+
+        ``sources`` maps serializer fields to the model field they read
+        when the names differ.
+        """
+        sources = sources or {}
+        concrete = {field.name for field in model._meta.concrete_fields}
+        names = set(always)
+        for name in self.fields or concrete:
+            name = sources.get(name, name)
+            if name in concrete:
+                names.add(name)
+        return sorted(names)
+
+
+class DynamicFieldsSerializerMixin:
+    """
+    Serializer that drops fields not listed in the ``fields`` argument.
+
+    ``nested_fields`` maps a nested serializer field to the names to keep
+    on it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        nested_fields = kwargs.pop('nested_fields', None) or {}
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name, names in nested_fields.items():
+            if name not in self.fields:
+                continue
+            nested = self.fields[name]
+            nested = getattr(nested, 'child', nested)
+            for nested_name in set(nested.fields) - set(names):
+                nested.fields.pop(nested_name)
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``).
+
+    ``?fields=id,title,lessons.title`` limits the response to the listed
+    fields; a dotted name restricts a nested serializer and implies its
+    expansion. ``?expand=`` turns on nested fields from
+    ``expandable_fields`` that an action leaves out by default. Only safe
+    methods are affected, so writes always use the full serializer.
+    Views use ``field_selection`` to skip columns and prefetches.
+    """
+    expandable_fields = ()
+
+    @cached_property
+    def field_selection(self):
+        request = self.request
+        if request is None or request.method not in SAFE_METHODS:
+            return FieldSelection(None, {}, set())
+
+        requested = parse_names(request.query_params.get('fields'))
+        expand = {
+            name for name in parse_names(request.query_params.get('expand')) or []
+            if name in self.expandable_fields
+        }
+        if requested is None:
+            return FieldSelection(None, {}, expand)
+
+        fields, nested = [], {}
+        for name in requested:
+            parent, _, child = name.partition('.')
+            if child:
+                nested.setdefault(parent, []).append(child)
+                if parent in self.expandable_fields:
+                    expand.add(parent)
+                name = parent
+            if name not in fields:
+                fields.append(name)
+        fields.extend(name for name in sorted(expand) if name not in fields)
+        return FieldSelection(fields, nested, expand)
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.field_selection
+        if selection.fields is not None:
+            kwargs.setdefault('fields', selection.fields)
+        if selection.nested:
+            kwargs.setdefault('nested_fields', selection.nested)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,40 @@
+"""
+Streaming responses that stay streamed under ASGI.
+
+Django serves a synchronous iterator to an ASGI server by reading it
+into a list first, so an export or an import would be built whole in
+memory before the first byte goes out. ``streaming_response`` gives
+ASGI requests an asynchronous iterator instead, which pulls the chunks
+one at a time in the thread the view ran in (where its database
+connection lives). WSGI requests keep the plain iterator.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_done = object()
+
+
+async def aiterate(chunks):
+    """Iterate ``chunks`` asynchronously, each step in a worker thread."""
+    iterator = iter(chunks)
+    step = sync_to_async(next)
+    try:
+        while True:
+            chunk = await step(iterator, _done)
+            if chunk is _done:
+                return
+            yield chunk
+    finally:
+        # A client that disconnects leaves the generator mid-way; let it
+        # release what it holds (cursors, worker pools).
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks, **kwargs):
+    """``StreamingHttpResponse`` over ``chunks`` that streams under WSGI and ASGI."""
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiterate(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
@@ -0,0 +1,73 @@
+"""Test helpers shared by the app test suites."""
+import asyncio
+
+from django.conf import settings
+from django.core import signals
+from django.db import close_old_connections
+from django.test import AsyncClient
+from django.test.client import AsyncClientHandler
+
+
+class ASGIClientHandler(AsyncClientHandler):
+    """Resolve requests against ``ASGI_ROOT_URLCONF`` like ``config.asgi``."""
+
+    async def get_response_async(self, request):
+        request.urlconf = settings.ASGI_ROOT_URLCONF
+        return await super().get_response_async(request)
+
+
+class ASGIClient(AsyncClient):
+    """``AsyncClient`` routed like the ASGI entry point, to the async-native views."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.handler = ASGIClientHandler(self.handler.enforce_csrf_checks)
+
+
+async def asgi_request(method, path, query_string='', headers=None, body=b'', send=None):
+    """
+    Run one request through ``config.asgi.application``.
+
+    Returns the ASGI messages the application sent; ``send``, when given,
+    is awaited with each of them as it goes out.
+    """
+    from config.asgi import application
+
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The client never disconnects.
+        await asyncio.Future()
+
+    async def collect(message):
+        messages.append(message)
+        if send is not None:
+            await send(message)
+
+    # Like the test client: keep the test's connection (and transaction)
+    # open past the end of the request.
+    signals.request_finished.disconnect(close_old_connections)
+    try:
+        await application(scope, receive, collect)
+    finally:
+        signals.request_finished.connect(close_old_connections)
+    return messages
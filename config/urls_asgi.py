@@ -0,0 +1,39 @@
+"""
+URLconf for requests served over ASGI.
+
+Read endpoints are answered by async-native views (see
+``config.async_views``); they fall back to the regular views for
+anything else, and every other route comes from ``config.urls``. Routes
+keep the names of the routes they shadow.
+"""
+from django.urls import path, include
+
+from materials.views import (
+    CourseLessonListAPIView,
+    CourseViewSet,
+    LessonListCreateAPIView,
+    LessonRetrieveUpdateDestroyAPIView,
+)
+from users.views import UserViewSet
+
+urlpatterns = [
+    path('api/users/my-profile/', UserViewSet.as_async_view(
+        'my_profile', basename='user', detail=False
+    ), name='user-my-profile'),
+    path('api/users/<int:pk>/', UserViewSet.as_async_view(
+        'retrieve', basename='user', detail=True, suffix='Instance'
+    ), name='user-detail'),
+    path('api/courses/', CourseViewSet.as_async_view(
+        'list', basename='course', detail=False, suffix='List'
+    ), name='course-list'),
+    path('api/courses/<int:pk>/', CourseViewSet.as_async_view(
+        'retrieve', basename='course', detail=True, suffix='Instance'
+    ), name='course-detail'),
+    path('api/courses/<int:course_pk>/lessons/', CourseLessonListAPIView.as_async_view('list'),
+         name='course-lesson-list'),
+    path('api/lessons/', LessonListCreateAPIView.as_async_view('list'),
+         name='lesson-list-create'),
+    path('api/lessons/<int:pk>/', LessonRetrieveUpdateDestroyAPIView.as_async_view('retrieve'),
+         name='lesson-detail'),
+    path('', include('config.urls')),
+]
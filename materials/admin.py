@@ -1,24 +1,116 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.text import capfirst
+
+from config.changelist import LargeTableAdminMixin
+from . import deletion, search
 from .models import Course, Lesson
 
 
+class FullTextSearchMixin:
+    """Answer the changelist search box from the FTS5 index."""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search.is_available():
+            return super().get_search_results(request, queryset, search_term)
+        return search.filter_queryset(queryset, self.search_kind, search_term), False
+
+
+class CourseListFilter(admin.SimpleListFilter):
+    """
+    Filter lessons by course without listing every course in the sidebar;
+    a course is picked from its lesson count on the course changelist.
+    """
+    title = 'course'
+    parameter_name = 'course'
+
+    def lookups(self, request, model_admin):
+        # Only the selected course; the filter is not applied without a choice.
+        value = self.value()
+        if not value:
+            return []
+        title = None
+        if value.isdigit():
+            title = Course.objects.filter(pk=value).values_list('title', flat=True).first()
+        return [(value, title or value)]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        if not self.value().isdigit():
+            raise IncorrectLookupParameters
+        return queryset.filter(course_id=self.value())
+
+
+class RecentLessonsFormSet(BaseInlineFormSet):
+    """Inline formset limited to the newest ``max_shown`` lessons of the course."""
+    max_shown = 20
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset()[:self.max_shown]
+        return self._queryset
+
+
 class LessonInline(admin.TabularInline):
-    """Inline for lessons in course admin."""
+    """Inline for the newest lessons in course admin; all of them are on the lesson changelist."""
     model = Lesson
+    formset = RecentLessonsFormSet
+    ordering = ('-created_at', '-id')
     extra = 1
+    show_change_link = True
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
     """Admin interface for Course model."""
-    list_display = ('title', 'created_at', 'updated_at')
+    search_kind = 'course'
+    list_display = ('title', 'lessons', 'last_lesson_at', 'created_at', 'updated_at')
     search_fields = ('title', 'description')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('lessons_count', 'last_lesson_at')
     inlines = [LessonInline]
 
+    @admin.display(description='lessons', ordering='lessons_count')
+    def lessons(self, obj):
+        url = reverse('admin:materials_lesson_changelist')
+        return format_html('<a href="{}?course={}">{}</a>', url, obj.pk, obj.lessons_count)
+
+    def get_deleted_objects(self, objs, request):
+        """Count the lessons going with the courses instead of listing each."""
+        courses = list(objs)
+        lessons = sum(course.lessons_count for course in courses)
+        deleted_objects = [f'{capfirst(Course._meta.verbose_name)}: {course}' for course in courses]
+        model_count = {Course._meta.verbose_name_plural: len(courses)}
+        perms_needed = set()
+        if lessons:
+            deleted_objects.append(f'{lessons} {Lesson._meta.verbose_name_plural}')
+            model_count[Lesson._meta.verbose_name_plural] = lessons
+            if not request.user.has_perm('materials.delete_lesson'):
+                perms_needed.add(Lesson._meta.verbose_name)
+        return deleted_objects, model_count, perms_needed, []
+
+    # The delete view runs in a transaction; the lessons are deleted
+    # after it commits, in chunks committed one by one.
+    def delete_model(self, request, obj):
+        deletion.delete_course_on_commit(obj)
+
+    def delete_queryset(self, request, queryset):
+        for course in queryset:
+            deletion.delete_course_on_commit(course)
+
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
     """Admin interface for Lesson model."""
+    search_kind = 'lesson'
     list_display = ('title', 'course', 'created_at')
-    list_filter = ('course', 'created_at')
-    search_fields = ('title', 'description', 'video_url')
\ No newline at end of file
+    list_select_related = ('course',)
+    list_filter = (CourseListFilter, 'created_at')
+    search_fields = ('title', 'description', 'video_url')
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('course',)
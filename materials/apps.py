@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class MaterialsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'materials'
+
+    def ready(self):
+        from config import images
+        from . import search, signals  # noqa: F401
+        from .models import Course, Lesson
+
+        post_migrate.connect(search.reinstall, sender=self)
+
+        images.register(Course, 'preview')
+        images.register(Lesson, 'preview')
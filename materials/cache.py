@@ -0,0 +1,170 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'materials'
+STATS_KEYS = ('hits', 'misses')
+
+
+def get_cache():
+    """Return the cache backend configured for the materials API."""
+    return caches[getattr(settings, 'MATERIALS_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'MATERIALS_CACHE_TIMEOUT', 300)
+
+
+def _version_key(name):
+    return f'{KEY_PREFIX}:version:{name}'
+
+
+def get_versions(*names):
+    """
+    Return the current version of every named resource.
+
+    A missing version is seeded from the clock, so an evicted counter can
+    never bring back entries written under an older value.
+    """
+    cache = get_cache()
+    keys = [_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*names):
+    """Bump the version of every named resource, orphaning its entries."""
+    cache = get_cache()
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate_on_commit(*names):
+    """
+    ``invalidate`` once the current transaction commits, at once outside
+    one. Bumped earlier, a concurrent read could cache the old rows under
+    the new version and serve them until the entry expires.
+    """
+    transaction.on_commit(partial(invalidate, *names))
+
+
+def build_key(request, *names):
+    """Build a cache key from resource versions, host, path and query string."""
+    versions = ':'.join(str(version) for version in get_versions(*names))
+    query = '&'.join(
+        f'{key}={value}'
+        for key, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+    digest = hashlib.md5(
+        f'{request.get_host()}{request.path}?{query}'.encode(),
+        usedforsecurity=False
+    ).hexdigest()
+    return f'{KEY_PREFIX}:response:{versions}:{digest}'
+
+
+def record(outcome):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:stats:{outcome}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_stats():
+    """Return hit/miss counters and the hit ratio."""
+    cache = get_cache()
+    values = cache.get_many([f'{KEY_PREFIX}:stats:{name}' for name in STATS_KEYS])
+    hits = values.get(f'{KEY_PREFIX}:stats:hits', 0)
+    misses = values.get(f'{KEY_PREFIX}:stats:misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([f'{KEY_PREFIX}:stats:{name}' for name in STATS_KEYS])
+
+
+class CachedResponseMixin:
+    """
+    Serve successful list and retrieve responses from the materials cache.
+
+    Views name the resources a response depends on in
+    ``get_cache_resources``; handlers in ``materials.signals`` bump those
+    names whenever a Course or Lesson is saved or deleted.
+    """
+
+    def get_cache_resources(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = build_key(request, *self.get_cache_resources())
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, get_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(request, super().aretrieve, *args, **kwargs)
+
+    async def acached_response(self, request, handler, *args, **kwargs):
+        """
+        Async version of ``cached_response``. The cache is read with the
+        same synchronous calls, which suits the in-process backends this
+        project configures.
+        """
+        key = build_key(request, *self.get_cache_resources())
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = await handler(request, *args, **kwargs)
+        if response is None:
+            return None
+        record('misses')
+        if response.status_code == 200:
+            cache.set(key, response.data, get_timeout())
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,134 @@
+"""
+Change feed for incremental sync.
+
+Every write to a course or lesson appends a ``Change`` row and every
+deletion a tombstone, including lessons removed along with their course.
+``changes_since`` returns the entries after a sync token, so a client
+downloads only what changed since its last sync. A token is the ``seq``
+of the last entry the client has seen.
+
+The feed is keyed on ``seq`` alone rather than on ``updated_at`` plus a
+tie-breaking sequence. Timestamps are taken before a write commits, so
+a transaction committing late can land behind a timestamp a client has
+already synced past, and writers' clocks can disagree. ``seq`` is
+assigned inside the write, and SQLite admits one writer at a time, so
+entries become visible in ``seq`` order. Deletions leave no row to carry
+an ``updated_at`` either; they are entries like any other write.
+
+Entries older than ``SYNC_RETENTION_DAYS`` are pruned by ``prune`` (run
+``manage.py prune_changes`` periodically). A token from before the
+oldest retained entry can no longer be served, and its client has to
+download the catalog again.
+"""
+import base64
+import binascii
+import contextvars
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Change
+
+TOKEN_VERSION = 'v1'
+
+_pending = contextvars.ContextVar('changes', default=None)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(Exception):
+    """The changes after the token are no longer retained."""
+
+
+def record(resource, object_ids, deleted=False):
+    """Append change entries for ``object_ids`` of ``resource``."""
+    entries = [Change(resource=resource, object_id=pk, deleted=deleted) for pk in object_ids]
+    pending = _pending.get()
+    if pending is not None:
+        pending.extend(entries)
+    elif entries:
+        Change.objects.bulk_create(entries)
+
+
+@contextmanager
+def deferred():
+    """Collect the entries recorded in the block and insert them at exit."""
+    if _pending.get() is not None:
+        yield
+        return
+    entries = []
+    token = _pending.set(entries)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    if entries:
+        Change.objects.bulk_create(entries)
+
+
+def encode_token(seq):
+    return base64.urlsafe_b64encode(f'{TOKEN_VERSION}:{seq}'.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        value = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        version, seq = value.split(':')
+        seq = int(seq)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidToken('Invalid sync token.')
+    if version != TOKEN_VERSION or seq < 0:
+        raise InvalidToken('Invalid sync token.')
+    return seq
+
+
+def latest_seq():
+    return Change.objects.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+async def alatest_seq():
+    return (await Change.objects.aaggregate(seq=Max('seq')))['seq'] or 0
+
+
+def changes_since(seq, limit):
+    """
+    Return up to ``limit`` entries after ``seq`` (the latest entry per
+    object only), the ``seq`` to resume from and whether more remain.
+    """
+    oldest = Change.objects.order_by('seq').values_list('seq', flat=True).first()
+    if oldest is not None and seq + 1 < oldest:
+        raise ExpiredToken
+    entries = list(Change.objects.filter(seq__gt=seq).order_by('seq')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        if seq > latest_seq():
+            # Issued before the log was reset.
+            raise ExpiredToken
+        return [], seq, False
+
+    latest = {}
+    for entry in entries:
+        key = (entry.resource, entry.object_id)
+        latest.pop(key, None)
+        latest[key] = entry
+    return list(latest.values()), entries[-1].seq, has_more
+
+
+def prune(retention=None):
+    """
+    Delete entries older than ``retention`` (a timedelta; defaults to
+    ``SYNC_RETENTION_DAYS``) and return how many went. The newest entry
+    always stays, so tokens keep resolving after a quiet period.
+    """
+    if retention is None:
+        retention = timedelta(days=getattr(settings, 'SYNC_RETENTION_DAYS', 30))
+    deleted, _ = Change.objects.filter(
+        changed_at__lt=timezone.now() - retention
+    ).exclude(seq=latest_seq()).delete()
+    return deleted
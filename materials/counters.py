@@ -0,0 +1,152 @@
+"""
+Stored lesson counters on Course.
+
+``Course.lessons_count`` and ``Course.last_lesson_at`` change with a
+single UPDATE per write: counts move with ``F()`` expressions, so
+concurrent writers never lose an increment, and ``last_lesson_at`` is
+read from the lessons index inside the same statement. ``materials.signals``
+calls ``add``/``remove`` for single saves and deletes; bulk writes, which
+skip signals, call them directly. Inside ``deferred()`` the changes are
+summed per course and applied at the end in a single UPDATE.
+
+``repair`` recomputes both columns from the lessons table for courses
+that have drifted, e.g. after raw SQL writes.
+"""
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from . import changes
+from .models import Change, Course, Lesson
+
+# Courses per UPDATE; keeps the statement well below SQLite's bound
+# parameter limit
+BATCH_SIZE = 500
+
+_pending = contextvars.ContextVar('lesson_counters', default=None)
+
+
+def lesson_count():
+    return Coalesce(
+        Subquery(
+            Lesson.objects.filter(course=OuterRef('pk')).order_by()
+            .values('course').annotate(count=Count('id')).values('count')
+        ),
+        0
+    )
+
+
+def newest_lesson_at():
+    return Subquery(
+        Lesson.objects.filter(course=OuterRef('pk')).order_by()
+        .values('course').annotate(latest=Max('created_at')).values('latest')
+    )
+
+
+def last_lesson_at():
+    return Coalesce(newest_lesson_at(), F('created_at'))
+
+
+def apply(deltas):
+    """Apply ``{course_id: lesson count change}`` in one UPDATE per batch."""
+    course_ids = list(deltas)
+    for start in range(0, len(course_ids), BATCH_SIZE):
+        batch = course_ids[start:start + BATCH_SIZE]
+        delta = Case(
+            *(When(pk=pk, then=Value(deltas[pk])) for pk in batch),
+            output_field=IntegerField()
+        )
+        Course.objects.filter(pk__in=batch).update(
+            lessons_count=Greatest(F('lessons_count') + delta, Value(0)),
+            last_lesson_at=last_lesson_at()
+        )
+        changes.record(Change.COURSE, batch)
+
+
+def _record(course_ids, sign):
+    pending = _pending.get()
+    deltas = Counter() if pending is None else pending
+    for course_id in course_ids:
+        deltas[course_id] += sign
+    if pending is None:
+        apply(deltas)
+
+
+def add(course_ids):
+    """Count one new lesson per item of ``course_ids``."""
+    _record(course_ids, 1)
+
+
+def remove(course_ids):
+    """Uncount one removed lesson per item of ``course_ids``."""
+    _record(course_ids, -1)
+
+
+def move(from_course_ids, to_course_ids):
+    """Count lessons moved between courses, in one batch."""
+    with deferred():
+        remove(from_course_ids)
+        add(to_course_ids)
+
+
+@contextmanager
+def deferred():
+    """Collect the counter changes made in the block and apply them at exit."""
+    if _pending.get() is not None:
+        yield
+        return
+    deltas = Counter()
+    token = _pending.set(deltas)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    apply(deltas)
+
+
+def drifted():
+    """
+    Courses whose stored counters disagree with their lessons.
+
+    ``last_lesson_at`` of a course without lessons is left alone: new
+    courses take it from the field default, a moment off ``created_at``.
+    """
+    return Course.objects.annotate(
+        actual_count=lesson_count(), newest_lesson_at=newest_lesson_at()
+    ).filter(
+        ~Q(lessons_count=F('actual_count'))
+        | Q(newest_lesson_at__isnull=False) & ~Q(last_lesson_at=F('newest_lesson_at'))
+    )
+
+
+def repair(batch_size=1000, dry_run=False):
+    """
+    Recompute the counters of drifted courses.
+
+    Courses are scanned in primary key batches, so each statement stays
+    short on large catalogs. Return the number of courses checked and the
+    ids of the drifted ones.
+    """
+    checked, repaired = 0, []
+    last_pk = 0
+    while True:
+        course_ids = list(
+            Course.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not course_ids:
+            return checked, repaired
+        checked += len(course_ids)
+        drifted_ids = list(
+            drifted().filter(pk__gt=last_pk, pk__lte=course_ids[-1]).values_list('pk', flat=True)
+        )
+        last_pk = course_ids[-1]
+        if drifted_ids and not dry_run:
+            Course.objects.filter(pk__in=drifted_ids).update(
+                lessons_count=lesson_count(), last_lesson_at=last_lesson_at()
+            )
+            changes.record(Change.COURSE, drifted_ids)
+        repaired.extend(drifted_ids)
@@ -0,0 +1,75 @@
+"""
+Deleting courses without loading their lessons.
+
+Django's cascade collector fetches every lesson of a course, sends its
+signals and deletes them in one transaction, which holds the SQLite
+write lock for seconds on large courses. ``delete_course`` removes the
+lessons in chunks of ``CHUNK_SIZE``, each a set-based DELETE committed
+on its own so other writers get in between, and does in bulk what the
+lesson signals would: one counter update, the tombstones for the change
+feed and one cache invalidation per chunk. The search index follows
+through its triggers. The course itself is deleted last, the regular
+way.
+
+Each committed chunk leaves a consistent state, so a failure partway
+through leaves the course with fewer lessons and the right
+``lessons_count``; deleting it again finishes the job. Inside a
+transaction, as in the admin's delete view, the chunks could only
+commit together with it; ``delete_course_on_commit`` waits for it to
+commit and deletes the course after.
+
+Preview files freed along the way, and their image variants, are queued
+for ``config.media.schedule_cleanup``.
+"""
+from functools import partial
+
+from django.db import router, transaction
+
+from config import media
+
+from . import changes, counters
+from .cache import invalidate_on_commit
+from .models import Change, Lesson
+
+CHUNK_SIZE = 500
+
+
+def delete_lessons_chunk(course, chunk_size=CHUNK_SIZE):
+    """Delete up to ``chunk_size`` lessons of ``course``; return how many."""
+    with transaction.atomic():
+        rows = list(
+            Lesson.objects.filter(course=course).order_by()
+            .values_list('pk', 'preview')[:chunk_size]
+        )
+        if not rows:
+            return 0
+        lesson_ids = [pk for pk, _ in rows]
+        # No collector: it would load every lesson to send its signals.
+        Lesson.objects.filter(pk__in=lesson_ids)._raw_delete(router.db_for_write(Lesson))
+        counters.remove([course.pk] * len(rows))
+        changes.record(Change.LESSON, lesson_ids, deleted=True)
+        invalidate_on_commit('lessons', 'courses', f'course:{course.pk}')
+        media.schedule_cleanup(preview for _, preview in rows)
+    return len(rows)
+
+
+def delete_course(course, chunk_size=None):
+    """Delete ``course`` and its lessons; return the number of lessons deleted."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    deleted = 0
+    while True:
+        count = delete_lessons_chunk(course, chunk_size)
+        deleted += count
+        if count < chunk_size:
+            # Lessons added since are left to the cascade below.
+            break
+    with transaction.atomic():
+        preview = course.preview.name
+        course.delete()
+        media.schedule_cleanup([preview])
+    return deleted
+
+
+def delete_course_on_commit(course, chunk_size=None):
+    """``delete_course`` once the current transaction commits, at once outside one."""
+    transaction.on_commit(partial(delete_course, course, chunk_size))
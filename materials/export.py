@@ -0,0 +1,121 @@
+import csv
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Course, Lesson
+
+EXPORT_FIELDS = {
+    'courses': (Course, ['id', 'title', 'preview', 'description', 'created_at', 'updated_at']),
+    'lessons': (Lesson, [
+        'id', 'title', 'description', 'preview', 'video_url', 'course', 'created_at', 'updated_at'
+    ]),
+}
+EXPORT_FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+# Characters per streamed chunk; one chunk per row costs a write per row
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def parse_timestamp(value):
+    """Parse an ISO date or datetime; naive values are taken as UTC."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Invalid date/time: {value!r}')
+        parsed = datetime(date.year, date.month, date.day)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def iter_rows(resource, updated_after=None, updated_before=None, chunk_size=CHUNK_SIZE):
+    """Yield plain dicts for ``resource`` in primary key order, chunk by chunk."""
+    model, fields = EXPORT_FIELDS[resource]
+    queryset = model.objects.order_by('pk')
+    if updated_after is not None:
+        queryset = queryset.filter(updated_at__gte=updated_after)
+    if updated_before is not None:
+        queryset = queryset.filter(updated_at__lt=updated_before)
+    return queryset.values(*fields).iterator(chunk_size=chunk_size)
+
+
+def buffered(lines):
+    """Join ``lines`` into chunks of about ``STREAM_CHUNK_SIZE`` characters."""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_ndjson(resources, **filters):
+    """Yield JSON documents, one per line; ``type`` tells rows apart."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def lines():
+        for resource in resources:
+            for row in iter_rows(resource, **filters):
+                row['type'] = resource
+                yield encoder.encode(row) + '\n'
+    return buffered(lines())
+
+
+def iter_csv(resource, **filters):
+    """Yield a header line followed by the CSV lines of the rows, in chunks."""
+    _, fields = EXPORT_FIELDS[resource]
+    encoder = DjangoJSONEncoder()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writeheader()
+    for row in iter_rows(resource, **filters):
+        for name in ('created_at', 'updated_at'):
+            row[name] = encoder.default(row[name])
+        writer.writerow(row)
+        if buffer.tell() >= STREAM_CHUNK_SIZE:
+            yield flush()
+    if buffer.tell():
+        yield flush()
+
+
+def export(resource, output, **filters):
+    """
+    Return an iterator of text chunks for ``resource`` in ``output`` format.
+
+    ``resource`` is ``courses``, ``lessons`` or ``all`` (NDJSON only).
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format: {output!r}')
+    if resource == 'all':
+        if output != 'ndjson':
+            raise ValueError('Exporting all resources is only supported as NDJSON')
+        resources = list(EXPORT_FIELDS)
+    elif resource in EXPORT_FIELDS:
+        resources = [resource]
+    else:
+        raise ValueError(f'Unknown export resource: {resource!r}')
+
+    if output == 'ndjson':
+        return iter_ndjson(resources, **filters)
+    return iter_csv(resource, **filters)
+
+
+def content_type(output):
+    return 'application/x-ndjson' if output == 'ndjson' else 'text/csv'
@@ -0,0 +1,57 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .export import parse_timestamp
+
+
+class TimestampFilterBackend(BaseFilterBackend):
+    """
+    ``?created_after=`` (exclusive) and ``?updated_since=`` (inclusive)
+    filters on the ``created_at``/``updated_at`` columns. Both accept an
+    ISO date or datetime.
+    """
+    filters = (
+        ('created_after', 'created_at__gt'),
+        ('updated_since', 'updated_at__gte'),
+    )
+
+    def filter_queryset(self, request, queryset, view):
+        for param, lookup in self.filters:
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                queryset = queryset.filter(**{lookup: parse_timestamp(value)})
+            except ValueError as exc:
+                raise ValidationError({param: [str(exc)]})
+        return queryset
+
+
+class CourseFilterBackend(BaseFilterBackend):
+    """``?course=<id>`` filter for lessons."""
+
+    def filter_queryset(self, request, queryset, view):
+        value = request.query_params.get('course')
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(course_id=int(value))
+        except ValueError:
+            raise ValidationError({'course': ['A valid integer is required.']})
+
+
+class CourseOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=`` over the view's ``ordering_fields``, with an ``id``
+    tie-breaker in the same direction so cursor pages stay stable when
+    many courses share a count or timestamp.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
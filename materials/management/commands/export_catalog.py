@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from materials.export import EXPORT_FIELDS, EXPORT_FORMATS, export, parse_timestamp
+
+
+class Command(BaseCommand):
+    help = 'Stream courses and lessons as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resource',
+            choices=[*EXPORT_FIELDS, 'all'],
+            default='all',
+            help='What to export (CSV needs a single resource).'
+        )
+        parser.add_argument('--format', dest='output', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', dest='path', help='File to write; defaults to stdout.')
+        parser.add_argument('--updated-after', help='Only rows updated at or after this ISO date/time.')
+        parser.add_argument('--updated-before', help='Only rows updated before this ISO date/time.')
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export(
+                options['resource'],
+                options['output'],
+                updated_after=parse_timestamp(options['updated_after']),
+                updated_before=parse_timestamp(options['updated_before'])
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        if options['path']:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from config import images
+
+
+def _setup_worker():
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Generate resized variants for every stored course, lesson and user image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            help='Use a process pool instead of threads.'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist.'
+        )
+
+    def iter_names(self, force):
+        seen = set()
+        for model, field_names in images.registry:
+            for field_name in field_names:
+                names = (
+                    model._default_manager.exclude(**{field_name: ''})
+                    .exclude(**{f'{field_name}__isnull': True})
+                    .values_list(field_name, flat=True)
+                    .iterator(chunk_size=2000)
+                )
+                for name in names:
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                    if not force and all(
+                        default_storage.exists(variant) for variant in images.variant_names(name)
+                    ):
+                        continue
+                    yield name
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            executor = ProcessPoolExecutor(options['workers'], initializer=_setup_worker)
+        else:
+            executor = ThreadPoolExecutor(options['workers'])
+
+        done = failed = 0
+        with executor:
+            futures = {
+                executor.submit(images.generate_variants, name): name
+                for name in self.iter_names(options['force'])
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {exc}')
+                else:
+                    done += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {done} image(s); {failed} failed.'
+        ))
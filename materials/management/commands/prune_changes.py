@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from materials import changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed entries and tombstones older than the sync retention window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention in days; defaults to SYNC_RETENTION_DAYS.')
+
+    def handle(self, *args, **options):
+        retention = None
+        if options['days'] is not None:
+            if options['days'] < 0:
+                raise CommandError('--days must not be negative.')
+            retention = timedelta(days=options['days'])
+        deleted = changes.prune(retention)
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} change feed entries.'))
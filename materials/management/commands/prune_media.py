@@ -0,0 +1,112 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from config import images, media
+
+
+def upload_dirs():
+    """The ``upload_to`` directories of the registered image fields."""
+    dirs = set()
+    for model, field_names in images.registry:
+        for field_name in field_names:
+            dirs.add(model._meta.get_field(field_name).upload_to.strip('/'))
+    return sorted(dirs)
+
+
+def iter_files(directory, max_mtime):
+    """Names of files under ``directory`` last modified before ``max_mtime``."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(default_storage.path(current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                    continue
+                try:
+                    # Variants deleted with their original may still be listed.
+                    if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < max_mtime:
+                        yield name
+                except FileNotFoundError:
+                    pass
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete course previews, lesson previews and avatars that no row refers to, '
+        'with image variants whose original is gone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help='Skip files modified in the last N minutes (uploads not committed yet).'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the orphaned files.')
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--min-age must not be negative and --batch-size must be positive.')
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        max_mtime = time.time() - options['min_age'] * 60
+        dirs = upload_dirs()
+        self.deleted = 0
+
+        # Originals first: deleting one also deletes its current variants.
+        extensions = set()
+        for directory in dirs:
+            originals = (
+                name for name in iter_files(directory, max_mtime) if not images.is_variant(name)
+            )
+            for chunk in chunked(originals, options['batch_size']):
+                extensions.update(os.path.splitext(name)[1] for name in chunk)
+                orphans = sorted(set(chunk) - images.referenced(chunk))
+                if self.dry_run:
+                    self.report(orphans)
+                else:
+                    # delete_files checks the references again, in case a
+                    # row took one of the names meanwhile.
+                    self.report(media.delete_files(orphans))
+
+        # Then variants whose original is gone: removed by hand, or
+        # deleted along with only the variant sizes configured now.
+        for directory in dirs:
+            for name in iter_files(directory, max_mtime):
+                if not images.is_variant(name):
+                    continue
+                root = images.VARIANT_RE.sub('', name)
+                if any(default_storage.exists(root + extension) for extension in extensions):
+                    continue
+                if not self.dry_run:
+                    default_storage.delete(name)
+                self.report([name])
+
+        action = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {self.deleted} orphaned file(s).'))
+
+    def report(self, names):
+        for name in names:
+            self.deleted += 1
+            if self.verbosity > 1 or self.dry_run:
+                self.stdout.write(name)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from materials import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search tables and triggers and reindex all courses and lessons.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING('Full-text search needs SQLite FTS5; nothing to do.'))
+            return
+        search.install()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from materials import cache, counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.lessons_count and last_lesson_at where they disagree with the lessons table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Courses checked per query.')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many courses have drifted.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive.')
+        checked, drifted = counters.repair(options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'Checked {checked} course(s); {len(drifted)} have drifted counters.')
+            return
+        if drifted:
+            # Plain UPDATEs skip model signals, so invalidate cached pages here.
+            cache.invalidate('courses', *(f'course:{pk}' for pk in drifted))
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} course(s); repaired {len(drifted)}.'))
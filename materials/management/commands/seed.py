@@ -0,0 +1,116 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from materials import changes, counters
+from materials.cache import invalidate
+from materials.models import Change, Course, Lesson
+from users.models import User
+
+WORDS = (
+    'python django rest api model view serializer query index cache async '
+    'test deploy design pattern data stream search image profile course lesson'
+).split()
+CITIES = ('Kazan', 'Moscow', 'Samara', 'Perm', 'Ufa', None)
+
+
+def bulk_create(model, objects, batch_size, resource=None, **kwargs):
+    """
+    Insert ``objects`` one batch at a time, so a generator is never held in
+    memory as a whole; return the number of rows. Rows of a change feed
+    ``resource`` are recorded in the feed.
+    """
+    created = 0
+    objects = iter(objects)
+    while batch := list(itertools.islice(objects, batch_size)):
+        batch = model.objects.bulk_create(batch, **kwargs)
+        if resource is not None:
+            changes.record(resource, [obj.pk for obj in batch])
+        created += len(batch)
+    return created
+
+
+class Command(BaseCommand):
+    help = 'Generate users, courses and lessons with bulk_create for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create.')
+        parser.add_argument('--courses', type=int, default=100, help='Courses to create.')
+        parser.add_argument('--lessons', type=int, default=10, help='Lessons per course.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per INSERT.')
+        parser.add_argument('--password', default='password', help='Password of every created user.')
+        parser.add_argument('--random-seed', type=int, default=0, help='Seed for generated text.')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete all courses, lessons and non-staff users first.')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'courses', 'lessons', 'batch_size'):
+            if options[name] < 0 or (name == 'batch_size' and options[name] == 0):
+                raise CommandError(f'--{name.replace("_", "-")} must be positive.')
+
+        self.random = random.Random(options['random_seed'])
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                Lesson.objects.all()._raw_delete(Lesson.objects.db)
+                Course.objects.all()._raw_delete(Course.objects.db)
+                # Raw deletes leave no tombstones; an empty feed makes every
+                # sync client start over.
+                Change.objects.all()._raw_delete(Change.objects.db)
+                User.objects.filter(is_staff=False, is_superuser=False).delete()
+            users = self.create_users(options['users'], options['password'], batch_size)
+            courses = self.create_courses(options['courses'], batch_size)
+            lessons = self.create_lessons(courses, options['lessons'], batch_size)
+            if lessons:
+                counters.apply({course.pk: options['lessons'] for course in courses})
+        # bulk_create skips model signals, so invalidate the response cache here.
+        invalidate('courses', 'lessons')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {users} users, {len(courses)} courses and {lessons} lessons '
+            f'in {time.perf_counter() - start:.1f}s.'
+        ))
+
+    def text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, count, password, batch_size):
+        # Hashing is deliberately slow; every seeded user shares one hash.
+        password = make_password(password)
+        offset = User.objects.aggregate(last=Max('id'))['last'] or 0
+        users = (
+            User(
+                email=f'seed.{offset + index}@example.com',
+                password=password,
+                first_name=self.text(1),
+                city=self.random.choice(CITIES)
+            )
+            for index in range(count)
+        )
+        return bulk_create(User, users, batch_size, ignore_conflicts=True)
+
+    def create_courses(self, count, batch_size):
+        # Kept in memory: lessons need the primary keys bulk_create sets.
+        courses = [Course(title=self.text(3), description=self.text(30)) for _ in range(count)]
+        bulk_create(Course, courses, batch_size, resource=Change.COURSE)
+        return courses
+
+    def create_lessons(self, courses, per_course, batch_size):
+        lessons = (
+            Lesson(
+                course=course,
+                title=self.text(4),
+                description=self.text(60),
+                video_url=f'https://example.com/videos/{course.pk}/{index}'
+            )
+            for course in courses
+            for index in range(per_course)
+        )
+        return bulk_create(Lesson, lessons, batch_size, resource=Change.LESSON)
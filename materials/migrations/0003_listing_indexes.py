@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    # SQLite rebuilds the lesson table to drop the course index, dropping
+    # the search triggers defined on it.
+    from materials import search
+    search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at'], name='course_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['updated_at'], name='course_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'created_at'], name='lesson_course_created_idx'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, install_search_index),
+        migrations.AlterField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(db_index=False, help_text='Related course', on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='materials.course', verbose_name='course'),
+        ),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['created_at'], name='lesson_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['updated_at'], name='lesson_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Course = apps.get_model('materials', 'Course')
+    Lesson = apps.get_model('materials', 'Lesson')
+    lessons = Lesson.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    Course.objects.update(
+        lessons_count=Coalesce(Subquery(lessons.annotate(count=Count('id')).values('count')), 0),
+        last_lesson_at=Coalesce(
+            Subquery(lessons.annotate(latest=Max('created_at')).values('latest')), F('created_at')
+        )
+    )
+
+
+def install_search_index(apps, schema_editor):
+    # SQLite rebuilds the course table to add the columns, dropping the
+    # search triggers defined on it.
+    from materials import search
+    search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0003_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, install_search_index),
+        migrations.AddField(
+            model_name='course',
+            name='last_lesson_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Creation time of the newest lesson, or of the course while it has none', verbose_name='last lesson at'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of lessons, maintained by materials.counters', verbose_name='lessons count'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['lessons_count', 'id'], name='course_lessons_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['last_lesson_at', 'id'], name='course_last_lesson_at_idx'),
+        ),
+    ]
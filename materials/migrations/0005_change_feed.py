@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0004_course_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='sequence')),
+                ('resource', models.CharField(choices=[('course', 'course'), ('lesson', 'lesson')], max_length=10, verbose_name='resource')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('deleted', models.BooleanField(default=False, verbose_name='deleted')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='changed at')),
+            ],
+            options={
+                'verbose_name': 'change',
+                'verbose_name_plural': 'changes',
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['changed_at'], name='change_changed_at_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -31,11 +32,29 @@ class Course(models.Model):
         _('updated at'),
         auto_now=True
     )
+    lessons_count = models.PositiveIntegerField(
+        _('lessons count'),
+        default=0,
+        editable=False,
+        help_text=_('Number of lessons, maintained by materials.counters')
+    )
+    last_lesson_at = models.DateTimeField(
+        _('last lesson at'),
+        default=timezone.now,
+        editable=False,
+        help_text=_('Creation time of the newest lesson, or of the course while it has none')
+    )
 
     class Meta:
         verbose_name = _('course')
         verbose_name_plural = _('courses')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='course_created_at_idx'),
+            models.Index(fields=['updated_at'], name='course_updated_at_idx'),
+            models.Index(fields=['lessons_count', 'id'], name='course_lessons_count_idx'),
+            models.Index(fields=['last_lesson_at', 'id'], name='course_last_lesson_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -71,6 +90,8 @@ class Lesson(models.Model):
         Course,
         on_delete=models.CASCADE,
         related_name='lessons',
+        # Covered by lesson_course_created_idx
+        db_index=False,
         verbose_name=_('course'),
         help_text=_('Related course')
     )
@@ -87,6 +108,46 @@ class Lesson(models.Model):
         verbose_name = _('lesson')
         verbose_name_plural = _('lessons')
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['course', 'created_at'], name='lesson_course_created_idx'),
+            models.Index(fields=['created_at'], name='lesson_created_at_idx'),
+            models.Index(fields=['updated_at'], name='lesson_updated_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class Change(models.Model):
+    """
+    Change feed entry: a course or lesson was written or deleted.
+
+    ``seq`` only grows (SQLite AUTOINCREMENT never reuses ids), so it
+    orders changes regardless of clock skew between writers. Entries
+    older than the retention window are pruned by ``materials.changes``.
+    """
+
+    COURSE = 'course'
+    LESSON = 'lesson'
+    RESOURCE_CHOICES = (
+        (COURSE, _('course')),
+        (LESSON, _('lesson')),
+    )
+
+    seq = models.BigAutoField(_('sequence'), primary_key=True)
+    resource = models.CharField(_('resource'), max_length=10, choices=RESOURCE_CHOICES)
+    object_id = models.BigIntegerField(_('object id'))
+    deleted = models.BooleanField(_('deleted'), default=False)
+    changed_at = models.DateTimeField(_('changed at'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('change')
+        verbose_name_plural = _('changes')
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['changed_at'], name='change_changed_at_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        action = 'deleted' if self.deleted else 'changed'
+        return f'{self.resource} {self.object_id} {action}'
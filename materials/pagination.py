@@ -0,0 +1,131 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+
+class MaterialsCursorPagination(CursorPagination):
+    """
+    Keyset pagination with opaque cursors and a client-selectable page size.
+
+    The cursor encodes the values of every ordering field of the row the
+    page starts after, ``(created_at, id)`` by default, and the page is
+    read from the rows strictly past that key. Deep pages cost the same as
+    the first one, and rows sharing a timestamp are never skipped or
+    repeated, however many there are.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The page, plus one row to tell whether another follows; not evaluated."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.cursor.position if self.cursor is not None else None
+
+        ordering = reverse_ordering(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(queryset.model, ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Keep the page out of ``results`` and work out the links around it."""
+        self.page = results[:self.page_size]
+        has_more = len(results) > len(self.page)
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_keyset_filter(self, model, ordering, position):
+        """Rows after ``position`` in ``ordering``: (a, b) > (x, y) spelled out."""
+        keyset, equal = Q(), Q()
+        for name, value in zip(ordering, position):
+            attr = name.lstrip('-')
+            try:
+                field = model._meta.pk if attr == 'pk' else model._meta.get_field(attr)
+                value = field.to_python(value)
+            except (FieldDoesNotExist, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            keyset |= equal & Q(**{f'{attr}__{lookup}': value})
+            equal &= Q(**{attr: value})
+        return keyset
+
+    def get_position(self, row):
+        return [
+            str(row[name] if isinstance(row, dict) else getattr(row, name))
+            for name in (name.lstrip('-') for name in self.ordering)
+        ]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        # Past the end of an emptied page: start from the first one again.
+        position = self.get_position(self.page[-1]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.get_position(self.page[0]) if self.page else None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(cursor.position, separators=(',', ':')))
+        return super().encode_cursor(cursor)
+
+
+class CoursePagination(MaterialsCursorPagination):
+    """Cursor pagination matching ``Course.Meta.ordering``."""
+    ordering = ('-created_at', '-id')
+
+
+class LessonPagination(MaterialsCursorPagination):
+    """Cursor pagination matching ``Lesson.Meta.ordering``."""
+    ordering = ('created_at', 'id')
@@ -0,0 +1,167 @@
+"""
+Full-text search over courses and lessons backed by SQLite FTS5.
+
+Each model has an external-content FTS5 table kept in sync by SQLite
+triggers, so inserts, updates and deletes made through the ORM, bulk
+operations or raw SQL are all indexed. Results are ranked with BM25;
+titles weigh more than descriptions.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from .models import Course, Lesson
+
+SEARCH_INDEXES = {
+    'course': (Course, ('title', 'description'), (10.0, 1.0)),
+    'lesson': (Lesson, ('title', 'description', 'video_url'), (10.0, 1.0, 0.5)),
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_table(kind):
+    model, _, _ = SEARCH_INDEXES[kind]
+    return f'{model._meta.db_table}_fts'
+
+
+def is_available(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def _index_statements(kind):
+    model, columns, _ = SEARCH_INDEXES[kind]
+    table = model._meta.db_table
+    fts = fts_table(kind)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});'
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5('
+        f"{column_list}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [name])
+    return cursor.fetchone() is not None
+
+
+def install(using=None, rebuild=True):
+    """
+    Create the FTS tables and triggers and rebuild the index.
+
+    With ``rebuild=False`` only what is missing is created, and an index
+    is filled only when its table was. Migrations that make SQLite
+    rebuild a materials table drop its triggers; ``reinstall`` puts them
+    back after every ``migrate`` without reindexing the catalog.
+    """
+    using = using or connection
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for kind in SEARCH_INDEXES:
+            fts = fts_table(kind)
+            missing = not _table_exists(cursor, fts)
+            if rebuild:
+                # Pick up changed trigger definitions too.
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            for statement in _index_statements(kind):
+                cursor.execute(statement)
+            if rebuild or missing:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def reinstall(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """``post_migrate`` handler: create missing FTS tables and triggers."""
+    install(connections[using], rebuild=False)
+
+
+def uninstall(using=None):
+    using = using or connection
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for kind in SEARCH_INDEXES:
+            fts = fts_table(kind)
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, the last
+    one as a prefix. Quoting every token keeps FTS5 syntax out of reach
+    of user input.
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _ranked_sql(kind):
+    _, _, weights = SEARCH_INDEXES[kind]
+    fts = fts_table(kind)
+    weight_list = ', '.join(str(weight) for weight in weights)
+    return (
+        f"SELECT '{kind}' AS kind, rowid AS id, bm25({fts}, {weight_list}) AS rank "
+        f'FROM {fts} WHERE {fts} MATCH %s'
+    )
+
+
+def search(text, kinds=None, limit=20, offset=0):
+    """Return ``(kind, id, rank)`` triples, best match first."""
+    query = build_match_query(text)
+    kinds = list(kinds or SEARCH_INDEXES)
+    if not query:
+        return []
+    if not is_available():
+        return _fallback_search(text, kinds, limit, offset)
+
+    sql = ' UNION ALL '.join(_ranked_sql(kind) for kind in kinds)
+    sql = f'SELECT kind, id, rank FROM ({sql}) ORDER BY rank, kind, id LIMIT %s OFFSET %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query] * len(kinds) + [limit, offset])
+        return cursor.fetchall()
+
+
+def _fallback_search(text, kinds, limit, offset):
+    """Unranked ``icontains`` search for databases without FTS5."""
+    from django.db.models import Q
+
+    results = []
+    for kind in kinds:
+        model, columns, _ = SEARCH_INDEXES[kind]
+        condition = Q()
+        for column in columns:
+            condition |= Q(**{f'{column}__icontains': text})
+        ids = model.objects.filter(condition).order_by('pk').values_list('pk', flat=True)
+        results.extend((kind, pk, None) for pk in ids[:offset + limit])
+    return results[offset:offset + limit]
+
+
+def filter_queryset(queryset, kind, text):
+    """Restrict ``queryset`` to rows matching ``text``; used by the admin."""
+    from django.db.models.expressions import RawSQL
+
+    query = build_match_query(text)
+    if not query:
+        return queryset
+    fts = fts_table(kind)
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [query])
+    )
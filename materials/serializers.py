@@ -1,49 +1,145 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Course, Lesson
+from config.images import ImageVariantsField
+from config.metrics import TimedSerializerMixin
+from config.sparse import DynamicFieldsSerializerMixin
+from . import changes, counters
+from .cache import invalidate_on_commit
+from .models import Change, Course, Lesson
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class CoursePrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """
+    Course FK that resolves against ``context['courses']`` when present.
+
+    ``LessonBulkSerializer`` loads every course referenced by a batch with
+    a single query and puts them in the context, so validating a batch
+    does not cost one query per row.
+    """
+
+    def to_internal_value(self, data):
+        courses = self.context.get('courses')
+        if courses is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            course = courses.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if course is None:
+            self.fail('does_not_exist', pk_value=data)
+        return course
+
+
+class LessonBulkSerializer(serializers.ListSerializer):
+    """
+    Validate a batch of lessons and write it with bulk_create/bulk_update.
+
+    Bulk writes skip model signals, so the counters, change feed and
+    response cache are updated here.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            course_ids = set()
+            for item in data:
+                try:
+                    course_ids.add(int(item['course']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self.context['courses'] = Course.objects.in_bulk(course_ids)
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            instances = {lesson.pk: lesson for lesson in self.instance}
+            self.child.instance = instances.get(data.get('id'))
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        lessons = Lesson.objects.bulk_create(
+            [Lesson(**attrs) for attrs in validated_data]
+        )
+        counters.add([lesson.course_id for lesson in lessons])
+        changes.record(Change.LESSON, [lesson.pk for lesson in lessons])
+        self.invalidate_cache(lessons)
+        return lessons
+
+    def update(self, instance, validated_data):
+        course_ids = {lesson.course_id for lesson in instance}
+        fields = {'updated_at'}
+        now = timezone.now()
+        moved_from, moved_to = [], []
+        for lesson, attrs in zip(instance, validated_data):
+            course_id = lesson.course_id
+            for attr, value in attrs.items():
+                setattr(lesson, attr, value)
+            lesson.updated_at = now
+            fields.update(attrs)
+            if lesson.course_id != course_id:
+                moved_from.append(course_id)
+                moved_to.append(lesson.course_id)
+        Lesson.objects.bulk_update(instance, sorted(fields))
+        if moved_from:
+            counters.move(moved_from, moved_to)
+        changes.record(Change.LESSON, [lesson.pk for lesson in instance])
+        self.invalidate_cache(instance, course_ids)
+        return instance
+
+    def invalidate_cache(self, lessons, course_ids=()):
+        """Bulk writes skip model signals, so invalidate explicitly."""
+        course_ids = set(course_ids) | {lesson.course_id for lesson in lessons}
+        invalidate_on_commit('lessons', 'courses', *(f'course:{pk}' for pk in course_ids))
+
+
+class LessonSerializer(TimedSerializerMixin, DynamicFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for Lesson model."""
 
+    course = CoursePrimaryKeyField(
+        queryset=Course.objects.all(),
+        label=Lesson._meta.get_field('course').verbose_name,
+        help_text=Lesson._meta.get_field('course').help_text
+    )
+    preview_variants = ImageVariantsField(source='preview')
+
     class Meta:
         model = Lesson
+        list_serializer_class = LessonBulkSerializer
         fields = [
-            'id', 'title', 'description', 'preview',
+            'id', 'title', 'description', 'preview', 'preview_variants',
             'video_url', 'course', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(TimedSerializerMixin, DynamicFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for Course model."""
 
-    lessons_count = serializers.IntegerField(
-        source='lessons.count',
-        read_only=True
-    )
     lessons = LessonSerializer(many=True, read_only=True)
+    preview_variants = ImageVariantsField(source='preview')
 
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'preview', 'description',
-            'created_at', 'updated_at', 'lessons_count', 'lessons'
+            'id', 'title', 'preview', 'preview_variants', 'description',
+            'created_at', 'updated_at', 'lessons_count', 'last_lesson_at', 'lessons'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'lessons_count']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'lessons_count', 'last_lesson_at']
 
 
-class CourseListSerializer(serializers.ModelSerializer):
+class CourseListSerializer(TimedSerializerMixin, DynamicFieldsSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for Course list (without detailed lessons)."""
 
-    lessons_count = serializers.IntegerField(
-        source='lessons.count',
-        read_only=True
-    )
+    preview_variants = ImageVariantsField(source='preview')
 
     class Meta:
         model = Course
         fields = [
-            'id', 'title', 'preview', 'description',
-            'created_at', 'updated_at', 'lessons_count'
+            'id', 'title', 'preview', 'preview_variants', 'description',
+            'created_at', 'updated_at', 'lessons_count', 'last_lesson_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'lessons_count']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at', 'lessons_count', 'last_lesson_at']
\ No newline at end of file
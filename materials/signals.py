@@ -0,0 +1,79 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changes, counters
+from .cache import invalidate_on_commit
+from .models import Change, Course, Lesson
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course(sender, instance, **kwargs):
+    """Drop cached course pages; a deleted course also takes its lessons."""
+    names = ['courses', f'course:{instance.pk}']
+    if kwargs.get('signal') is post_delete:
+        names.append('lessons')
+    invalidate_on_commit(*names)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def record_course_change(sender, instance, **kwargs):
+    changes.record(Change.COURSE, [instance.pk], deleted=kwargs.get('signal') is post_delete)
+
+
+@receiver(pre_delete, sender=Course)
+def record_course_lessons_deleted(sender, instance, **kwargs):
+    """Tombstone a course's lessons in one INSERT before they cascade."""
+    changes.record(
+        Change.LESSON, instance.lessons.values_list('pk', flat=True), deleted=True
+    )
+
+
+def deleted_with_course(kwargs):
+    origin = kwargs.get('origin')
+    return isinstance(origin, Course) or getattr(origin, 'model', None) is Course
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """Remember the loaded course so moving a lesson invalidates both."""
+    instance._loaded_course_id = instance.__dict__.get('course_id')
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def count_lesson(sender, instance, **kwargs):
+    """Keep the lesson counters of the affected courses in step."""
+    if kwargs.get('raw'):
+        return
+    if kwargs.get('signal') is post_delete:
+        # Lessons deleted along with their course have no counters to update.
+        if not deleted_with_course(kwargs):
+            counters.remove([instance.course_id])
+    elif kwargs.get('created'):
+        counters.add([instance.course_id])
+    else:
+        loaded_course_id = getattr(instance, '_loaded_course_id', None)
+        if loaded_course_id is not None and loaded_course_id != instance.course_id:
+            counters.move([loaded_course_id], [instance.course_id])
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def record_lesson_change(sender, instance, **kwargs):
+    deleted = kwargs.get('signal') is post_delete
+    if not (deleted and deleted_with_course(kwargs)):
+        changes.record(Change.LESSON, [instance.pk], deleted=deleted)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson(sender, instance, **kwargs):
+    """Drop cached lesson lists and the parent course pages."""
+    names = {'lessons', 'courses', f'course:{instance.course_id}'}
+    loaded_course_id = getattr(instance, '_loaded_course_id', None)
+    if loaded_course_id is not None:
+        names.add(f'course:{loaded_course_id}')
+    invalidate_on_commit(*names)
+    instance._loaded_course_id = instance.course_id
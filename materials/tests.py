@@ -1,3 +1,1984 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.models import Count
+from django.db.models.signals import post_init
+from unittest import mock
+
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import permissions, status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from PIL import Image
+from users.authentication import TokenAuthentication
+from users.models import User
+
+from config import compression, database, images, media, metrics, renderers
+from config.changelist import EstimatedCountPaginator, indexed_dates_queryset
+from config.renderers import FastJSONParser, FastJSONRenderer
+from config.testing import ASGIClient, asgi_request
+from . import changes, counters, deletion, export, search
+from .admin import RecentLessonsFormSet
+from .cache import get_stats, reset_stats
+from .models import Change, Course, Lesson
+from .pagination import LessonPagination
+from .serializers import LessonSerializer
+from .views import LessonRetrieveUpdateDestroyAPIView
+
+
+def create_catalog(courses=3, lessons_per_course=3):
+    """Create a small catalog of courses with lessons."""
+    created = []
+    for course_index in range(courses):
+        course = Course.objects.create(
+            title=f'Course {course_index}',
+            description=f'Description {course_index}'
+        )
+        for lesson_index in range(lessons_per_course):
+            Lesson.objects.create(
+                course=course,
+                title=f'Lesson {course_index}.{lesson_index}',
+                video_url=f'https://example.com/{course_index}/{lesson_index}'
+            )
+        created.append(course)
+    return created
+
+
+class CourseQueryBudgetTests(TestCase):
+    """Query budgets for the course endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list_runs_constant_number_of_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('course-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(
+            {item['lessons_count'] for item in response.data['results']}, {3}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_catalog(courses=5, lessons_per_course=4)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('course-list'))
+        self.assertEqual(len(response.data['results']), 8)
+
+    def test_retrieve(self):
+        course = self.courses[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('course-detail', args=[course.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['lessons_count'], 3)
+        self.assertEqual(len(response.data['lessons']), 3)
+
+    def test_create(self):
+        # INSERT and its change feed entry.
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse('course-list'), {'title': 'New course'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['lessons_count'], 0)
+
+    def test_update(self):
+        course = self.courses[0]
+        with self.assertNumQueries(5):
+            response = self.client.patch(
+                reverse('course-detail', args=[course.pk]),
+                {'title': 'Renamed'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Renamed')
+        self.assertEqual(response.data['lessons_count'], 3)
+
+    def test_destroy(self):
+        course = self.courses[0]
+        # One chunk of lessons (select, delete, counters, tombstones), then
+        # the course: an empty cascade, its tombstone and the savepoints.
+        with self.assertNumQueries(14):
+            response = self.client.delete(reverse('course-detail', args=[course.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Lesson.objects.filter(course_id=course.pk).exists())
+
+
+class LessonQueryBudgetTests(TestCase):
+    """Query budgets for the lesson endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog()
+        cls.lesson = Lesson.objects.filter(course=cls.courses[0]).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('lesson-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 9)
+
+    def test_create(self):
+        payload = {
+            'title': 'New lesson',
+            'video_url': 'https://example.com/new',
+            'course': self.courses[1].pk,
+        }
+        # Course lookup, INSERT, the course counter UPDATE and the change
+        # feed entries of the lesson and the course.
+        with self.assertNumQueries(5):
+            response = self.client.post(
+                reverse('lesson-list-create'), payload, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('lesson-detail', args=[self.lesson.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update(self):
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                reverse('lesson-detail', args=[self.lesson.pk]),
+                {'title': 'Renamed'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_destroy(self):
+        with self.assertNumQueries(5):
+            response = self.client.delete(reverse('lesson-detail', args=[self.lesson.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class ApiRootQueryBudgetTests(TestCase):
+    """The browsable API root should not touch the database."""
+
+    def test_api_root(self):
+        with self.assertNumQueries(0):
+            response = APIClient().get('/api/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset pagination of the course and lesson lists."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=5, lessons_per_course=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def collect_pages(self, url):
+        """Follow ``next`` links and return all results and page count."""
+        results, pages = [], 0
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return results, pages
+
+    def test_courses_are_paginated_newest_first(self):
+        results, pages = self.collect_pages(reverse('course-list') + '?page_size=2')
+        self.assertEqual(pages, 3)
+        expected = list(
+            Course.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual([item['id'] for item in results], expected)
+
+    def test_lessons_are_paginated_oldest_first(self):
+        results, pages = self.collect_pages(
+            reverse('lesson-list-create') + '?page_size=10'
+        )
+        self.assertEqual(pages, 3)
+        expected = list(
+            Lesson.objects.order_by('created_at', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual([item['id'] for item in results], expected)
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        Lesson.objects.update(created_at=Lesson.objects.first().created_at)
+        results, _ = self.collect_pages(reverse('lesson-list-create') + '?page_size=4')
+        ids = [item['id'] for item in results]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 25)
+
+    def test_previous_links_walk_back_through_ties(self):
+        Lesson.objects.update(created_at=Lesson.objects.first().created_at)
+        url, pages = reverse('lesson-list-create') + '?page_size=4', []
+        while url:
+            response = self.client.get(url)
+            pages.append([item['id'] for item in response.data['results']])
+            url = response.data['next']
+        url = response.data['previous']
+        for page in reversed(pages[:-1]):
+            response = self.client.get(url)
+            self.assertEqual([item['id'] for item in response.data['results']], page)
+            url = response.data['previous']
+        self.assertIsNone(url)
+
+    def test_cursor_with_foreign_position_is_rejected(self):
+        cursor = base64.b64encode(b'p=%5B%22garbage%22%2C%221%22%5D').decode()
+        response = self.client.get(reverse('course-list'), {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_size_is_bounded(self):
+        create_catalog(courses=1, lessons_per_course=120)
+        response = self.client.get(reverse('lesson-list-create') + '?page_size=1000')
+        self.assertEqual(len(response.data['results']), 100)
+
+    def test_cursor_is_opaque(self):
+        response = self.client.get(reverse('course-list') + '?page_size=2')
+        self.assertNotIn('created_at', response.data['next'])
+        self.assertIn('cursor=', response.data['next'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('course-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ResponseCacheTests(TestCase):
+    """Caching of course and lesson reads with signal-driven invalidation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_repeated_reads_are_served_from_cache(self):
+        urls = [
+            reverse('course-list'),
+            reverse('course-detail', args=[self.courses[0].pk]),
+            reverse('lesson-list-create'),
+        ]
+        for url in urls:
+            first = self.client.get(url)
+            self.assertEqual(first['X-Cache'], 'MISS')
+            with self.assertNumQueries(1):
+                second = self.client.get(url)
+            self.assertEqual(second['X-Cache'], 'HIT')
+            self.assertEqual(first.data, second.data)
+
+    def test_keys_are_per_query(self):
+        url = reverse('course-list')
+        self.client.get(url + '?page_size=1')
+        response = self.client.get(url + '?page_size=2')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_lesson_edit_invalidates_parent_course_and_lists(self):
+        course, other = self.courses
+        detail = reverse('course-detail', args=[course.pk])
+        other_detail = reverse('course-detail', args=[other.pk])
+        for url in (detail, other_detail, reverse('course-list'), reverse('lesson-list-create')):
+            self.client.get(url)
+
+        lesson = course.lessons.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('lesson-detail', args=[lesson.pk]), {'title': 'Edited'}, format='json'
+            )
+
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Edited', [item['title'] for item in response.data['lessons']])
+        self.assertEqual(self.client.get(reverse('course-list'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('lesson-list-create'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(other_detail)['X-Cache'], 'HIT')
+
+    def test_moving_lesson_invalidates_both_courses(self):
+        course, other = self.courses
+        self.client.get(reverse('course-detail', args=[course.pk]))
+        self.client.get(reverse('course-detail', args=[other.pk]))
+
+        lesson = course.lessons.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('lesson-detail', args=[lesson.pk]), {'course': other.pk}, format='json'
+            )
+
+        response = self.client.get(reverse('course-detail', args=[course.pk]))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['lessons_count'], 1)
+        response = self.client.get(reverse('course-detail', args=[other.pk]))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['lessons_count'], 3)
+
+    def test_invalidation_waits_for_commit(self):
+        url = reverse('course-list')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title='New')
+            # A read before the commit must not cache the old rows anew.
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_course_delete_invalidates_lists(self):
+        course = self.courses[0]
+        self.client.get(reverse('course-list'))
+        self.client.get(reverse('lesson-list-create'))
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        response = self.client.get(reverse('lesson-list-create'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(reverse('course-list'))
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_stats_endpoint_reports_hits_and_misses(self):
+        reset_stats()
+        url = reverse('course-list')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(get_stats(), {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3})
+
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.client.force_authenticate(admin)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.data['hits'], 2)
+
+
+class ConditionalRequestTests(TestCase):
+    """ETag / Last-Modified handling on the materials endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+        cls.lesson = cls.courses[0].lessons.first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_matching_etag_returns_not_modified(self):
+        urls = [
+            reverse('course-list'),
+            reverse('course-detail', args=[self.courses[0].pk]),
+            reverse('lesson-list-create'),
+            reverse('lesson-detail', args=[self.lesson.pk]),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertIn('ETag', response)
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_returns_not_modified(self):
+        url = reverse('lesson-detail', args=[self.lesson.pk])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_lists_validate_deletions_without_last_modified(self):
+        for url in (reverse('course-list'), reverse('lesson-list-create')):
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            etag = response['ETag']
+            Lesson.objects.filter(course=self.courses[1]).last().delete()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lesson_change_changes_course_etag(self):
+        detail = reverse('course-detail', args=[self.courses[0].pk])
+        etag = self.client.get(detail)['ETag']
+        list_etag = self.client.get(reverse('course-list'))['ETag']
+        Lesson.objects.create(
+            course=self.courses[0], title='New', video_url='https://example.com/new'
+        )
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(reverse('course-list'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_match_prevents_lost_updates(self):
+        url = reverse('lesson-detail', args=[self.lesson.pk])
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.patch(
+            url, {'title': 'First'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(
+            url, {'title': 'Second'}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.title, 'First')
+
+        response = self.client.delete(url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Lesson.objects.filter(pk=self.lesson.pk).exists())
+
+    def test_missing_object_is_not_found(self):
+        response = self.client.get(reverse('course-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class LessonBulkTests(TestCase):
+    """Bulk create, update and delete of lessons."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=3, lessons_per_course=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('lesson-bulk')
+
+    def payload(self, count):
+        return [
+            {
+                'title': f'Imported {index}',
+                'video_url': f'https://example.com/imported/{index}',
+                'course': self.courses[index % len(self.courses)].pk,
+            }
+            for index in range(count)
+        ]
+
+    def test_create_runs_constant_number_of_queries(self):
+        # Course lookup, savepoint pair, two INSERT batches (SQLite caps
+        # the number of bound parameters per statement), the counters and
+        # the change feed entries of the lessons and the course.
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, self.payload(200), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 200)
+        self.assertTrue(all(item['id'] for item in response.data))
+        self.assertEqual(Lesson.objects.count(), 203)
+
+    def test_create_reports_errors_per_item_and_writes_nothing(self):
+        payload = self.payload(3)
+        payload[1]['course'] = 0
+        del payload[2]['video_url']
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {1, 2})
+        self.assertIn('course', response.data[1])
+        self.assertIn('video_url', response.data[2])
+        self.assertEqual(Lesson.objects.count(), 3)
+
+    def test_update(self):
+        lessons = list(Lesson.objects.all())
+        payload = [
+            {'id': lesson.pk, 'title': f'Updated {lesson.pk}', 'course': self.courses[0].pk}
+            for lesson in lessons
+        ]
+        with self.assertNumQueries(8):
+            response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for lesson in lessons:
+            lesson_updated_at = lesson.updated_at
+            lesson.refresh_from_db()
+            self.assertEqual(lesson.title, f'Updated {lesson.pk}')
+            self.assertEqual(lesson.course_id, self.courses[0].pk)
+            self.assertGreater(lesson.updated_at, lesson_updated_at)
+
+    def test_update_reports_unknown_ids(self):
+        response = self.client.patch(self.url, [{'id': 0, 'title': 'Nope'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(0, response.data)
+
+    def test_update_invalidates_course_cache(self):
+        course = self.courses[0]
+        detail = reverse('course-detail', args=[course.pk])
+        self.client.get(detail)
+        lesson = course.lessons.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, [{'id': lesson.pk, 'title': 'Bulk'}], format='json')
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['lessons'][0]['title'], 'Bulk')
+
+    def test_delete(self):
+        ids = list(Lesson.objects.values_list('id', flat=True)[:2])
+        response = self.client.delete(self.url, ids, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(Lesson.objects.count(), 1)
+
+    def test_batch_size_is_limited(self):
+        response = self.client.post(self.url, self.payload(1001), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogExportTests(TestCase):
+    """Streaming NDJSON/CSV export of the catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+        cls.admin = User.objects.create_superuser('admin@example.com', 'password')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_ndjson_streams_courses_and_lessons(self):
+        response = self.client.get(reverse('catalog-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['type'] for row in rows], ['courses'] * 2 + ['lessons'] * 4)
+        self.assertEqual(rows[2]['course'], self.courses[0].pk)
+
+    def test_csv_export_of_lessons(self):
+        response = self.client.get(reverse('catalog-export') + '?resource=lessons&output=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['title'], 'Lesson 0.0')
+
+    def test_rows_are_streamed_in_chunks(self):
+        for output in ('ndjson', 'csv'):
+            with mock.patch.object(export, 'STREAM_CHUNK_SIZE', 1), self.subTest(output=output):
+                chunks = list(export.export('lessons', output))
+            with mock.patch.object(export, 'STREAM_CHUNK_SIZE', 64 * 1024):
+                whole = list(export.export('lessons', output))
+            # Full lines only: with one-character chunks, one line (or the
+            # CSV header and first row) per chunk.
+            self.assertEqual(len(chunks), 4)
+            self.assertTrue(all(chunk.endswith('\n') for chunk in chunks))
+            self.assertEqual(whole, [''.join(chunks)])
+
+    async def test_asgi_sends_each_chunk_as_it_is_produced(self):
+        events = []
+
+        def recorded(*args, **kwargs):
+            for chunk in export.export(*args, **kwargs):
+                events.append('produced')
+                yield chunk
+
+        async def send(message):
+            if message.get('body'):
+                events.append('sent')
+
+        credentials = base64.b64encode(b'admin@example.com:password').decode()
+        with mock.patch.object(export, 'STREAM_CHUNK_SIZE', 1), \
+                mock.patch('materials.views.export', side_effect=recorded):
+            messages = await asgi_request(
+                'GET', reverse('catalog-export'), 'resource=lessons',
+                headers={'authorization': f'Basic {credentials}'}, send=send
+            )
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        # Not read whole into a list before the first chunk goes out
+        self.assertEqual(events, ['produced', 'sent'] * 4)
+        rows = b''.join(message.get('body', b'') for message in messages).splitlines()
+        self.assertEqual(len(rows), 4)
+
+    def test_updated_at_range(self):
+        lesson = Lesson.objects.order_by('pk').last()
+        Lesson.objects.filter(pk=lesson.pk).update(updated_at='2030-01-01T00:00:00Z')
+        response = self.client.get(
+            reverse('catalog-export') + '?resource=lessons&updated_after=2029-12-31'
+        )
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [lesson.pk])
+
+    def test_invalid_parameters(self):
+        for query in ('?resource=users', '?output=xml', '?output=csv', '?updated_after=soon'):
+            response = self.client.get(reverse('catalog-export') + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_requires_admin(self):
+        response = APIClient().get(reverse('catalog-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_command(self):
+        stdout = io.StringIO()
+        call_command('export_catalog', '--resource', 'courses', stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'lessons.csv')
+            call_command('export_catalog', '--resource', 'lessons', '--format', 'csv', '--output', path)
+            with open(path, encoding='utf-8') as stream:
+                self.assertEqual(len(list(csv.DictReader(stream))), 4)
+
+
+class SparseFieldsetTests(TestCase):
+    """``?fields=`` and ``?expand=`` on the materials endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+        Lesson.objects.update(description='x' * 1000)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_course_list_fields_limit_columns_and_skip_count(self):
+        response, queries = self.get(reverse('course-list') + '?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description', queries[1])
+        self.assertNotIn('COUNT', queries[1])
+
+    def test_course_list_expand_lessons(self):
+        response, queries = self.get(
+            reverse('course-list') + '?fields=id,title,lessons.id,lessons.title&expand=lessons'
+        )
+        course = response.data['results'][0]
+        self.assertEqual(set(course), {'id', 'title', 'lessons'})
+        self.assertEqual(set(course['lessons'][0]), {'id', 'title'})
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('description', queries[2])
+
+        response, _ = self.get(reverse('course-list') + '?expand=lessons')
+        self.assertEqual(len(response.data['results'][0]['lessons']), 2)
+
+    def test_course_detail_without_lessons_skips_prefetch(self):
+        url = reverse('course-detail', args=[self.courses[0].pk])
+        response, queries = self.get(url + '?fields=id,title,lessons_count')
+        self.assertEqual(response.data, {
+            'id': self.courses[0].pk, 'title': 'Course 0', 'lessons_count': 2
+        })
+        self.assertEqual(len(queries), 2)
+
+    def test_course_detail_nested_fields(self):
+        url = reverse('course-detail', args=[self.courses[0].pk])
+        response, queries = self.get(url + '?fields=lessons.title')
+        self.assertEqual(set(response.data), {'lessons'})
+        self.assertEqual(set(response.data['lessons'][0]), {'title'})
+        self.assertNotIn('description', queries[-1])
+
+    def test_lesson_list_fields(self):
+        response, queries = self.get(reverse('lesson-list-create') + '?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        self.assertNotIn('description', queries[-1])
+
+    def test_fields_do_not_affect_writes(self):
+        lesson = Lesson.objects.first()
+        response = self.client.patch(
+            reverse('lesson-detail', args=[lesson.pk]) + '?fields=id',
+            {'title': 'Renamed'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Renamed')
+
+
+class FastReadSerializationTests(TestCase):
+    """The values() fast path must render exactly what the serializers do."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=3, lessons_per_course=3)
+        Course.objects.filter(pk=cls.courses[0].pk).update(
+            preview='courses/previews/cover image.png', description=None
+        )
+        Lesson.objects.filter(course=cls.courses[1]).update(preview='lessons/previews/ünïcode.jpg')
+
+    def assertSameResponse(self, url):
+        cache.clear()
+        fast = APIClient().get(url, HTTP_ACCEPT='application/json')
+        cache.clear()
+        with override_settings(FAST_READ_SERIALIZATION=False):
+            slow = APIClient().get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content, url)
+
+    def test_output_is_byte_identical(self):
+        lesson = Lesson.objects.filter(course=self.courses[1]).first()
+        for url in (
+            reverse('course-list'),
+            reverse('course-list') + '?fields=id,preview,updated_at&page_size=2',
+            reverse('course-list') + '?expand=lessons',
+            reverse('course-detail', args=[self.courses[0].pk]) + '?fields=id,title,preview',
+            reverse('lesson-list-create'),
+            reverse('lesson-list-create') + '?fields=title&page_size=4',
+            reverse('lesson-detail', args=[lesson.pk]),
+        ):
+            self.assertSameResponse(url)
+
+    def test_pagination_cursor_with_sparse_fields(self):
+        response = APIClient().get(reverse('lesson-list-create') + '?fields=title&page_size=4')
+        response = APIClient().get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_missing_object_is_not_found(self):
+        response = APIClient().get(reverse('lesson-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_object_permissions_see_the_instance(self):
+        lesson = await Lesson.objects.filter(course=self.courses[1]).afirst()
+        await Lesson.objects.filter(pk=lesson.pk).aupdate(title='Draft lesson')
+        url = reverse('lesson-detail', args=[lesson.pk])
+        with mock.patch.object(LessonRetrieveUpdateDestroyAPIView, 'permission_classes', [NoDraftsPermission]):
+            for client in (AsyncClient(), ASGIClient()):
+                response = await client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class NoDraftsPermission(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return not obj.title.startswith('Draft')
+
+
+class SearchTests(TestCase):
+    """FTS5 search endpoint, index sync and admin search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = Course.objects.create(title='Python basics', description='Learn programming')
+        cls.django = Course.objects.create(title='Web development', description='Django and Python')
+        cls.lesson = Lesson.objects.create(
+            course=cls.django, title='Django models', video_url='https://example.com/1'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def hits(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['object']['id']) for item in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(
+            self.hits('python', type='course'),
+            [('course', self.python.pk), ('course', self.django.pk)]
+        )
+
+    def test_searches_both_types_with_prefix_on_last_word(self):
+        self.assertEqual(
+            set(self.hits('djan')),
+            {('course', self.django.pk), ('lesson', self.lesson.pk)}
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        self.lesson.title = 'ORM queries'
+        self.lesson.save()
+        self.assertEqual(self.hits('models'), [])
+        self.assertEqual(self.hits('orm'), [('lesson', self.lesson.pk)])
+        self.django.delete()
+        self.assertEqual(self.hits('orm'), [])
+
+    def test_bulk_writes_are_indexed(self):
+        Lesson.objects.bulk_create([
+            Lesson(course=self.python, title=f'Generators {index}', video_url='https://example.com')
+            for index in range(3)
+        ])
+        Course.objects.filter(pk=self.python.pk).update(title='Snakes')
+        self.assertEqual(len(self.hits('generators')), 3)
+        self.assertEqual(self.hits('snakes'), [('course', self.python.pk)])
+
+    def test_fts_syntax_in_input_is_harmless(self):
+        for query in ('"unbalanced', 'AND OR NOT', 'title:python', '*', 'NEAR(a b)'):
+            self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(self.hits(''), [])
+
+    def test_pagination(self):
+        Lesson.objects.bulk_create([
+            Lesson(course=self.python, title=f'Topic {index}', video_url='https://example.com')
+            for index in range(5)
+        ])
+        response = self.client.get(reverse('search'), {'q': 'topic', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        seen = {item['object']['id'] for item in response.data['results']}
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.update(item['object']['id'] for item in response.data['results'])
+        self.assertEqual(len(seen), 5)
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_unknown_type(self):
+        response = self.client.get(reverse('search'), {'q': 'python', 'type': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/materials/lesson/', {'q': 'models'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'Django models')
+        response = self.client.get('/admin/materials/course/', {'q': 'basics'})
+        self.assertContains(response, 'Python basics')
+        self.assertNotContains(response, 'Web development')
+
+    def test_triggers_are_reinstalled_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER materials_lesson_fts_ai')
+        with CaptureQueriesContext(connection) as queries:
+            emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        # Only what is missing is created; the index is not rebuilt.
+        self.assertFalse([query for query in queries if 'rebuild' in query['sql']])
+        self.assertFalse([query for query in queries if query['sql'].startswith('DROP')])
+        lesson = Lesson.objects.create(course=self.python, title='Generators', video_url='https://example.com/2')
+        self.assertEqual(self.hits('generators'), [('lesson', lesson.pk)])
+
+    def test_match_query_quotes_tokens(self):
+        self.assertEqual(search.build_match_query('hello "world'), '"hello" "world"*')
+        self.assertEqual(search.build_match_query('  '), '')
+
+
+class ListingFilterTests(TestCase):
+    """Lesson/course filters, the nested lesson route and their indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=3, lessons_per_course=3)
+        Lesson.objects.filter(course=cls.courses[0]).update(updated_at='2030-01-01T00:00:00Z')
+        Course.objects.filter(pk=cls.courses[2].pk).update(created_at='2030-01-01T00:00:00Z')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def ids(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_lesson_filters(self):
+        course = self.courses[1]
+        expected = list(course.lessons.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(self.ids(reverse('lesson-list-create'), {'course': course.pk}), expected)
+        self.assertEqual(
+            len(self.ids(reverse('lesson-list-create'), {'updated_since': '2029-12-31'})), 3
+        )
+        first = Lesson.objects.order_by('created_at', 'id').first()
+        self.assertEqual(
+            len(self.ids(reverse('lesson-list-create'), {'created_after': first.created_at.isoformat()})),
+            8
+        )
+
+    def test_course_filters(self):
+        self.assertEqual(
+            self.ids(reverse('course-list'), {'created_after': '2029-12-31'}),
+            [self.courses[2].pk]
+        )
+
+    def test_invalid_filter_values(self):
+        for params in ({'course': 'abc'}, {'created_after': 'yesterday'}):
+            response = self.client.get(reverse('lesson-list-create'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nested_course_lessons(self):
+        course = self.courses[0]
+        url = reverse('course-lesson-list', args=[course.pk])
+        expected = list(course.lessons.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(self.ids(url), expected)
+        self.assertEqual(self.ids(url, {'updated_since': '2031-01-01'}), [])
+        self.assertEqual(
+            self.client.get(reverse('course-lesson-list', args=[0])).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.client.post(url, {}).status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    def query_plan(self, url, params=None):
+        """Return the EXPLAIN QUERY PLAN of the list query run for ``url``."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params or {})
+        sql = next(
+            query['sql'] for query in queries.captured_queries
+            if 'ORDER BY' in query['sql'] and 'LIMIT' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def test_lessons_by_course_use_composite_index(self):
+        plan = self.query_plan(reverse('lesson-list-create'), {'course': self.courses[0].pk})
+        self.assertIn('lesson_course_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        plan = self.query_plan(reverse('course-lesson-list', args=[self.courses[0].pk]))
+        self.assertIn('lesson_course_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_course_has_no_index_of_its_own(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Lesson._meta.db_table)
+        indexed = [info['columns'] for info in constraints.values() if info['index']]
+        self.assertIn(['course_id', 'created_at'], indexed)
+        self.assertNotIn(['course_id'], indexed)
+
+    def test_lesson_list_uses_created_at_index(self):
+        plan = self.query_plan(reverse('lesson-list-create'))
+        self.assertIn('lesson_created_at_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_course_list_uses_created_at_index(self):
+        plan = self.query_plan(reverse('course-list') + '?fields=id,title')
+        self.assertIn('course_created_at_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+def make_image(name='cover.png', size=(1600, 900), mode='RGBA'):
+    """Return an uploaded PNG of the given size."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTests(TestCase):
+    """Resized preview variants generated after upload."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media.name,
+            IMAGE_VARIANTS_ASYNC=False,
+            IMAGE_VARIANT_SIZES=(64, 256)
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.client = APIClient()
+
+    def variant_path(self, name, size, extension):
+        root, _ = os.path.splitext(name)
+        return os.path.join(self.media.name, f'{root}.{size}.{extension}')
+
+    def test_upload_generates_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('course-list'),
+                {'title': 'Illustrated', 'preview': make_image()},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        name = Course.objects.get(pk=response.data['id']).preview.name
+
+        for size in (64, 256):
+            for extension in ('webp', 'jpg'):
+                with Image.open(self.variant_path(name, size, extension)) as variant:
+                    self.assertEqual(max(variant.size), size)
+        with Image.open(self.variant_path(name, 64, 'jpg')) as variant:
+            self.assertEqual(variant.mode, 'RGB')
+
+        variants = response.data['preview_variants']
+        self.assertEqual(set(variants), {'64', '256'})
+        self.assertTrue(variants['256']['webp'].endswith('.256.webp'))
+        self.assertTrue(variants['256']['webp'].startswith('http://testserver/media/'))
+
+    def test_saves_without_new_upload_do_not_regenerate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(title='Course', preview=make_image())
+        with mock.patch.object(images, 'schedule') as schedule:
+            course.title = 'Renamed'
+            course.save()
+        schedule.assert_not_called()
+
+    def test_no_image_means_no_variants(self):
+        course = Course.objects.create(title='Plain')
+        response = self.client.get(reverse('course-detail', args=[course.pk]))
+        self.assertIsNone(response.data['preview_variants'])
+
+    def test_backfill_command(self):
+        course = Course.objects.create(title='Course')
+        Course.objects.filter(pk=course.pk).update(preview='courses/previews/old.png')
+        os.makedirs(os.path.join(self.media.name, 'courses/previews'))
+        with open(os.path.join(self.media.name, 'courses/previews/old.png'), 'wb') as stream:
+            stream.write(make_image(size=(300, 300), mode='RGB').read())
+
+        stdout = io.StringIO()
+        call_command('generate_image_variants', '--workers', '2', stdout=stdout)
+        self.assertIn('Generated variants for 1 image(s); 0 failed.', stdout.getvalue())
+        self.assertTrue(os.path.exists(self.variant_path('courses/previews/old.png', 256, 'webp')))
+
+        stdout = io.StringIO()
+        call_command('generate_image_variants', stdout=stdout)
+        self.assertIn('Generated variants for 0 image(s)', stdout.getvalue())
+
+
+class AsyncReadTests(TestCase):
+    """Async-native read views must answer exactly like the sync views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=3, lessons_per_course=2)
+        cls.lesson = cls.courses[0].lessons.first()
+
+    def setUp(self):
+        cache.clear()
+
+    async def get_both(self, url, **headers):
+        """Return the sync response, then the async one, with a cold cache each time."""
+        await cache.aclear()
+        sync = await AsyncClient().get(url, headers=headers)
+        await cache.aclear()
+        with mock.patch('config.async_views.run_sync_view', side_effect=AssertionError(url)):
+            native = await ASGIClient().get(url, headers=headers)
+        return sync, native
+
+    async def test_responses_match(self):
+        course = self.courses[0]
+        urls = [
+            reverse('course-list'),
+            reverse('course-list') + '?page_size=2&fields=id,title',
+            reverse('course-list') + '?expand=lessons',
+            reverse('course-detail', args=[course.pk]),
+            reverse('course-detail', args=[course.pk]) + '?fields=id,lessons.title',
+            reverse('course-detail', args=[0]),
+            reverse('course-lesson-list', args=[course.pk]),
+            reverse('course-lesson-list', args=[0]),
+            reverse('lesson-list-create') + f'?course={course.pk}',
+            reverse('lesson-detail', args=[self.lesson.pk]),
+            reverse('lesson-detail', args=[0]),
+        ]
+        for url in urls:
+            sync, native = await self.get_both(url, accept='application/json')
+            self.assertEqual(native.status_code, sync.status_code, url)
+            self.assertEqual(native.content, sync.content, url)
+            self.assertEqual(native.get('ETag'), sync.get('ETag'), url)
+            self.assertEqual(native.get('X-Cache'), sync.get('X-Cache'), url)
+
+    async def test_cursor_pages_match(self):
+        url = reverse('lesson-list-create') + '?page_size=2'
+        while url:
+            sync, native = await self.get_both(url, accept='application/json')
+            self.assertEqual(native.content, sync.content)
+            url = json.loads(native.content)['next']
+
+    async def test_cursor_pages_use_the_async_orm(self):
+        url = reverse('lesson-list-create') + '?page_size=2'
+        await cache.aclear()
+        with mock.patch.object(LessonPagination, 'paginate_queryset', side_effect=AssertionError(url)):
+            response = await ASGIClient().get(url, headers={'accept': 'application/json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)['results']), 2)
+
+    async def test_not_modified(self):
+        url = reverse('course-detail', args=[self.courses[0].pk])
+        etag = (await ASGIClient().get(url))['ETag']
+        response = await ASGIClient().get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_browsable_api_and_writes_use_sync_views(self):
+        url = reverse('course-list')
+        response = await ASGIClient().get(url, headers={'accept': 'text/html'})
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+        response = await ASGIClient().post(url, {'title': 'Async'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Course.objects.filter(title='Async').aexists())
+
+
+class ServerTimingTests(TestCase):
+    """Server-Timing header and the Prometheus metrics endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(courses=2, lessons_per_course=1)
+        cls.admin = User.objects.create_superuser('admin@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.client = APIClient()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('course-list'))
+        timings = dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+        self.assertIn('total;dur=', timings['total'])
+        self.assertIn('desc="2 queries"', timings['db'])
+        self.assertIn('serialize;dur=', timings['serialize'])
+        self.assertIn(f'desc="{len(response.content)} bytes"', timings['size'])
+
+    async def test_server_timing_counts_async_orm_queries(self):
+        await cache.aclear()
+        response = await ASGIClient().get(reverse('course-list'), headers={'accept': 'application/json'})
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        for _ in range(3):
+            self.client.get(reverse('course-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds summary', body)
+        self.assertIn('http_request_duration_seconds{route="course-list",method="GET",quantile="0.99"}', body)
+        self.assertIn('http_request_db_queries_count{route="course-list",method="GET"} 3', body)
+        self.assertIn('http_responses_total{route="course-list",method="GET",status="200"} 3', body)
+
+    def test_histogram_quantiles(self):
+        histogram = metrics.Histogram(0.001, 40)
+        for value in range(1, 101):
+            histogram.observe(value / 1000)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.05, delta=0.01)
+        self.assertAlmostEqual(histogram.quantile(0.99), 0.099, delta=0.02)
+
+
+class SeedCommandTests(TestCase):
+    """``manage.py seed`` bulk data generation."""
+
+    def seed(self, **options):
+        call_command('seed', stdout=io.StringIO(), **options)
+
+    def test_seed(self):
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.seed(users=5, courses=3, lessons=4, batch_size=2)
+        self.assertEqual(User.objects.exclude(pk=admin.pk).count(), 5)
+        self.assertEqual(Course.objects.count(), 3)
+        self.assertEqual(Lesson.objects.count(), 12)
+        self.assertEqual(set(Course.objects.annotate(n=Count('lessons')).values_list('n', flat=True)), {4})
+        self.assertEqual(set(Course.objects.values_list('lessons_count', flat=True)), {4})
+        self.assertTrue(User.objects.exclude(pk=admin.pk).first().check_password('password'))
+        self.assertEqual(search.search('lesson', kinds=['lesson'], limit=100)[0][0], 'lesson')
+
+        self.seed(users=5, courses=1, lessons=1)
+        self.assertEqual(User.objects.count(), 11)
+
+        self.seed(users=2, courses=1, lessons=1, clear=True)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Course.objects.count(), 1)
+        self.assertEqual(Lesson.objects.count(), 1)
+
+    def test_batches_inserts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.seed(users=0, courses=10, lessons=10, batch_size=50)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "materials_lesson"')]
+        self.assertEqual(len(inserts), 2)
+
+
+class CourseCounterTests(TestCase):
+    """Stored ``lessons_count``/``last_lesson_at`` on courses."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertCounters(self):
+        self.assertFalse(counters.drifted().exists())
+        for course in Course.objects.annotate(n=Count('lessons')):
+            self.assertEqual(course.lessons_count, course.n)
+
+    def test_single_writes(self):
+        first, second = self.courses
+        response = self.client.post(reverse('lesson-list-create'), {
+            'title': 'New', 'video_url': 'https://example.com/new', 'course': first.pk
+        }, format='json')
+        first.refresh_from_db()
+        self.assertEqual(first.lessons_count, 3)
+        self.assertEqual(first.last_lesson_at, Lesson.objects.get(pk=response.data['id']).created_at)
+
+        detail = reverse('lesson-detail', args=[response.data['id']])
+        self.client.patch(detail, {'course': second.pk}, format='json')
+        self.assertEqual(
+            list(Course.objects.order_by('pk').values_list('lessons_count', flat=True)), [2, 3]
+        )
+        self.assertCounters()
+
+        self.client.delete(detail)
+        self.assertEqual(
+            list(Course.objects.order_by('pk').values_list('lessons_count', flat=True)), [2, 2]
+        )
+        self.assertCounters()
+
+    def test_last_lesson_removed(self):
+        course = Course.objects.create(title='Empty')
+        lesson = Lesson.objects.create(course=course, title='Only', video_url='https://example.com/1')
+        lesson.delete()
+        course.refresh_from_db()
+        self.assertEqual(course.lessons_count, 0)
+        self.assertEqual(course.last_lesson_at, course.created_at)
+
+    def test_bulk_writes(self):
+        first, second = self.courses
+        url = reverse('lesson-bulk')
+        response = self.client.post(url, [
+            {'title': f'Bulk {index}', 'video_url': 'https://example.com/bulk', 'course': first.pk}
+            for index in range(3)
+        ], format='json')
+        self.assertCounters()
+
+        ids = [item['id'] for item in response.data]
+        self.client.patch(url, [{'id': pk, 'course': second.pk} for pk in ids], format='json')
+        self.assertCounters()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(url, ids, format='json')
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "materials_course"')]
+        self.assertEqual(len(updates), 1)
+        self.assertCounters()
+
+    def test_course_delete_counts_lessons_once_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(reverse('course-detail', args=[self.courses[0].pk]))
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertCounters()
+
+    def test_repair_command(self):
+        course = self.courses[0]
+        Course.objects.filter(pk=course.pk).update(lessons_count=10)
+        Lesson.objects.filter(course=self.courses[1]).update(course=course)
+
+        stdout = io.StringIO()
+        call_command('repair_course_counters', '--dry-run', '--batch-size', '1', stdout=stdout)
+        self.assertIn('2 have drifted', stdout.getvalue())
+        self.assertTrue(counters.drifted().exists())
+
+        call_command('repair_course_counters', '--batch-size', '1', stdout=stdout)
+        self.assertIn('repaired 2', stdout.getvalue())
+        self.assertCounters()
+        self.assertEqual(
+            list(Course.objects.order_by('pk').values_list('lessons_count', flat=True)), [4, 0]
+        )
+
+    def test_ordering(self):
+        create_catalog(courses=3, lessons_per_course=1)
+        Lesson.objects.create(
+            course=self.courses[1], title='Latest', video_url='https://example.com/latest'
+        )
+        url = reverse('course-list')
+
+        response = self.client.get(url, {'ordering': '-lessons_count', 'page_size': 2})
+        counts = [item['lessons_count'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            counts += [item['lessons_count'] for item in response.data['results']]
+        self.assertEqual(counts, [3, 2, 1, 1, 1])
+
+        response = self.client.get(url, {'ordering': '-last_lesson_at'})
+        self.assertEqual(response.data['results'][0]['id'], self.courses[1].pk)
+
+        response = self.client.get(url, {'ordering': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class SyncFeedTests(TestCase):
+    """Incremental sync through the change feed."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=2, lessons_per_course=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('sync')
+
+    def sync(self, token, **params):
+        response = self.client.get(self.url, {'token': token, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_bootstrap_then_changes(self):
+        token = self.client.get(self.url).data['token']
+        self.assertEqual(self.sync(token)['changes'], [])
+
+        course = self.courses[0]
+        lesson = Lesson.objects.filter(course=course).first()
+        self.client.patch(reverse('lesson-detail', args=[lesson.pk]), {'title': 'Renamed'}, format='json')
+        self.client.patch(reverse('lesson-detail', args=[lesson.pk]), {'title': 'Again'}, format='json')
+        data = self.sync(token)
+        self.assertFalse(data['has_more'])
+        self.assertEqual(
+            [(item['type'], item['id'], item['deleted']) for item in data['changes']],
+            [('lesson', lesson.pk, False)]
+        )
+        self.assertEqual(data['changes'][0]['object']['title'], 'Again')
+
+        token = data['token']
+        self.client.delete(reverse('lesson-detail', args=[lesson.pk]))
+        changes = self.sync(token)['changes']
+        self.assertIn({'type': 'lesson', 'id': lesson.pk, 'deleted': True}, changes)
+        self.assertIn(('course', course.pk), [(item['type'], item['id']) for item in changes])
+        course_item = next(item for item in changes if item['type'] == 'course')
+        self.assertEqual(course_item['object']['lessons_count'], 1)
+
+    def test_course_delete_tombstones_lessons(self):
+        token = self.client.get(self.url).data['token']
+        course = self.courses[0]
+        lesson_ids = set(Lesson.objects.filter(course=course).values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(reverse('course-detail', args=[course.pk]))
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "materials_change"')]
+        # The lessons' tombstones, the course's counter change, its tombstone.
+        self.assertEqual(len(inserts), 3)
+
+        changes = self.sync(token)['changes']
+        self.assertTrue(all(item['deleted'] for item in changes))
+        self.assertEqual({item['id'] for item in changes if item['type'] == 'lesson'}, lesson_ids)
+        self.assertIn({'type': 'course', 'id': course.pk, 'deleted': True}, changes)
+
+    def test_paging(self):
+        token = self.client.get(self.url).data['token']
+        for lesson in Lesson.objects.all():
+            self.client.patch(reverse('lesson-detail', args=[lesson.pk]), {'title': 'Renamed'}, format='json')
+
+        seen = []
+        while True:
+            data = self.sync(token, limit=3)
+            seen += [item['id'] for item in data['changes']]
+            token = data['token']
+            if not data['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(Lesson.objects.values_list('pk', flat=True)))
+        self.assertEqual(self.sync(token)['changes'], [])
+
+    def test_expired_and_invalid_tokens(self):
+        stale = changes.encode_token(0)
+        Course.objects.create(title='Newer')
+        Change.objects.update(changed_at=timezone.now() - timedelta(days=60))
+        stdout = io.StringIO()
+        call_command('prune_changes', stdout=stdout)
+        self.assertIn('Pruned', stdout.getvalue())
+        self.assertEqual(Change.objects.count(), 1)
+
+        response = self.client.get(self.url, {'token': stale})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.client.get(self.url, {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        latest = changes.latest_seq()
+        response = self.client.get(self.url, {'token': changes.encode_token(latest)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {'token': changes.encode_token(latest + 100)})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class AdminScalingTests(TestCase):
+    """Admin pages whose cost does not grow with the size of the tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog(courses=3, lessons_per_course=3)
+        cls.admin = User.objects.create_superuser('admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_lesson_changelist(self):
+        url = reverse('admin:materials_lesson_changelist')
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        # Neither the course filter nor the rows query the courses one by one.
+        self.assertEqual(
+            len([query for query in queries if 'FROM "materials_course"' in query['sql']]), 0
+        )
+        self.assertEqual(response.context['cl'].result_count, Lesson.objects.order_by('-pk')[0].pk)
+
+        course = self.courses[1]
+        response = self.client.get(url, {'course': course.pk})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, course.title)
+        response = self.client.get(url, {'course': 'x'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_lesson_form_uses_autocomplete(self):
+        lesson = Lesson.objects.filter(course=self.courses[0]).first()
+        response = self.client.get(reverse('admin:materials_lesson_change', args=[lesson.pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, self.courses[2].title)
+
+    def test_course_inline_is_capped(self):
+        course = self.courses[0]
+        url = reverse('admin:materials_course_change', args=[course.pk])
+        with mock.patch.object(RecentLessonsFormSet, 'max_shown', 2):
+            response = self.client.get(url)
+            formset = response.context['inline_admin_formsets'][0].formset
+            self.assertEqual(formset.initial_form_count(), 2)
+            newest = list(Lesson.objects.filter(course=course).order_by('-created_at', '-id')[:2])
+            data = {
+                'title': 'Renamed', 'description': '',
+                'lessons-TOTAL_FORMS': 2, 'lessons-INITIAL_FORMS': 2,
+                'lessons-MIN_NUM_FORMS': 0, 'lessons-MAX_NUM_FORMS': 1000,
+            }
+            for index, lesson in enumerate(newest):
+                data.update({
+                    f'lessons-{index}-id': lesson.pk,
+                    f'lessons-{index}-course': course.pk,
+                    f'lessons-{index}-title': f'Edited {index}',
+                    f'lessons-{index}-video_url': lesson.video_url,
+                })
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(Lesson.objects.filter(course=course).values_list('title', flat=True)),
+            ['Edited 0', 'Edited 1', 'Lesson 0.0']
+        )
+
+    def test_date_hierarchy_matches_datetimes(self):
+        Lesson.objects.filter(pk=Lesson.objects.first().pk).update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+        queryset = Lesson.objects.all()
+        indexed = queryset._chain()
+        indexed.__class__ = indexed_dates_queryset(type(queryset))
+        for kind in ('year', 'month', 'day'):
+            self.assertEqual(indexed.datetimes('created_at', kind), list(queryset.datetimes('created_at', kind)))
+
+        response = self.client.get(reverse('admin:materials_course_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+
+class FastJSONTests(TestCase):
+    """The fast renderer/parser pair and response compression."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalog(courses=3, lessons_per_course=5)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_renders_like_drf(self):
+        lesson = Lesson.objects.first()
+        lesson.preview = 'lessons/previews/1.png'
+        data = {
+            'lessons': LessonSerializer(Lesson.objects.all(), many=True).data,
+            'created_at': lesson.created_at,
+            'day': lesson.created_at.date(),
+            'amount': Decimal('1.50'),
+            'id': uuid.UUID(int=1),
+            'label': gettext_lazy('Lesson'),
+            'separator': 'a\u2028b',
+            'big': 2 ** 70,
+            1: 'non-string key',
+        }
+        expected = JSONRenderer().render({**data, 'preview': lesson.preview.url})
+        data['preview'] = lesson.preview
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch('config.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_parser(self):
+        payload = [
+            {'title': 'Über', 'video_url': 'https://example.com/u', 'course': Course.objects.first().pk}
+        ]
+        for orjson in (renderers.orjson, None):
+            with mock.patch('config.renderers.orjson', orjson):
+                parsed = FastJSONParser().parse(io.BytesIO(json.dumps(payload).encode()))
+                self.assertEqual(parsed, payload)
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(io.BytesIO(b'{"title": NaN}'))
+
+        response = self.client.post(reverse('lesson-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('lesson-bulk'), '[{', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compression(self):
+        url = reverse('lesson-list-create')
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=1.0, gzip;q=0.5')
+        self.assertEqual(response['Content-Encoding'], 'br' if compression.brotli else 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]+-(br|gzip)"$')
+        if response['Content-Encoding'] == 'gzip':
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+
+        # The per-coding ETags revalidate, and the 304 repeats them.
+        etag = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertEqual(etag, plain['ETag'][:-1] + '-gzip"')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        small = self.client.get(reverse('course-detail', args=[Course.objects.first().pk]), {'fields': 'id'},
+                                HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', small)
+
+    def test_if_match_with_compressed_etag(self):
+        course = Course.objects.first()
+        Course.objects.filter(pk=course.pk).update(description='x' * 3000)
+        url = reverse('course-detail', args=[course.pk])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+
+        response = self.client.patch(url, {'title': 'Renamed'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(url, {'title': 'Again'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_negotiation(self):
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.negotiate('*'), 'br' if compression.brotli else 'gzip')
+        self.assertIsNone(compression.negotiate('deflate'))
+        self.assertIsNone(compression.negotiate('gzip;q=0'))
+        self.assertIsNone(compression.negotiate(''))
+
+
+class DatabaseProfileTests(TestCase):
+    """The production SQLite profile and read/write routing."""
+
+    def test_profiles(self):
+        self.assertEqual(list(database.sqlite_databases('db.sqlite3')), ['default'])
+        databases = database.sqlite_databases('db.sqlite3', production=True)
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 600)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('journal_mode', databases['replica']['PRAGMAS'])
+        self.assertEqual(databases['replica']['PRAGMAS']['query_only'], 'ON')
+
+    def test_pragmas_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            databases = connections.configure_settings(
+                database.sqlite_databases(os.path.join(directory, 'db.sqlite3'), production=True)
+            )
+            for alias, expected in (('default', ['wal', 0]), ('replica', ['wal', 1])):
+                wrapper = DatabaseWrapper(databases[alias], alias)
+                try:
+                    with wrapper.cursor() as cursor:
+                        values = [
+                            cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                            for name in ('journal_mode', 'query_only', 'synchronous', 'busy_timeout')
+                        ]
+                finally:
+                    wrapper.close()
+                self.assertEqual(values, expected + [1, 5000])
+
+    def test_router(self):
+        router = database.ReadWriteRouter()
+        seen = []
+
+        def get_response(request):
+            seen.append(router.db_for_read(Course))
+            return None
+
+        middleware = database.ReadRoutingMiddleware(get_response)
+        factory = RequestFactory()
+        with mock.patch.object(database.connections, 'settings', {'default': {}, 'replica': {}}):
+            middleware(factory.get('/api/courses/'))
+            middleware(factory.post('/api/courses/'))
+            seen.append(router.db_for_read(Course))
+        # Without a replica every read stays on the primary.
+        middleware(factory.get('/api/courses/'))
+        self.assertEqual(seen, ['replica', None, None, None])
+        self.assertEqual(router.db_for_write(Course), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'materials'))
+        self.assertIsNone(router.allow_migrate('default', 'materials'))
+
+
+class BatchTests(TestCase):
+    """The batch endpoint (config.batch)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = create_catalog()
+        cls.lesson = Lesson.objects.filter(course=cls.courses[0]).first()
+        cls.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def setUp(self):
+        cache.clear()
+        caches['profiles'].clear()
+        self.client = APIClient()
+
+    def batch(self, *requests, **kwargs):
+        return self.client.post(reverse('batch'), {'requests': list(requests)}, format='json', **kwargs)
+
+    def test_dashboard(self):
+        self.client.force_authenticate(self.user)
+        paths = [
+            reverse('user-my-profile'),
+            reverse('course-detail', args=[self.courses[0].pk]),
+            reverse('lesson-detail', args=[self.lesson.pk]) + '?fields=id,title',
+        ]
+        response = self.batch(*({'path': path} for path in paths))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for path, result in zip(paths, response.data['responses']):
+            cache.clear()
+            caches['profiles'].clear()
+            single = self.client.get(path)
+            self.assertEqual(result['status'], single.status_code, path)
+            self.assertEqual(result['body'], single.data, path)
+            self.assertEqual(result['headers']['ETag'], single['ETag'], path)
+
+    def test_token_is_checked_once(self):
+        key = self.client.post(
+            reverse('user-login'), {'email': 'user@example.com', 'password': 'password'}, format='json'
+        ).data['token']
+        authenticate = TokenAuthentication.authenticate
+        with mock.patch.object(TokenAuthentication, 'authenticate', autospec=True,
+                               side_effect=authenticate) as patched:
+            response = self.batch(
+                {'path': reverse('user-my-profile')},
+                {'path': reverse('user-my-profile'), 'headers': {'Accept-Language': 'ru'}},
+                HTTP_AUTHORIZATION=f'Token {key}'
+            )
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual([result['body']['email'] for result in response.data['responses']],
+                         ['user@example.com'] * 2)
+
+    def test_identical_reads_are_served_once(self):
+        path = reverse('course-detail', args=[self.courses[0].pk])
+        with CaptureQueriesContext(connection) as single:
+            self.batch({'path': path})
+        cache.clear()
+        with CaptureQueriesContext(connection) as repeated:
+            response = self.batch({'path': path}, {'path': path}, {'path': path + '?fields=id'})
+        results = response.data['responses']
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[2]['body'], {'id': self.courses[0].pk})
+        self.assertEqual(len(repeated) - len(single), 2)
+
+    def test_writes_are_not_skipped_over(self):
+        path = reverse('lesson-detail', args=[self.lesson.pk])
+        response = self.batch(
+            {'path': path},
+            {'method': 'PATCH', 'path': path, 'body': {'title': 'Renamed'}},
+            {'path': path},
+        )
+        titles = [result['body']['title'] for result in response.data['responses']]
+        self.assertEqual(titles, [self.lesson.title, 'Renamed', 'Renamed'])
+
+    def test_conditional_headers(self):
+        path = reverse('course-detail', args=[self.courses[0].pk])
+        etag = self.client.get(path)['ETag']
+        response = self.batch({'path': path, 'headers': {'If-None-Match': etag}}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['responses'][0]['status'], status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(BATCH_MAX_REQUESTS=2, BATCH_MAX_COST=6)
+    def test_limits(self):
+        path = reverse('course-list')
+        response = self.batch({'path': path}, {'path': path + '?page=2'}, {'path': path + '?page=3'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        create = {'method': 'POST', 'path': path, 'body': {'title': 'New'}}
+        response = self.batch(create, create)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Course.objects.filter(title='New').exists())
+
+        with override_settings(BATCH_MAX_REQUESTS=3):
+            response = self.batch({'path': path}, {'path': path}, create)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['responses'][2]['status'], status.HTTP_201_CREATED)
+
+    def test_unbatchable_requests(self):
+        response = self.batch(
+            {'path': '/api/missing/'},
+            {'path': reverse('batch')},
+            {'path': reverse('admin:index')},
+            {'path': 'api/courses/'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.batch({'path': '/api/missing/'}, {'path': reverse('batch')}, {'path': reverse('admin:index')})
+        self.assertEqual([result['status'] for result in response.data['responses']], [404, 400, 400])
+
+
+class MediaServingTests(TestCase):
+    """Content-hashed uploads served by config.media."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.content = bytes(range(256)) * 4
+        self.name = default_storage.save('lessons/previews/clip.png', ContentFile(self.content))
+
+    def get(self, name, **headers):
+        response = self.client.get(reverse('media', kwargs={'path': name}), **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_upload_names_are_content_hashed(self):
+        root, ext = os.path.splitext(self.name)
+        self.assertRegex(self.name, r'^lessons/previews/clip-[0-9a-f]{12}\.png$')
+        self.assertTrue(media.is_immutable(self.name))
+        variant = default_storage.save(f'{root}.64.webp', ContentFile(b'variant'))
+        self.assertEqual(variant, f'{root}.64.webp')
+        self.assertFalse(media.is_immutable(variant))
+
+    def test_full_response(self):
+        response = self.get(self.name)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_unhashed_names_are_revalidated(self):
+        with open(os.path.join(self.media.name, 'plain.txt'), 'wb') as file:
+            file.write(b'plain')
+        self.assertEqual(self.get('plain.txt')['Cache-Control'], 'public, no-cache')
+
+    def test_conditional_requests(self):
+        response = self.get(self.name)
+        self.assertEqual(self.get(self.name, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        response = self.get(self.name, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_ranges(self):
+        size = len(self.content)
+        cases = [
+            ('bytes=2-5', 2, 5),
+            ('bytes=1000-', 1000, size - 1),
+            ('bytes=-4', size - 4, size - 1),
+            ('bytes=10-99999', 10, size - 1),
+        ]
+        for header, start, end in cases:
+            response = self.get(self.name, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT, header)
+            self.assertEqual(b''.join(response.streaming_content), self.content[start:end + 1], header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}', header)
+            self.assertEqual(response['Content-Length'], str(end - start + 1), header)
+
+        response = self.get(self.name, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        # Several ranges are answered with the whole file.
+        self.assertEqual(self.get(self.name, HTTP_RANGE='bytes=0-1,4-5').status_code, status.HTTP_200_OK)
+
+    def test_if_range(self):
+        etag = self.get(self.name)['ETag']
+        response = self.get(self.name, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        response = self.get(self.name, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_not_found(self):
+        os.makedirs(os.path.join(self.media.name, 'empty'))
+        for name in ('missing.png', '../db.sqlite3', 'empty', 'lessons/previews'):
+            self.assertEqual(self.get(name).status_code, status.HTTP_404_NOT_FOUND, name)
+        response = self.client.post(reverse('media', kwargs={'path': self.name}))
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_sendfile_headers(self):
+        with override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.get(self.name)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        with override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile'):
+            response = self.get(self.name)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media.name, self.name))
+
+
+class CourseDeletionTests(TestCase):
+    """Chunked course deletion and media cleanup (materials.deletion)."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media.name,
+            IMAGE_VARIANTS_ASYNC=False,
+            MEDIA_CLEANUP_ASYNC=False,
+            IMAGE_VARIANT_SIZES=(64,)
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course = Course.objects.create(title='Doomed', preview=make_image('course.png', (100, 100)))
+            self.other = Course.objects.create(title='Kept')
+            self.lessons = [
+                Lesson.objects.create(
+                    course=self.course, title=f'Lesson {index}', video_url='https://example.com/',
+                    preview=make_image(f'lesson{index}.png', (100, 100)) if index < 2 else None
+                )
+                for index in range(7)
+            ]
+            self.kept = Lesson.objects.create(
+                course=self.other, title='Kept', video_url='https://example.com/',
+                preview=make_image('kept.png', (100, 100))
+            )
+
+    def stored(self):
+        files = set()
+        for directory, _, names in os.walk(self.media.name):
+            files.update(os.path.relpath(os.path.join(directory, name), self.media.name) for name in names)
+        return files
+
+    def test_lessons_are_deleted_in_chunks_without_loading_them(self):
+        token = self.client.get(reverse('sync')).data['token']
+        course_id = self.course.pk
+        loaded = []
+
+        def count_loaded(sender, instance, **kwargs):
+            loaded.append(instance)
+
+        post_init.connect(count_loaded, sender=Lesson)
+        self.addCleanup(post_init.disconnect, count_loaded, sender=Lesson)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(deletion.delete_course(self.course, chunk_size=3), 7)
+
+        self.assertEqual(loaded, [])
+        # Per chunk: the cache invalidation and the preview cleanup.
+        self.assertLessEqual(len(callbacks), 10)
+        self.assertFalse(Course.objects.filter(pk=course_id).exists())
+        self.assertEqual(list(Lesson.objects.all()), [self.kept])
+        self.assertFalse(search.filter_queryset(Lesson.objects.all(), 'lesson', 'Lesson').exists())
+        items = self.client.get(reverse('sync'), {'token': token}).data['changes']
+        self.assertEqual(
+            {(item['type'], item['id']) for item in items if item['deleted']},
+            {('course', course_id), *(('lesson', lesson.pk) for lesson in self.lessons)}
+        )
+
+    def test_failure_keeps_committed_chunks_consistent(self):
+        token = self.client.get(reverse('sync')).data['token']
+        with mock.patch.object(media, 'schedule_cleanup', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                deletion.delete_course(self.course, chunk_size=3)
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.lessons_count, 4)
+        self.assertFalse(counters.drifted().exists())
+        items = self.client.get(reverse('sync'), {'token': token}).data['changes']
+        self.assertEqual(len([item for item in items if item['type'] == 'lesson' and item['deleted']]), 3)
+
+    def test_freed_previews_are_deleted_with_variants(self):
+        kept = {self.kept.preview.name, images.variant_name(self.kept.preview.name, 64, 'webp'),
+                images.variant_name(self.kept.preview.name, 64, 'jpeg')}
+        # A name another row still refers to stays.
+        Lesson.objects.filter(pk=self.kept.pk).update(preview=self.lessons[0].preview.name)
+        kept.add(self.lessons[0].preview.name)
+        self.assertEqual(len(self.stored()), 12)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('course-detail', args=[self.course.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.stored(),
+            kept | {images.variant_name(self.lessons[0].preview.name, 64, fmt) for fmt in ('webp', 'jpeg')}
+        )
+
+    def test_admin_delete(self):
+        self.client.force_login(User.objects.create_superuser('admin@example.com', 'password'))
+        url = reverse('admin:materials_course_delete', args=[self.course.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, '7 lessons')
+        self.assertFalse(any('FROM "materials_lesson"' in query['sql'] for query in queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Lesson.objects.filter(course_id=self.course.pk).exists())
+        self.assertFalse(default_storage.exists(self.lessons[0].preview.name))
+
+    def test_prune_media(self):
+        lesson = self.lessons[0]
+        orphan = self.lessons[1].preview.name
+        Lesson.objects.filter(pk=self.lessons[1].pk).update(preview=None)
+        os.remove(default_storage.path(lesson.preview.name))
+        stale_variant = images.variant_name(self.kept.preview.name, 1024, 'webp')
+        default_storage.save(stale_variant, ContentFile(b'old size'))
+        orphaned = {
+            orphan,
+            *images.variant_names(orphan),
+            *images.variant_names(lesson.preview.name),
+        }
+        before = self.stored()
+
+        stdout = io.StringIO()
+        call_command('prune_media', '--dry-run', '--min-age', '0', stdout=stdout)
+        self.assertEqual(self.stored(), before)
+        self.assertIn(orphan, stdout.getvalue())
+
+        call_command('prune_media', '--min-age', '0', '--batch-size', '2', stdout=io.StringIO())
+        self.assertEqual(self.stored(), before - orphaned)
+        self.assertIn(stale_variant, self.stored())
+        self.assertIn(self.course.preview.name, self.stored())
+
+        call_command('prune_media', stdout=stdout)
+        self.assertIn('Deleted 0 orphaned file(s).', stdout.getvalue())
+
+
+class AdminCourseDeletionTests(TransactionTestCase):
+    """The admin deletes a course's lessons after its own transaction, chunk by chunk."""
+
+    def test_chunks_commit_one_by_one(self):
+        course = Course.objects.create(title='Doomed')
+        Lesson.objects.bulk_create([
+            Lesson(course=course, title=f'Lesson {index}', video_url='https://example.com/')
+            for index in range(5)
+        ])
+        self.client.force_login(User.objects.create_superuser('admin@example.com', 'password'))
+        outermost = []
+        delete_chunk = deletion.delete_lessons_chunk
+
+        def spy(course, chunk_size):
+            outermost.append(not connection.in_atomic_block)
+            return delete_chunk(course, chunk_size)
+
+        with mock.patch.object(deletion, 'CHUNK_SIZE', 2), \
+                mock.patch.object(deletion, 'delete_lessons_chunk', side_effect=spy):
+            response = self.client.post(
+                reverse('admin:materials_course_delete', args=[course.pk]), {'post': 'yes'}
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(outermost, [True, True, True])
+        self.assertFalse(Course.objects.exists())
+        self.assertFalse(Lesson.objects.exists())
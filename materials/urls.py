@@ -1,12 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, LessonListCreateAPIView, LessonRetrieveUpdateDestroyAPIView
+from .views import (
+    CacheStatsAPIView, CatalogExportAPIView, CourseLessonListAPIView, CourseViewSet,
+    LessonBulkAPIView, LessonListCreateAPIView, LessonRetrieveUpdateDestroyAPIView, SearchAPIView,
+    SyncAPIView
+)
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet, basename='course')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('courses/<int:course_pk>/lessons/', CourseLessonListAPIView.as_view(), name='course-lesson-list'),
     path('lessons/', LessonListCreateAPIView.as_view(), name='lesson-list-create'),
+    path('lessons/bulk/', LessonBulkAPIView.as_view(), name='lesson-bulk'),
     path('lessons/<int:pk>/', LessonRetrieveUpdateDestroyAPIView.as_view(), name='lesson-detail'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('export/', CatalogExportAPIView.as_view(), name='catalog-export'),
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+    path('cache-stats/', CacheStatsAPIView.as_view(), name='cache-stats'),
 ]
\ No newline at end of file
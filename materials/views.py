@@ -1,34 +1,468 @@
-from rest_framework import viewsets, generics, permissions
-from .models import Course, Lesson
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404
+from rest_framework import viewsets, generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.views import APIView
+from config.async_views import AsyncReadMixin
+from config.conditional import ConditionalRequestMixin
+from config.fastpath import FastReadMixin, ValuesSerializer
+from config.sparse import FieldSelection, SparseFieldsetMixin
+from config.streaming import streaming_response
+from .cache import CachedResponseMixin, get_stats
+from . import changes, counters, deletion, search
+from .export import content_type, export, parse_timestamp
+from .filters import CourseFilterBackend, CourseOrderingFilter, TimestampFilterBackend
+from .models import Change, Course, Lesson
+from .pagination import CoursePagination, LessonPagination
 from .serializers import CourseSerializer, CourseListSerializer, LessonSerializer
 
+# Serializer fields that read a model field of another name
+FIELD_SOURCES = {'preview_variants': 'preview'}
 
-class CourseViewSet(viewsets.ModelViewSet):
+
+class ChangeFeedValidatorsMixin:
+    """
+    Validate lists against the change feed.
+
+    Every write to a course or lesson, deletions included, appends a
+    ``Change`` entry, so the latest ``seq`` moves whenever a list could
+    show something else. Reading it is one lookup on the primary key,
+    where aggregating over the listed rows costs as much as the list.
+    """
+
+    def get_validators(self):
+        if self.listing:
+            return {'seq': changes.latest_seq()}
+        return super().get_validators()
+
+    async def aget_validators(self):
+        if self.listing:
+            return {'seq': await changes.alatest_seq()}
+        return await super().aget_validators()
+
+
+class CourseViewSet(AsyncReadMixin, ChangeFeedValidatorsMixin, ConditionalRequestMixin,
+                    CachedResponseMixin, SparseFieldsetMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Course model with CRUD operations.
     """
     queryset = Course.objects.all()
+    pagination_class = CoursePagination
+    filter_backends = [TimestampFilterBackend, CourseOrderingFilter]
+    ordering_fields = ['created_at', 'lessons_count', 'last_lesson_at']
     permission_classes = [permissions.AllowAny]  # Для тестирования
+    expandable_fields = ('lessons',)
+
+    def includes_lessons(self):
+        """Lists embed lessons only on ``?expand=lessons``."""
+        if self.action == 'list' and 'lessons' not in self.field_selection.expand:
+            return False
+        return self.field_selection.wants('lessons')
+
+    def get_queryset(self):
+        """
+        Load only the requested columns; prefetch lessons only when the
+        response includes them.
+        """
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            return queryset
+        selection = self.field_selection
+        queryset = queryset.only(
+            *selection.model_fields(Course, always=('id', 'created_at'), sources=FIELD_SOURCES)
+        )
+        if self.includes_lessons():
+            queryset = queryset.prefetch_related(
+                Prefetch('lessons', queryset=self.get_lessons_queryset())
+            )
+        return queryset
+
+    def get_lessons_queryset(self):
+        lessons = FieldSelection(self.field_selection.nested.get('lessons'), {}, set())
+        return Lesson.objects.only(
+            *lessons.model_fields(Lesson, always=('id', 'course', 'created_at'), sources=FIELD_SOURCES)
+        )
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action == 'list' and not self.includes_lessons():
             return CourseListSerializer
         return CourseSerializer
 
+    def perform_destroy(self, instance):
+        deletion.delete_course(instance)
+
+    def get_cache_resources(self):
+        if self.action == 'list':
+            return ['courses']
+        return [f'course:{self.kwargs[self.lookup_field]}']
+
+    def get_async_values_serializer(self, queryset):
+        """Serve embedded lessons from a second query in ``aprepare_rows``."""
+        self.lessons_values_serializer = None
+        if not self.includes_lessons():
+            return super().get_async_values_serializer(queryset)
+        if not getattr(settings, 'FAST_READ_SERIALIZATION', True):
+            return None
+        serializer = self.get_serializer()
+        self.lessons_values_serializer = ValuesSerializer.compile(serializer.fields['lessons'].child)
+        if self.lessons_values_serializer is None:
+            return None
+        return ValuesSerializer.compile(
+            serializer, annotations=queryset.query.annotations, prepared=('lessons',)
+        )
 
-class LessonListCreateAPIView(generics.ListCreateAPIView):
+    async def aprepare_rows(self, rows):
+        lessons_serializer = self.lessons_values_serializer
+        if lessons_serializer is None:
+            return
+        lessons = {row['id']: [] for row in rows}
+        queryset = self.get_lessons_queryset().filter(course_id__in=list(lessons))
+        async for lesson in queryset.values(*sorted({*lessons_serializer.columns, 'course'})):
+            lessons[lesson['course']].append(lesson)
+        for row in rows:
+            row['lessons'] = lessons_serializer.serialize(lessons[row['id']])
+
+    def get_validator_query(self):
+        # Lessons come and go through the denormalized counter; only edits
+        # need their timestamps, scanned through the course's index.
+        return Course.objects.filter(pk=self.kwargs[self.lookup_field]), {
+            'updated_at': Max('updated_at'),
+            'lessons_count': Max('lessons_count'),
+            'lessons_updated_at': Max('lessons__updated_at'),
+        }
+
+
+class LessonListCreateAPIView(AsyncReadMixin, ChangeFeedValidatorsMixin, ConditionalRequestMixin,
+                              CachedResponseMixin, SparseFieldsetMixin, FastReadMixin,
+                              generics.ListCreateAPIView):
     """
     Generic view for listing and creating lessons.
     """
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    pagination_class = LessonPagination
+    filter_backends = [CourseFilterBackend, TimestampFilterBackend]
     permission_classes = [permissions.AllowAny]  # Для тестирования
 
+    def get_queryset(self):
+        return super().get_queryset().only(
+            *self.field_selection.model_fields(
+                Lesson, always=('id', 'created_at'), sources=FIELD_SOURCES
+            )
+        )
+
+    def get_cache_resources(self):
+        return ['lessons']
 
-class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+
+class CourseLessonListAPIView(LessonListCreateAPIView):
+    """
+    Generic view for listing the lessons of one course.
+    """
+    http_method_names = ['get', 'head', 'options']
+    filter_backends = [TimestampFilterBackend]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(course_id=self.kwargs['course_pk'])
+
+    def get_cache_resources(self):
+        return [f'course:{self.kwargs["course_pk"]}']
+
+    def list(self, request, *args, **kwargs):
+        if not Course.objects.filter(pk=self.kwargs['course_pk']).exists():
+            raise Http404
+        return super().list(request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        if not await Course.objects.filter(pk=self.kwargs['course_pk']).aexists():
+            raise Http404
+        return await super().alist(request, *args, **kwargs)
+
+
+class LessonRetrieveUpdateDestroyAPIView(AsyncReadMixin, ConditionalRequestMixin,
+                                         SparseFieldsetMixin, FastReadMixin,
+                                         generics.RetrieveUpdateDestroyAPIView):
     """
     Generic view for retrieving, updating and deleting a lesson.
     """
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
-    permission_classes = [permissions.AllowAny]  # Для тестирования
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]  # Для тестирования
+
+    def get_queryset(self):
+        return super().get_queryset().only(
+            *self.field_selection.model_fields(Lesson, sources=FIELD_SOURCES)
+        )
+
+    def get_validator_query(self):
+        return Lesson.objects.filter(pk=self.kwargs[self.lookup_field]), {
+            'updated_at': Max('updated_at'),
+            'count': Count('id'),
+        }
+
+
+class LessonBulkAPIView(APIView):
+    """
+    Create, update or delete many lessons in one request.
+
+    POST takes a list of lesson payloads, PATCH a list of partial payloads
+    with ``id``, DELETE a list of ids. Each batch is validated as a whole
+    and written in one transaction; errors are reported per item.
+    """
+    permission_classes = [permissions.AllowAny]  # Для тестирования
+    max_batch_size = 1000
+
+    def check_batch(self, data):
+        if not isinstance(data, list):
+            return Response(
+                {'detail': 'Expected a list of items.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(data) > self.max_batch_size:
+            return Response(
+                {'detail': f'Batch size may not exceed {self.max_batch_size} items.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return None
+
+    def post(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        serializer = LessonSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        ids = [
+            item.get('id') if isinstance(item, dict) and isinstance(item.get('id'), int) else None
+            for item in request.data
+        ]
+        lessons = Lesson.objects.in_bulk([pk for pk in ids if pk is not None])
+        errors, seen = {}, set()
+        for index, pk in enumerate(ids):
+            if lessons.get(pk) is None:
+                errors[index] = {'id': ['Lesson not found.']}
+            elif pk in seen:
+                errors[index] = {'id': ['Duplicate lesson id in batch.']}
+            seen.add(pk)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = LessonSerializer(
+            [lessons[pk] for pk in ids], data=request.data, many=True, partial=True
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            serializer.save()
+        return Response(serializer.data)
+
+    def delete(self, request):
+        error = self.check_batch(request.data)
+        if error:
+            return error
+        if not all(isinstance(pk, int) for pk in request.data):
+            return Response(
+                {'detail': 'Expected a list of lesson ids.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        with transaction.atomic(), counters.deferred(), changes.deferred():
+            deleted, _ = Lesson.objects.filter(pk__in=request.data).delete()
+        return Response({'deleted': deleted})
+
+
+class CatalogExportAPIView(APIView):
+    """
+    Stream courses and/or lessons as NDJSON or CSV.
+
+    Query parameters: ``resource`` (courses, lessons or all), ``output``
+    (ndjson or csv), ``updated_after`` and ``updated_before``.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        resource = request.query_params.get('resource', 'all')
+        output = request.query_params.get('output', 'ndjson')
+        try:
+            chunks = export(
+                resource,
+                output,
+                updated_after=parse_timestamp(request.query_params.get('updated_after')),
+                updated_before=parse_timestamp(request.query_params.get('updated_before'))
+            )
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = streaming_response(request, chunks, content_type=content_type(output))
+        extension = 'ndjson' if output == 'ndjson' else 'csv'
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{extension}"'
+        return response
+
+
+class SearchAPIView(APIView):
+    """
+    Full-text search over courses and lessons, ranked by BM25.
+
+    Query parameters: ``q``, ``type`` (course or lesson; both by default),
+    ``page`` and ``page_size``.
+    """
+    permission_classes = [permissions.AllowAny]  # Для тестирования
+    page_size = 20
+    max_page_size = 100
+
+    def get_page(self, request):
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        try:
+            page_size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return page, min(max(page_size, 1), self.max_page_size)
+
+    def get(self, request):
+        kind = request.query_params.get('type')
+        if kind is not None and kind not in search.SEARCH_INDEXES:
+            return Response(
+                {'detail': f'Unknown type {kind!r}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page, page_size = self.get_page(request)
+        hits = search.search(
+            request.query_params.get('q', ''),
+            kinds=[kind] if kind else None,
+            limit=page_size + 1,
+            offset=(page - 1) * page_size
+        )
+        has_next = len(hits) > page_size
+        hits = hits[:page_size]
+
+        courses = Course.objects.in_bulk(
+            [pk for hit_kind, pk, _ in hits if hit_kind == 'course']
+        )
+        lessons = Lesson.objects.in_bulk(
+            [pk for hit_kind, pk, _ in hits if hit_kind == 'lesson']
+        )
+        context = {'request': request}
+        results = []
+        for hit_kind, pk, rank in hits:
+            if hit_kind == 'course' and pk in courses:
+                data = CourseListSerializer(courses[pk], context=context).data
+            elif hit_kind == 'lesson' and pk in lessons:
+                data = LessonSerializer(lessons[pk], context=context).data
+            else:
+                continue
+            results.append({'type': hit_kind, 'rank': rank, 'object': data})
+
+        url = request.build_absolute_uri()
+        previous = None
+        if page > 1:
+            previous = (
+                replace_query_param(url, 'page', page - 1) if page > 2
+                else remove_query_param(url, 'page')
+            )
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if has_next else None,
+            'previous': previous,
+            'results': results,
+        })
+
+
+class SyncAPIView(APIView):
+    """
+    Courses and lessons changed or deleted since a sync token.
+
+    Without ``token`` only a fresh token is returned: take it before
+    downloading the catalog, then poll with it. Each response carries the
+    token for the next call; ``has_more`` asks for another call right
+    away. A token older than the retention window answers 410 Gone, and
+    the client has to download the catalog again.
+    """
+    permission_classes = [permissions.AllowAny]  # Для тестирования
+    page_size = 500
+    max_page_size = 1000
+
+    def get(self, request):
+        token = request.query_params.get('token')
+        if not token:
+            return Response({
+                'token': changes.encode_token(changes.latest_seq()),
+                'has_more': False,
+                'changes': [],
+            })
+        try:
+            seq = changes.decode_token(token)
+            entries, seq, has_more = changes.changes_since(seq, self.get_limit(request))
+        except changes.InvalidToken as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except changes.ExpiredToken:
+            return Response(
+                {'detail': 'Sync token expired; download the catalog again.'},
+                status=status.HTTP_410_GONE
+            )
+        return Response({
+            'token': changes.encode_token(seq),
+            'has_more': has_more,
+            'changes': self.serialize(entries),
+        })
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            limit = self.page_size
+        return min(max(limit, 1), self.max_page_size)
+
+    def serialize(self, entries):
+        """Current state of the changed objects, in feed order."""
+        live = {Change.COURSE: [], Change.LESSON: []}
+        for entry in entries:
+            if not entry.deleted:
+                live[entry.resource].append(entry.object_id)
+        context = {'request': self.request}
+        data = {
+            Change.COURSE: {
+                course['id']: course for course in
+                CourseListSerializer(Course.objects.filter(pk__in=live[Change.COURSE]), many=True,
+                                     context=context).data
+            },
+            Change.LESSON: {
+                lesson['id']: lesson for lesson in
+                LessonSerializer(Lesson.objects.filter(pk__in=live[Change.LESSON]), many=True,
+                                 context=context).data
+            },
+        }
+        results = []
+        for entry in entries:
+            if entry.deleted:
+                results.append({'type': entry.resource, 'id': entry.object_id, 'deleted': True})
+            elif entry.object_id in data[entry.resource]:
+                # Objects deleted since have a tombstone further on.
+                results.append({
+                    'type': entry.resource,
+                    'id': entry.object_id,
+                    'deleted': False,
+                    'object': data[entry.resource][entry.object_id],
+                })
+        return results
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Report hit/miss counters of the materials response cache.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
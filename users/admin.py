@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+
+from config.changelist import LargeTableAdminMixin
+from .models import AuthToken, User
 from django.utils.translation import gettext_lazy as _
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     """Define admin model for custom User model with no username field."""
 
     fieldsets = (
@@ -23,6 +25,20 @@ class UserAdmin(BaseUserAdmin):
     list_display = ('email', 'first_name', 'last_name', 'is_staff')
     search_fields = ('email', 'first_name', 'last_name')
     ordering = ('email',)
+    date_hierarchy = 'date_joined'
+
+
+admin.site.register(User, UserAdmin)
+
 
+@admin.register(AuthToken)
+class AuthTokenAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Admin interface for API tokens; keys are only shown at login, so tokens can only be revoked here."""
+    list_display = ('user', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    date_hierarchy = 'created_at'
+    readonly_fields = ('user', 'created_at')
 
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from config import images
+        from . import signals  # noqa: F401
+        from .models import User
+
+        images.register(User, 'avatar')
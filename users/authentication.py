@@ -0,0 +1,137 @@
+"""
+Token authentication with an in-process credential cache.
+
+``TokenAuthentication`` reads ``Authorization: Token <key>``, looks the
+key's SHA-256 digest up in an indexed column and caches the resolved
+user in ``token_cache``, a bounded LRU map whose entries expire after
+``AUTH_TOKEN_CACHE_TTL`` seconds. Verifying a cached token costs one
+hash and a dict lookup, against a full PBKDF2 run per request for basic
+authentication.
+
+Saving a user or deleting a token evicts the affected entries in this
+process; other processes see the change within the TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import AuthToken, token_digest
+
+
+class TokenCache:
+    """Least recently used map of token digest -> user, with a time-to-live."""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 30)
+
+    def get(self, digest):
+        """Return a copy of the cached user, or None."""
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= self.clock():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+        # Views may modify request.user; never hand out the cached instance.
+        return copy.copy(user)
+
+    def set(self, digest, user):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[digest] = (copy.copy(user), self.clock() + self.ttl)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self.lock:
+            self.entries.pop(digest, None)
+
+    def discard_user(self, user_id):
+        with self.lock:
+            for digest in [digest for digest, (user, _) in self.entries.items() if user.pk == user_id]:
+                del self.entries[digest]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+token_cache = TokenCache()
+
+
+class TokenAuthentication(BaseAuthentication):
+    """
+    ``Authorization: Token <key>`` authentication against ``AuthToken``.
+
+    ``aauthenticate`` is the async counterpart used by
+    ``config.async_views``.
+    """
+    keyword = 'Token'
+
+    def get_key(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        digest = token_digest(key)
+        user = token_cache.get(digest)
+        if user is None:
+            token = AuthToken.objects.select_related('user').filter(digest=digest).first()
+            user = self.check_token(token, digest)
+        return user, digest
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        digest = token_digest(key)
+        user = token_cache.get(digest)
+        if user is None:
+            token = await AuthToken.objects.select_related('user').filter(digest=digest).afirst()
+            user = self.check_token(token, digest)
+        return user, digest
+
+    def check_token(self, token, digest):
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.set(digest, token.user)
+        return token.user
+
+    def authenticate_header(self, request):
+        return self.keyword
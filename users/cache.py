@@ -0,0 +1,179 @@
+"""
+Per-user cache of serialized profiles.
+
+``UserViewSet.retrieve`` and ``my_profile`` answer from here. An entry
+holds one user's ``UserSerializer`` output for one request variant
+(host, scheme and query string, so ``fields``/``expand`` selections are
+kept apart) together with ``updated_at`` for the validators; a hit needs
+no query and no serialization.
+
+Entries live in the ``USER_PROFILE_CACHE_ALIAS`` cache for
+``USER_PROFILE_CACHE_TIMEOUT`` seconds and the backend bounds how many
+are kept. All entries of a user share a version that ``users.signals``
+bumps once a save or delete of the user commits, so admin edits and avatar
+changes are visible on the next read. Concurrent misses for the same
+entry within a process wait for the first one to load it instead of all
+querying the database.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'users:profile'
+
+
+def get_cache():
+    return caches[getattr(settings, 'USER_PROFILE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 60)
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def get_version(user_id):
+    """Current version of the user's entries, seeded from the clock when missing."""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate(user_id):
+    """Orphan every cached entry of the user."""
+    cache = get_cache()
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_on_commit(user_id):
+    """
+    ``invalidate`` once the current transaction commits. Bumped earlier,
+    a concurrent miss could cache the old row under the new version.
+    """
+    transaction.on_commit(partial(invalidate, user_id))
+
+
+def build_key(request, user_id):
+    query = '&'.join(
+        f'{key}={value}'
+        for key, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+    digest = hashlib.md5(
+        f'{request.scheme}://{request.get_host()}?{query}'.encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'{KEY_PREFIX}:{user_id}:{get_version(user_id)}:{digest}'
+
+
+class SingleFlight:
+    """Let one caller per key run a load while the others wait for it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+        self.futures = {}
+
+    @contextmanager
+    def hold(self, key):
+        with self.lock:
+            lock, waiters = self.locks.get(key, (threading.Lock(), 0))
+            self.locks[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self.lock:
+                lock, waiters = self.locks[key]
+                if waiters == 1:
+                    del self.locks[key]
+                else:
+                    self.locks[key] = (lock, waiters - 1)
+
+    def leader_future(self, key):
+        """Return ``(future, leader)``; the leader resolves the future."""
+        with self.lock:
+            future = self.futures.get(key)
+            if future is not None and not future.done():
+                return future, False
+            future = asyncio.get_running_loop().create_future()
+            self.futures[key] = future
+            return future, True
+
+    def release(self, key, future):
+        with self.lock:
+            if self.futures.get(key) is future:
+                del self.futures[key]
+
+
+flights = SingleFlight()
+
+
+def get_profile(request, user_id, load):
+    """
+    Return the cached entry for ``user_id``, calling ``load()`` to build it
+    on a miss. The second item is True for a hit.
+    """
+    cache = get_cache()
+    key = build_key(request, user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry, True
+    with flights.hold(key):
+        entry = cache.get(key)
+        if entry is not None:
+            return entry, True
+        entry = load()
+        cache.set(key, entry, get_timeout())
+    return entry, False
+
+
+async def aget_profile(request, user_id, aload):
+    """Async ``get_profile``; waiters share the leader's result or error."""
+    cache = get_cache()
+    key = build_key(request, user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry, True
+    future, leader = flights.leader_future(key)
+    if not leader:
+        try:
+            return await asyncio.shield(future), True
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+        # The leader was cancelled; load without waiting for another.
+        return await aload(), False
+    try:
+        entry = await aload()
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark the exception retrieved in case nobody was waiting.
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        cache.set(key, entry, get_timeout())
+        future.set_result(entry)
+        return entry, False
+    finally:
+        flights.release(key, future)
@@ -0,0 +1,39 @@
+"""
+Process pool for password hashing.
+
+Kept free of model imports: spawned workers import this module to find
+their initializer before Django is set up.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+def _setup_worker():
+    import django
+    django.setup()
+
+
+@contextmanager
+def hasher_pool(workers=None):
+    """
+    Yield a process pool for ``make_password``, or None to hash in this
+    process when ``workers`` is 0. ``workers`` defaults to
+    ``USER_IMPORT_WORKERS``, then to one per CPU.
+
+    Workers are spawned rather than forked, so the pool is safe to start
+    from a multi-threaded web server.
+    """
+    if workers is None:
+        workers = getattr(settings, 'USER_IMPORT_WORKERS', None)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 0:
+        yield None
+        return
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context('spawn'), initializer=_setup_worker
+    ) as executor:
+        yield executor
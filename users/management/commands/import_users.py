@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.hashing import hasher_pool
+from users.imports import BATCH_SIZE, IMPORT_FORMATS, import_users
+
+
+class Command(BaseCommand):
+    help = 'Create users in bulk from a CSV or NDJSON file, hashing passwords in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read; "-" reads stdin.')
+        parser.add_argument(
+            '--format',
+            dest='input_format',
+            choices=IMPORT_FORMATS,
+            help='Input format; guessed from the file extension by default.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per INSERT.')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Password hashing processes; 0 hashes in this process. Defaults to USER_IMPORT_WORKERS.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format']
+        if input_format is None:
+            extension = os.path.splitext(path)[1].lstrip('.').lower()
+            input_format = 'ndjson' if extension in ('ndjson', 'jsonl') else 'csv'
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive.')
+
+        start = time.perf_counter()
+
+        def progress(result, errors):
+            for error in errors:
+                for field, messages in error['errors'].items():
+                    self.stderr.write(f'Row {error["row"]}: {field}: {" ".join(map(str, messages))}')
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{result.rows} rows read, {result.created} created, {len(result.errors)} failed '
+                f'({result.rows / elapsed:,.0f} rows/s)'
+            )
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+        try:
+            with hasher_pool(options['workers']) as executor:
+                result = import_users(
+                    stream, input_format, options['batch_size'], executor=executor, progress=progress
+                )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} of {result.rows} users in {time.perf_counter() - start:.1f}s.'
+        ))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_auth_token'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='authtoken',
+            index=models.Index(fields=['created_at'], name='auth_token_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+    ]
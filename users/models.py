@@ -1,3 +1,7 @@
+import hashlib
+import secrets
+
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -50,6 +54,7 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -59,6 +64,48 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
+
+    def __str__(self):
+        return self.email
+
+
+def token_digest(key):
+    """SHA-256 of a token key; only digests are stored."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class AuthTokenManager(models.Manager):
+    """Manager issuing API tokens."""
+
+    def issue(self, user):
+        """Create a token for ``user``; return it with its key, which is not stored."""
+        key = secrets.token_urlsafe(32)
+        return self.create(user=user, digest=token_digest(key)), key
+
+
+class AuthToken(models.Model):
+    """API token; requests authenticate with ``Authorization: Token <key>``."""
+
+    digest = models.CharField(_('digest'), max_length=64, unique=True, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='auth_tokens',
+        verbose_name=_('user')
+    )
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+
+    objects = AuthTokenManager()
+
+    class Meta:
+        verbose_name = _('auth token')
+        verbose_name_plural = _('auth tokens')
+        indexes = [
+            models.Index(fields=['created_at'], name='auth_token_created_at_idx'),
+        ]
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return f'{self.user} ({self.created_at:%Y-%m-%d %H:%M})'
@@ -1,25 +1,69 @@
+from django.contrib.auth import authenticate
 from rest_framework import serializers
+from config.images import ImageVariantsField
+from config.metrics import TimedSerializerMixin
+from config.sparse import DynamicFieldsSerializerMixin
 from .models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, DynamicFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer for User model."""
 
+    avatar_variants = ImageVariantsField(source='avatar')
+
     class Meta:
         model = User
         fields = [
             'id', 'email', 'first_name', 'last_name',
-            'phone', 'city', 'avatar', 'date_joined',
+            'phone', 'city', 'avatar', 'avatar_variants', 'date_joined',
             'is_active', 'is_staff'
         ]
         read_only_fields = ['id', 'date_joined', 'is_active', 'is_staff']
 
 
-class UserProfileUpdateSerializer(serializers.ModelSerializer):
+class UserProfileUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for updating user profile."""
 
     class Meta:
         model = User
         fields = [
             'first_name', 'last_name', 'phone', 'city', 'avatar'
-        ]
\ No newline at end of file
+        ]
+
+
+class UserImportSerializer(serializers.ModelSerializer):
+    """
+    One row of a user import. Emails are normalized like
+    ``UserManager.create_user`` does; uniqueness is checked per batch by
+    ``users.imports``.
+    """
+
+    password = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, trim_whitespace=False
+    )
+
+    class Meta:
+        model = User
+        fields = ['email', 'password', 'first_name', 'last_name', 'phone', 'city']
+        extra_kwargs = {'email': {'validators': []}}
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+
+class LoginSerializer(serializers.Serializer):
+    """Check email and password; the user ends up in ``validated_data``."""
+
+    email = serializers.EmailField()
+    password = serializers.CharField(style={'input_type': 'password'}, trim_whitespace=False)
+
+    def validate(self, attrs):
+        user = authenticate(
+            self.context.get('request'), email=attrs['email'], password=attrs['password']
+        )
+        if user is None:
+            raise serializers.ValidationError(
+                'Unable to log in with provided credentials.', code='authorization'
+            )
+        attrs['user'] = user
+        return attrs
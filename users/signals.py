@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as profile_cache
+from .authentication import token_cache
+from .models import AuthToken, User
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, **kwargs):
+    """Cached tokens hold a copy of the user; drop them when it changes."""
+    token_cache.discard_user(instance.pk)
+
+
+@receiver(post_delete, sender=AuthToken)
+def evict_token(sender, instance, **kwargs):
+    token_cache.discard(instance.digest)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile(sender, instance, **kwargs):
+    """Orphan the cached serialized profiles of the user."""
+    profile_cache.invalidate_on_commit(instance.pk)
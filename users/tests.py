@@ -1,3 +1,588 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import permissions, status
+from PIL import Image
+from rest_framework.test import APIClient
+
+from config.changelist import EstimatedCountPaginator
+from config.testing import ASGIClient, asgi_request
+
+from . import cache as profile_cache, imports
+from .authentication import TokenCache, token_cache
+from .models import AuthToken, User
+from .views import UserViewSet
+
+
+class UserQueryBudgetTests(TestCase):
+    """Query budgets for the user endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            password='password',
+            first_name='Test'
+        )
+        for index in range(5):
+            User.objects.create_user(email=f'user{index}@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['profiles'].clear()
+
+    def test_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 6)
+
+    def test_retrieve(self):
+        # The profile row also answers the validators; a cache hit needs none.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-detail', args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'user@example.com')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('user-detail', args=[self.user.pk]))
+
+    def test_update_profile(self):
+        with self.assertNumQueries(2):
+            response = self.client.patch(
+                reverse('user-update-profile', args=[self.user.pk]),
+                {'city': 'Kazan'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['city'], 'Kazan')
+
+    def test_my_profile_authenticated(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'user@example.com')
+
+    def test_my_profile_anonymous(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_destroy(self):
+        user = User.objects.get(email='user0@example.com')
+        # The user's tokens are loaded so their cache entries can be evicted.
+        with self.assertNumQueries(6):
+            response = self.client.delete(reverse('user-detail', args=[user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class UserConditionalRequestTests(TestCase):
+    """ETag / Last-Modified handling on the user endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['profiles'].clear()
+
+    def test_retrieve_not_modified(self):
+        url = reverse('user-detail', args=[self.user.pk])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_my_profile_not_modified_without_queries(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('user-my-profile')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_profile_update_changes_etag_and_honors_if_match(self):
+        detail = reverse('user-detail', args=[self.user.pk])
+        update = reverse('user-update-profile', args=[self.user.pk])
+        etag = self.client.get(detail)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(update, {'city': 'Kazan'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(update, {'city': 'Moscow'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+
+class UserSparseFieldsetTests(TestCase):
+    """``?fields=`` on the user endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['profiles'].clear()
+
+    def test_list_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user-list') + '?fields=id,email')
+        self.assertEqual(response.data, [{'id': self.user.pk, 'email': 'user@example.com'}])
+        self.assertNotIn('password', queries.captured_queries[-1]['sql'])
+
+    def test_my_profile_fields(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('user-my-profile') + '?fields=email')
+        self.assertEqual(response.data, {'email': 'user@example.com'})
+
+
+class UserFastReadSerializationTests(TestCase):
+    """The values() fast path must render exactly what UserSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', password='password', avatar='users/avatars/me.png'
+        )
+        User.objects.create_user(email='other@example.com', city='Kazan')
+
+    def test_output_is_byte_identical(self):
+        for url in (reverse('user-list'), reverse('user-detail', args=[self.user.pk])):
+            caches['profiles'].clear()
+            fast = APIClient().get(url, HTTP_ACCEPT='application/json')
+            caches['profiles'].clear()
+            with override_settings(FAST_READ_SERIALIZATION=False):
+                slow = APIClient().get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(fast.content, slow.content, url)
+
+
+class AvatarVariantTests(TestCase):
+    """Resized avatar variants generated after upload."""
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media.name, IMAGE_VARIANTS_ASYNC=False, IMAGE_VARIANT_SIZES=(64,)
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def test_profile_avatar_upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (500, 400)).save(buffer, 'JPEG')
+        avatar = SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().patch(
+                reverse('user-update-profile', args=[self.user.pk]),
+                {'avatar': avatar},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        root, _ = os.path.splitext(self.user.avatar.name)
+        with Image.open(os.path.join(self.media.name, f'{root}.64.webp')) as variant:
+            self.assertEqual(variant.size, (64, 51))
+
+        response = APIClient().get(reverse('user-detail', args=[self.user.pk]))
+        self.assertTrue(response.data['avatar_variants']['64']['jpeg'].endswith('.64.jpg'))
+
+
+class OwnProfilePermission(permissions.BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return obj == request.user
+
+
+class UserProfileCacheTests(TestCase):
+    """Cached serialized profiles and their invalidation."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['profiles'].clear()
+        self.url = reverse('user-detail', args=[self.user.pk])
+
+    async def test_cached_profile_is_served_only_to_permitted_users(self):
+        other = await User.objects.acreate(email='other@example.com')
+        with mock.patch.object(UserViewSet, 'permission_classes', [OwnProfilePermission]):
+            for make_client in (APIClient, ASGIClient):
+                await caches['profiles'].aclear()
+                owner, stranger = make_client(), make_client()
+                if make_client is APIClient:
+                    owner.force_authenticate(self.user)
+                    stranger.force_authenticate(other)
+                    owner_response = await sync_to_async(owner.get)(self.url)
+                    stranger_response = await sync_to_async(stranger.get)(self.url)
+                else:
+                    await owner.aforce_login(self.user)
+                    await stranger.aforce_login(other)
+                    owner_response = await owner.get(self.url)
+                    stranger_response = await stranger.get(self.url)
+                self.assertEqual(owner_response.status_code, status.HTTP_200_OK)
+                self.assertEqual(stranger_response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_hit_after_miss(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_fields_are_cached_separately(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url + '?fields=id,email')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data, {'id': self.user.pk, 'email': 'user@example.com'})
+
+    def test_update_profile_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('user-update-profile', args=[self.user.pk]), {'city': 'Kazan'}, format='json')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['city'], 'Kazan')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_save_invalidates_my_profile(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse('user-my-profile'))
+        self.user.first_name = 'Admin edit'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+            # Not before the save commits.
+            self.assertEqual(self.client.get(reverse('user-my-profile'))['X-Cache'], 'HIT')
+        response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['first_name'], 'Admin edit')
+
+    def test_missing_user_is_not_cached(self):
+        url = reverse('user-detail', args=[self.user.pk + 1])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        user = User.objects.create_user(email='new@example.com')
+        self.assertEqual(user.pk, self.user.pk + 1)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_concurrent_misses_load_once(self):
+        request = mock.Mock(scheme='http', query_params=mock.Mock(lists=lambda: []))
+        request.get_host.return_value = 'testserver'
+        calls = []
+
+        def load():
+            calls.append(None)
+            time.sleep(0.05)
+            return {'data': {}, 'updated_at': None}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: profile_cache.get_profile(request, 1, load), range(4)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(hit for _, hit in results), [False, True, True, True])
+
+    async def test_concurrent_async_misses_load_once(self):
+        request = mock.Mock(scheme='http', query_params=mock.Mock(lists=lambda: []))
+        request.get_host.return_value = 'testserver'
+        calls = []
+
+        async def load():
+            calls.append(None)
+            await asyncio.sleep(0.05)
+            return {'data': {}, 'updated_at': None}
+
+        results = await asyncio.gather(*(profile_cache.aget_profile(request, 1, load) for _ in range(4)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(hit for _, hit in results), [False, True, True, True])
+
+
+class AsyncReadTests(TestCase):
+    """Async-native user reads must answer exactly like the sync views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', password='password', avatar='users/avatars/me.png'
+        )
+
+    async def get_both(self, url, user=None):
+        clients = [
+            AsyncClient(headers={'accept': 'application/json'}),
+            ASGIClient(headers={'accept': 'application/json'}),
+        ]
+        if user is not None:
+            for client in clients:
+                await client.aforce_login(user)
+        caches['profiles'].clear()
+        sync = await clients[0].get(url)
+        caches['profiles'].clear()
+        with mock.patch('config.async_views.run_sync_view', side_effect=AssertionError(url)):
+            native = await clients[1].get(url)
+        return sync, native
+
+    async def test_responses_match(self):
+        cases = [
+            (reverse('user-detail', args=[self.user.pk]), None),
+            (reverse('user-detail', args=[self.user.pk]) + '?fields=id,email', None),
+            (reverse('user-detail', args=[0]), None),
+            (reverse('user-my-profile'), None),
+            (reverse('user-my-profile'), self.user),
+        ]
+        for url, user in cases:
+            sync, native = await self.get_both(url, user)
+            self.assertEqual(native.status_code, sync.status_code, url)
+            self.assertEqual(native.content, sync.content, url)
+            self.assertEqual(native.get('ETag'), sync.get('ETag'), url)
+
+    async def test_basic_auth_uses_sync_view(self):
+        response = await ASGIClient().get(
+            reverse('user-my-profile'), headers={'authorization': 'Basic bm9ib2R5Om5vcGU='}
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TokenAuthenticationTests(TestCase):
+    """Login, token authentication and the token cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            reverse('user-login'), {'email': 'user@example.com', 'password': 'password'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['token']
+
+    def test_login(self):
+        key = self.login()
+        token = AuthToken.objects.get(user=self.user)
+        self.assertNotEqual(token.digest, key)
+
+        response = self.client.post(
+            reverse('user-login'), {'email': 'user@example.com', 'password': 'wrong'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_is_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.data['email'], 'user@example.com')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_logout_revokes_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        self.client.get(reverse('user-my-profile'))
+        response = self.client.post(reverse('user-logout'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthToken.objects.exists())
+        response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deactivated_user_is_evicted(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        self.client.get(reverse('user-my-profile'))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('user-my-profile'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_expiry_and_eviction(self):
+        now = [0.0]
+        tokens = TokenCache(clock=lambda: now[0])
+        with override_settings(AUTH_TOKEN_CACHE_SIZE=2, AUTH_TOKEN_CACHE_TTL=10):
+            for digest in 'abc':
+                tokens.set(digest, self.user)
+            self.assertEqual(len(tokens), 2)
+            self.assertIsNone(tokens.get('a'))
+            self.assertEqual(tokens.get('b'), self.user)
+            self.assertIsNot(tokens.get('b'), tokens.get('b'))
+            now[0] = 10
+            self.assertIsNone(tokens.get('b'))
+
+    async def test_token_read_stays_async(self):
+        token, key = await sync_to_async(AuthToken.objects.issue)(self.user)
+        with mock.patch('config.async_views.run_sync_view', side_effect=AssertionError):
+            response = await ASGIClient().get(
+                reverse('user-my-profile'), headers={'authorization': f'Token {key}'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['email'], 'user@example.com')
+
+
+@override_settings(
+    USER_IMPORT_WORKERS=0, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class UserImportTests(TestCase):
+    """Bulk user import from CSV and NDJSON."""
+
+    csv = (
+        'email,password,first_name,city\n'
+        'ann@EXAMPLE.com,secret,Ann,Kazan\n'
+        'bob@example.com,,Bob,\n'
+        'ann@example.com,other,Ann again,\n'
+        'not-an-email,secret,Bad,\n'
+        'existing@example.com,secret,Old,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('existing@example.com', 'password')
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as stream:
+            stream.write(self.csv)
+        self.addCleanup(os.remove, stream.name)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_users', stream.name, '--batch-size', '2', stdout=stdout, stderr=stderr)
+
+        self.assertIn('Imported 2 of 5 users', stdout.getvalue())
+        self.assertEqual(
+            stderr.getvalue().splitlines(),
+            [
+                'Row 4: email: Duplicate email in import.',
+                'Row 5: email: Enter a valid email address.',
+                'Row 6: email: User with this email address already exists.',
+            ]
+        )
+        ann = User.objects.get(email='ann@example.com')
+        self.assertTrue(ann.check_password('secret'))
+        self.assertEqual(ann.city, 'Kazan')
+        self.assertFalse(User.objects.get(email='bob@example.com').has_usable_password())
+
+    def test_three_queries_per_batch(self):
+        lines = [json.dumps({'email': f'user{index}@example.com', 'password': 'pw'}) for index in range(6)]
+        with ThreadPoolExecutor(2) as executor, CaptureQueriesContext(connection) as queries:
+            result = imports.import_users(lines, 'ndjson', batch_size=3, executor=executor)
+        self.assertEqual(result.as_dict(), {'rows': 6, 'created': 6, 'failed': 0})
+        self.assertEqual(len(queries), 6)
+        self.assertTrue(User.objects.get(email='user5@example.com').check_password('pw'))
+
+    def test_reimport_creates_nothing(self):
+        imports.import_users(self.csv.splitlines(), 'csv')
+        result = imports.import_users(self.csv.splitlines(), 'csv')
+        self.assertEqual(result.as_dict(), {'rows': 5, 'created': 0, 'failed': 5})
+
+    def test_rows_losing_a_race_are_not_counted(self):
+        class RacingExecutor:
+            def map(self, func, items):
+                # Another writer inserts one of the emails after the check.
+                User.objects.create_user('bob@example.com', 'password')
+                return map(func, items)
+
+        lines = [json.dumps({'email': email}) for email in ('ann@example.com', 'bob@example.com')]
+        result = imports.import_users(lines, 'ndjson', executor=RacingExecutor())
+        self.assertEqual(result.as_dict(), {'rows': 2, 'created': 1, 'failed': 1})
+        self.assertEqual(result.errors, [
+            {'row': 2, 'errors': {'email': ['User with this email address already exists.']}}
+        ])
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        body = '\n'.join([
+            json.dumps({'email': 'new@example.com', 'password': 'pw'}),
+            'not json',
+            json.dumps(['not', 'an', 'object']),
+        ])
+        response = client.generic('POST', reverse('user-import'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([event['type'] for event in events], ['error', 'error', 'progress', 'summary'])
+        self.assertEqual(events[0]['row'], 2)
+        self.assertEqual(events[-1], {'type': 'summary', 'rows': 3, 'created': 1, 'failed': 2})
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+
+        response = client.generic('POST', reverse('user-import'), body, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    async def test_asgi_sends_each_batch_as_it_is_imported(self):
+        events = []
+        iter_import = imports.iter_import
+
+        def recorded(*args, **kwargs):
+            for batch in iter_import(*args, **kwargs):
+                events.append('imported')
+                yield batch
+
+        async def send(message):
+            if message.get('body'):
+                events.append('sent')
+
+        body = '\n'.join(json.dumps({'email': f'user{index}@example.com'}) for index in range(3)).encode()
+        credentials = base64.b64encode(b'existing@example.com:password').decode()
+        with mock.patch.object(imports, 'iter_import', side_effect=recorded):
+            messages = await asgi_request(
+                'POST', reverse('user-import'), 'batch_size=1',
+                headers={
+                    'authorization': f'Basic {credentials}',
+                    'content-type': 'application/x-ndjson',
+                    'content-length': str(len(body)),
+                },
+                body=body, send=send
+            )
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        # Not read whole into a list before the first progress line goes out
+        self.assertEqual(events, ['imported', 'sent'] * 3 + ['sent'])
+        self.assertEqual(await User.objects.filter(email__startswith='user').acount(), 3)
+
+    def test_endpoint_requires_admin(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('user@example.com', 'password'))
+        response = client.generic('POST', reverse('user-import'), self.csv, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UserAdminTests(TestCase):
+    """The user changelist neither counts nor scans the whole table."""
+
+    def test_changelist(self):
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        for index in range(3):
+            User.objects.create_user(f'user{index}@example.com', 'password')
+        self.client.force_login(admin)
+        url = reverse('admin:users_user_changelist')
+        with mock.patch.object(EstimatedCountPaginator, 'count_limit', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertFalse(any('django_datetime_trunc' in query['sql'] for query in queries))
+
+        response = self.client.get(url, {'q': 'user1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet
+from .views import LoginAPIView, LogoutAPIView, UserImportAPIView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'', UserViewSet, basename='user')
 
 urlpatterns = [
+    path('login/', LoginAPIView.as_view(), name='user-login'),
+    path('logout/', LogoutAPIView.as_view(), name='user-logout'),
+    path('import/', UserImportAPIView.as_view(), name='user-import'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,11 +1,28 @@
+import codecs
+import json
+
+from django.db.models import Count, Max
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import User
-from .serializers import UserSerializer, UserProfileUpdateSerializer
+from rest_framework.views import APIView
+from config.async_views import AsyncReadMixin
+from config.conditional import ConditionalRequestMixin
+from config.fastpath import FastReadMixin
+from config.metrics import timed_serialize
+from config.sparse import SparseFieldsetMixin
+from config.streaming import streaming_response
+from . import cache as profile_cache, imports
+from .authentication import TokenAuthentication
+from .hashing import hasher_pool
+from .models import AuthToken, User
+from .serializers import LoginSerializer, UserSerializer, UserProfileUpdateSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(AsyncReadMixin, ConditionalRequestMixin, SparseFieldsetMixin, FastReadMixin,
+                  viewsets.ModelViewSet):
     """
     ViewSet for viewing and editing user instances.
     """
@@ -13,9 +30,135 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]  # Для тестирования
 
+    profile_entry = None
+
+    def get_queryset(self):
+        return super().get_queryset().only(*self.field_selection.model_fields(
+            User, always=('id', 'updated_at'), sources={'avatar_variants': 'avatar'}
+        ))
+
+    def get_validators(self):
+        if self.action == 'my_profile':
+            return self.get_profile_state(self.request.user)
+        if self.action == 'retrieve':
+            return self.get_entry_state(self.get_profile_entry(self.get_user_id()))
+        return super().get_validators()
+
+    async def aget_validators(self):
+        if self.action == 'my_profile':
+            return self.get_profile_state(self.request.user)
+        if self.action == 'retrieve':
+            return self.get_entry_state(await self.aget_profile_entry(self.get_user_id()))
+        return await super().aget_validators()
+
+    def get_profile_state(self, user):
+        return {'id': user.pk, 'updated_at': user.updated_at}
+
+    def get_entry_state(self, entry):
+        # What the validator query returns for the single user.
+        return {'updated_at': entry['updated_at'], 'count': 1}
+
+    def get_user_id(self):
+        try:
+            return int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404('No User matches the given query.')
+
+    def check_profile_permissions(self, user_id):
+        """
+        Check object permissions on the user before any cached profile is
+        served; entries are shared by every requester. Without a permission
+        class that checks objects there is nothing to check, and no query.
+        """
+        if self.checks_object_permissions():
+            self.check_object_permissions(self.request, get_object_or_404(User.objects.all(), pk=user_id))
+
+    async def acheck_profile_permissions(self, user_id):
+        if self.checks_object_permissions():
+            try:
+                user = await User.objects.aget(pk=user_id)
+            except User.DoesNotExist:
+                raise Http404('No User matches the given query.')
+            self.check_object_permissions(self.request, user)
+
+    def get_profile_entry(self, user_id):
+        """The cached serialized profile of ``user_id`` (``users.cache``)."""
+        if self.profile_entry is None:
+            self.check_profile_permissions(user_id)
+            self.profile_entry, self.profile_cache_hit = profile_cache.get_profile(
+                self.request, user_id, lambda: self.load_profile(user_id)
+            )
+        return self.profile_entry
+
+    async def aget_profile_entry(self, user_id):
+        if self.profile_entry is None:
+            await self.acheck_profile_permissions(user_id)
+            self.profile_entry, self.profile_cache_hit = await profile_cache.aget_profile(
+                self.request, user_id, lambda: self.aload_profile(user_id)
+            )
+        return self.profile_entry
+
+    def load_profile(self, user_id):
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_values_serializer(queryset)
+        if values_serializer is None:
+            return self.build_profile_entry(get_object_or_404(queryset, pk=user_id))
+        row = get_object_or_404(queryset.values(*self.get_profile_columns(values_serializer)), pk=user_id)
+        return self.build_row_entry(values_serializer, row)
+
+    async def aload_profile(self, user_id):
+        queryset = self.filter_queryset(self.get_queryset())
+        values_serializer = self.get_async_values_serializer(queryset)
+        try:
+            if values_serializer is None:
+                return self.build_profile_entry(await queryset.aget(pk=user_id))
+            row = await queryset.prefetch_related(None).values(
+                *self.get_profile_columns(values_serializer)
+            ).aget(pk=user_id)
+        except User.DoesNotExist:
+            raise Http404('No User matches the given query.')
+        await self.aprepare_rows([row])
+        return self.build_row_entry(values_serializer, row)
+
+    def get_profile_columns(self, values_serializer):
+        return sorted({*values_serializer.columns, 'updated_at'})
+
+    def build_row_entry(self, values_serializer, row):
+        data = timed_serialize(values_serializer.to_representation, row)
+        return {'data': data, 'updated_at': row['updated_at']}
+
+    def build_profile_entry(self, user):
+        return {'data': dict(self.get_serializer(user).data), 'updated_at': user.updated_at}
+
+    def profile_response(self, entry):
+        response = Response(entry['data'])
+        response['X-Cache'] = 'HIT' if self.profile_cache_hit else 'MISS'
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self._retrieve)
+
+    def _retrieve(self, request):
+        return self.profile_response(self.get_profile_entry(self.get_user_id()))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aconditional_response(request, self._aretrieve)
+
+    async def _aretrieve(self, request):
+        return self.profile_response(await self.aget_profile_entry(self.get_user_id()))
+
+    def get_validator_query(self):
+        queryset = User.objects.all()
+        if self.detail:
+            queryset = queryset.filter(pk=self.kwargs[self.lookup_field])
+        return queryset, {'updated_at': Max('updated_at'), 'count': Count('id')}
+
     @action(detail=True, methods=['put', 'patch'], url_path='update-profile')
     def update_profile(self, request, pk=None):
         """Update user profile."""
+        return self.conditional_response(request, self._update_profile)
+
+    def _update_profile(self, request):
         user = self.get_object()
         serializer = UserProfileUpdateSerializer(
             user,
@@ -33,9 +176,111 @@ class UserViewSet(viewsets.ModelViewSet):
     def my_profile(self, request):
         """Get current user profile."""
         if request.user.is_authenticated:
-            serializer = self.get_serializer(request.user)
-            return Response(serializer.data)
+            return self.conditional_response(request, self._my_profile)
         return Response(
             {'detail': 'Authentication credentials were not provided.'},
             status=status.HTTP_401_UNAUTHORIZED
-        )
\ No newline at end of file
+        )
+
+    async def amy_profile(self, request):
+        if request.user.is_authenticated:
+            return await self.aconditional_response(request, self._amy_profile)
+        return self.my_profile(request)
+
+    def _my_profile(self, request):
+        # The authenticated user is current: cached tokens are evicted with it.
+        self.check_object_permissions(request, request.user)
+        entry, self.profile_cache_hit = profile_cache.get_profile(
+            request, request.user.pk, lambda: self.build_profile_entry(request.user)
+        )
+        return self.profile_response(entry)
+
+    async def _amy_profile(self, request):
+        self.check_object_permissions(request, request.user)
+
+        async def load():
+            return self.build_profile_entry(request.user)
+
+        entry, self.profile_cache_hit = await profile_cache.aget_profile(request, request.user.pk, load)
+        return self.profile_response(entry)
+
+
+class LoginAPIView(APIView):
+    """
+    Exchange email and password for an API token.
+
+    The password is checked once here; later requests send
+    ``Authorization: Token <key>``.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        serializer = LoginSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, key = AuthToken.objects.issue(user)
+        return Response(
+            {'token': key, 'user': UserSerializer(user, context={'request': request}).data},
+            status=status.HTTP_201_CREATED
+        )
+
+
+class LogoutAPIView(APIView):
+    """
+    Revoke the token the request was authenticated with.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        AuthToken.objects.filter(digest=request.auth).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UserImportAPIView(APIView):
+    """
+    Create users in bulk from a CSV (``text/csv``) or NDJSON
+    (``application/x-ndjson``) request body.
+
+    The body is read as a stream and imported batch by batch like
+    ``manage.py import_users``. The response is NDJSON: an ``error`` line
+    per rejected row, a ``progress`` line per batch and a final
+    ``summary``.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+    }
+
+    def post(self, request):
+        input_format = self.content_types.get(request.content_type.split(';')[0].strip())
+        if input_format is None:
+            return Response(
+                {'detail': f'Send one of: {", ".join(self.content_types)}.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        stream = request.stream
+        if stream is None:
+            return Response({'detail': 'Empty request body.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = int(request.query_params.get('batch_size', imports.BATCH_SIZE))
+        except ValueError:
+            batch_size = imports.BATCH_SIZE
+        lines = codecs.iterdecode(stream, 'utf-8-sig')
+        return streaming_response(
+            request,
+            self.run(lines, input_format, min(max(batch_size, 1), imports.BATCH_SIZE)),
+            content_type='application/x-ndjson'
+        )
+
+    def run(self, lines, input_format, batch_size):
+        result = imports.ImportResult()
+        with hasher_pool() as executor:
+            for result, errors in imports.iter_import(lines, input_format, batch_size, executor):
+                for error in errors:
+                    yield json.dumps({'type': 'error', **error}) + '\n'
+                yield json.dumps({'type': 'progress', **result.as_dict()}) + '\n'
+        yield json.dumps({'type': 'summary', **result.as_dict()}) + '\n'